@@ -6,7 +6,9 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
+from sqlalchemy.engine import make_url
 import os
+from datetime import datetime
 
 # Initialize extensions
 db = SQLAlchemy()
@@ -27,14 +29,61 @@ def create_app():
     
     # Configuration
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///provisioning_dashboard.db'
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///provisioning_dashboard.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Archived projects live in their own database so the hot tables only hold active work
+    app.config['SQLALCHEMY_BINDS'] = {
+        'archive': os.environ.get('ARCHIVE_DATABASE_URL') or default_archive_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    }
     app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production')
+    app.config['IDENTITY_CACHE_SIZE'] = int(os.environ.get('IDENTITY_CACHE_SIZE', 1024))
+    app.config['IDENTITY_CACHE_TTL'] = int(os.environ.get('IDENTITY_CACHE_TTL', 60))  # seconds
+    app.config['DOWNLOAD_FLUSH_INTERVAL'] = float(os.environ.get('DOWNLOAD_FLUSH_INTERVAL', 5.0))  # seconds
+    app.config['DOWNLOAD_FLUSH_SIZE'] = int(os.environ.get('DOWNLOAD_FLUSH_SIZE', 1000))
+    app.config['AUDIT_FLUSH_INTERVAL'] = float(os.environ.get('AUDIT_FLUSH_INTERVAL', 1.0))  # seconds
+    app.config['AUDIT_FLUSH_SIZE'] = int(os.environ.get('AUDIT_FLUSH_SIZE', 500))
+    app.config['PROJECT_CACHE_SIZE'] = int(os.environ.get('PROJECT_CACHE_SIZE', 256))
+    app.config['JSON_ENCODER'] = os.environ.get('JSON_ENCODER', 'auto')  # auto, orjson, std
+    app.config['COMPRESS_ENABLED'] = os.environ.get('COMPRESS_ENABLED', '1') == '1'
+    app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))  # bytes
+    app.config['PROGRESS_BROKER'] = os.environ.get('PROGRESS_BROKER', 'memory')  # memory, sqlite
+    app.config['PROGRESS_BROKER_PATH'] = os.environ.get('PROGRESS_BROKER_PATH')
+    app.config['SSE_KEEPALIVE_INTERVAL'] = int(os.environ.get('SSE_KEEPALIVE_INTERVAL', 15))  # seconds
+    app.config['SSE_MAX_DURATION'] = int(os.environ.get('SSE_MAX_DURATION', 300))  # seconds
+    app.config['PROVISION_MODE'] = os.environ.get('PROVISION_MODE', 'inline')  # inline, queue
+    app.config['CERT_ROTATION_THRESHOLD_DAYS'] = int(os.environ.get('CERT_ROTATION_THRESHOLD_DAYS', 30))
+    app.config['CERT_ROTATION_WINDOWS'] = os.environ.get('CERT_ROTATION_WINDOWS', '')  # e.g. 01:00-05:00,22:00-23:30
+    app.config['CERT_ROTATION_MAX_CONCURRENT'] = int(os.environ.get('CERT_ROTATION_MAX_CONCURRENT', 2))
+    app.config['AUTO_APPROVAL_ON_CREATE'] = os.environ.get('AUTO_APPROVAL_ON_CREATE', '1') == '1'
+    app.config['AUTO_APPROVAL_INTERVAL'] = float(os.environ.get('AUTO_APPROVAL_INTERVAL', 60))  # seconds
+    app.config['ARCHIVE_DIR'] = os.environ.get('ARCHIVE_DIR')  # Workspace archives; defaults to <workspace>/archive
+    app.config['ARCHIVE_INACTIVE_DAYS'] = int(os.environ.get('ARCHIVE_INACTIVE_DAYS', 180))
+    app.config['READINESS_CACHE_TTL'] = float(os.environ.get('READINESS_CACHE_TTL', 5.0))  # seconds
+    app.config['KIT_OFFLOAD'] = os.environ.get('KIT_OFFLOAD', 'none')  # none, accel (nginx), sendfile (Apache/lighttpd)
+    app.config['KIT_ACCEL_PREFIX'] = os.environ.get('KIT_ACCEL_PREFIX', '/sealed-kits/')
+    app.config['PROFILING_ENABLED'] = os.environ.get('PROFILING_ENABLED', '0') == '1'  # Opt-in
+    app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR')  # Defaults to <instance>/profiles
+    app.config['PROFILE_MAX_COUNT'] = int(os.environ.get('PROFILE_MAX_COUNT', 50))
+    app.config['PROFILE_SAMPLE_INTERVAL'] = float(os.environ.get('PROFILE_SAMPLE_INTERVAL', 0.005))  # seconds
+    # Headers only; the SSE stream alone also accepts ?jwt=<token> (see stream_provisioning_events)
+    app.config['JWT_TOKEN_LOCATION'] = ['headers']
     
     # Initialize extensions
     db.init_app(app)
     jwt.init_app(app)
     
+    from . import auth, downloads, audit, project_cache, serializers, compression, progress, profiling, jobs, health
+    serializers.init_app(app)
+    compression.init_app(app)
+    profiling.init_app(app)
+    auth.init_app(app)
+    downloads.init_app(app)
+    audit.init_app(app)
+    project_cache.init_app(app)
+    progress.init_app(app)
+    jobs.init_app(app)
+    health.init_app(app)
+    
     # Import and register blueprints
     from .views import main_bp, api_bp
     app.register_blueprint(main_bp)
@@ -42,18 +91,51 @@ def create_app():
     
     return app
 
-def init_database(app):
-    """Initialize database tables and default data"""
+def default_archive_url(database_url):
+    """<name>_archive.db next to a SQLite main database; other databases hold the archive tables themselves"""
+    url = make_url(database_url)
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        return database_url
+    stem, ext = os.path.splitext(url.database)
+    return url.set(database=f"{stem}_archive{ext or '.db'}").render_as_string(hide_password=False)
+
+def sqlite_file_missing(engine):
+    """Whether the engine is a SQLite database whose file does not exist (yet)"""
+    path = engine.url.database
+    return engine.url.get_backend_name() == 'sqlite' and bool(path) and path != ':memory:' and not os.path.exists(path)
+
+def init_database(app, force=False):
+    """Create tables and default data, unless the stamped schema already matches the models"""
     try:
         with app.app_context():
-            db.create_all()
+            from .models import SchemaVersion, init_default_data, schema_fingerprint
+            fingerprint = schema_fingerprint()
+            if not force and _schema_current(SchemaVersion, fingerprint):
+                print("Database schema is up to date")
+                return
+            
+            # A SQLite archive database is only created once the first project is archived
+            bind_keys = [None] + [key for key, engine in db.engines.items()
+                                  if key is not None and not sqlite_file_missing(engine)]
+            db.create_all(bind_key=bind_keys)
             print("Database tables created successfully")
             
             # Initialize default data if needed
-            from .models import init_default_data
             init_default_data()
+            db.session.merge(SchemaVersion(id=1, fingerprint=fingerprint, applied_at=datetime.utcnow()))
+            db.session.commit()
             print("Database initialization completed")
     except Exception as e:
         print(f"Database initialization error: {e}")
         # Don't fail the app startup, just log the error
 
+def _schema_current(SchemaVersion, fingerprint):
+    """Whether the stamp matches and the main SQLite database file is still there"""
+    if sqlite_file_missing(db.engine):
+        return False
+    try:
+        stamp = db.session.get(SchemaVersion, 1)
+    except Exception:
+        db.session.rollback()  # No schema_version table yet
+        return False
+    return stamp is not None and stamp.fingerprint == fingerprint
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Batch Approvals
+Approve or reject many applications, clients or admins with set-based UPDATEs
+"""
+
+from datetime import datetime
+from sqlalchemy import select, update
+from . import db
+from .models import User, Client, Admin, UserApplication
+
+APPROVAL_KINDS = ['applications', 'clients', 'admins']
+APPROVAL_ACTIONS = ['approve', 'reject']
+
+# approval_state values used by Client/Admin/User
+APPROVAL_STATES = {'pending': 0, 'approve': 1, 'reject': 2}
+# Filters compared as-is against string columns
+TEXT_FILTERS = ['status', 'role_requested', 'organization', 'org']
+
+
+class BatchReviewError(ValueError):
+    """Raised for invalid batch review requests"""
+
+
+def _approval_state(value):
+    """Accept 'pending'/'approved'/'rejected' or the numeric state"""
+    if isinstance(value, str) and not value.isdigit():
+        states = {'pending': 0, 'approved': 1, 'rejected': 2}
+        if value not in states:
+            raise BatchReviewError(f"Invalid approval_state: {value}")
+        return states[value]
+    return int(value)
+
+
+def _application_conditions(ids, filters):
+    """WHERE clauses selecting user applications"""
+    conditions = [UserApplication.status == filters.get('status', 'pending')]
+    if ids is not None:
+        conditions.append(UserApplication.id.in_(ids))
+    if 'project_id' in filters:
+        conditions.append(UserApplication.project_id == int(filters['project_id']))
+    if 'role_requested' in filters:
+        conditions.append(UserApplication.role_requested == filters['role_requested'])
+    if 'organization' in filters:
+        conditions.append(UserApplication.user_id.in_(
+            select(User.id).where(User.organization == filters['organization'])
+        ))
+    return conditions
+
+
+def _participant_conditions(model, ids, filters):
+    """WHERE clauses selecting clients or admins"""
+    conditions = [model.approval_state == _approval_state(filters.get('approval_state', 0))]
+    if ids is not None:
+        conditions.append(model.id.in_(ids))
+    if 'project_id' in filters:
+        conditions.append(model.project_id == int(filters['project_id']))
+    if 'org' in filters or 'organization' in filters:
+        conditions.append(model.org == filters.get('org', filters.get('organization')))
+    return conditions
+
+
+def batch_review(kind, action, reviewer_id, ids=None, filters=None):
+    """Apply one approve/reject action to every matching row; the caller commits"""
+    if kind not in APPROVAL_KINDS:
+        raise BatchReviewError(f"Invalid kind: {kind}")
+    if action not in APPROVAL_ACTIONS:
+        raise BatchReviewError('Invalid action')
+    if ids is None and filters is None:
+        raise BatchReviewError('Either ids or filter is required')
+    filters = filters or {}
+    if not isinstance(filters, dict):
+        raise BatchReviewError('filter must be an object')
+    for key in TEXT_FILTERS:
+        if key in filters and not isinstance(filters[key], str):
+            raise BatchReviewError(f"filter.{key} must be a string")
+    if ids is not None:
+        try:
+            if isinstance(ids, (str, dict)):
+                raise TypeError(ids)
+            ids = sorted(set(int(i) for i in ids))
+        except (TypeError, ValueError):
+            raise BatchReviewError('ids must be a list of integers')
+
+    try:
+        if kind == 'applications':
+            conditions = _application_conditions(ids, filters)
+        else:
+            conditions = _participant_conditions(Client if kind == 'clients' else Admin, ids, filters)
+    except BatchReviewError:
+        raise
+    except (TypeError, ValueError) as e:
+        raise BatchReviewError(f"Invalid filter: {e}")
+    return review_where(kind, action, reviewer_id, conditions)
+
+
+def review_where(kind, action, reviewer_id, conditions):
+    """Apply one approve/reject action to every row matching the WHERE clauses; the caller commits"""
+    conditions = list(conditions)
+    if kind == 'applications':
+        model = UserApplication
+        new_status = 'approved' if action == 'approve' else 'rejected'
+        # Skip rows that are already in the target state
+        conditions.append(UserApplication.status != new_status)
+        values = {'status': new_status, 'reviewed_at': datetime.utcnow(), 'reviewed_by': reviewer_id}
+    else:
+        model = Client if kind == 'clients' else Admin
+        conditions.append(model.approval_state != APPROVAL_STATES[action])
+        values = {'approval_state': APPROVAL_STATES[action]}
+
+    # Collect affected projects before the rows change state
+    project_ids = sorted(db.session.execute(
+        select(model.project_id).where(*conditions).distinct()
+    ).scalars())
+    if not project_ids:
+        return {'kind': kind, 'action': action, 'updated': 0, 'project_ids': [], 'users_approved': 0}
+
+    users_approved = 0
+    if model is UserApplication and action == 'approve':
+        # Approving an application approves the applicant, as approve_application does;
+        # this must run before the applications leave their current status
+        users_approved = db.session.execute(
+            update(User)
+            .where(User.id.in_(select(UserApplication.user_id).where(*conditions)))
+            .where(User.approval_state != 1)
+            .values(approval_state=1)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+    updated = db.session.execute(
+        update(model)
+        .where(*conditions)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    return {
+        'kind': kind,
+        'action': action,
+        'updated': updated,
+        'project_ids': project_ids,
+        'users_approved': users_approved
+    }
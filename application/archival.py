@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Project Archival
+Moves inactive projects out of the hot tables and off the workspace disk:
+servers, clients, admins and applications go into the archive database as one
+compressed copy, and the workspace and sealed kits into
+a single tar.gz under ARCHIVE_DIR. Only the project row stays behind, marked
+archived, so ids, audit trails and download history keep pointing at it and
+list queries skip it. Restoring reverses both steps.
+
+Unlike an export snapshot, the archive copy holds whole rows, ids, counters
+and user references included, so a restored project is the one that was
+archived and its download events still point at its participants:
+
+    {"type": "archive", "format_version": 1, "project_id": 42}
+    {"type": "server" | "client" | "admin" | "user_application", "id": ..., ...}
+    {"type": "end", "counts": {"server": 1, "client": 50000, ...}}
+"""
+
+import io
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, func, insert, select
+from . import db, project_cache, snapshots
+from .models import (
+    Project, Server, Client, Admin, UserApplication, DownloadEvent, ProvisioningJob,
+    CertificateIndex, WorkspaceLocation, ArchivedProject, ProjectArchive
+)
+from .provisioning import shard_prefix
+
+ARCHIVED_MODELS = [Server, Client, Admin, UserApplication]
+ARCHIVE_FORMAT_VERSION = 1
+# Members of a workspace archive
+WORKSPACE_MEMBER = 'workspace'
+SEALED_MEMBER = 'sealed'
+
+
+class ArchiveError(RuntimeError):
+    """Raised when a project cannot be archived or restored in its current state"""
+
+
+def archived_ids():
+    """Subquery of archived project ids, for excluding them from list queries"""
+    return select(ArchivedProject.project_id)
+
+
+def is_archived(project_id):
+    return db.session.get(ArchivedProject, project_id) is not None
+
+
+def archive_dir(service):
+    return current_app.config.get('ARCHIVE_DIR') or os.path.join(service.workspace_dir, 'archive')
+
+
+def workspace_archive_path(service, project_id):
+    return os.path.join(archive_dir(service), shard_prefix(project_id)[0], f"project_{project_id}.tar.gz")
+
+
+def ensure_archive_database():
+    """Create the archive tables on first use; init_database leaves a missing SQLite archive file alone"""
+    db.create_all(bind_key=ProjectArchive.__bind_key__)
+
+
+def last_activity(project_id):
+    """Latest of the project's last update, download and provisioning job"""
+    moments = [
+        db.session.execute(select(Project.updated_at).where(Project.id == project_id)).scalar(),
+        db.session.execute(select(func.max(DownloadEvent.created_at))
+                           .where(DownloadEvent.project_id == project_id)).scalar(),
+        db.session.execute(select(func.max(ProvisioningJob.created_at))
+                           .where(ProvisioningJob.project_id == project_id)).scalar(),
+    ]
+    moments = [moment for moment in moments if moment is not None]
+    return max(moments) if moments else None
+
+
+def inactive_projects(days, limit=None):
+    """Ids of unarchived projects without updates, downloads or provisioning jobs in the last days"""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    recent_download = (select(DownloadEvent.id)
+                       .where(DownloadEvent.project_id == Project.id, DownloadEvent.created_at >= cutoff)
+                       .exists())
+    recent_job = (select(ProvisioningJob.id)
+                  .where(ProvisioningJob.project_id == Project.id, ProvisioningJob.created_at >= cutoff)
+                  .exists())
+    query = (
+        select(Project.id)
+        .where(Project.updated_at < cutoff, Project.id.not_in(archived_ids()), ~recent_download, ~recent_job)
+        .order_by(Project.id)
+    )
+    if limit:
+        query = query.limit(limit)
+    return list(db.session.execute(query).scalars())
+
+
+def iter_archive_records(project_id):
+    """Yield every archived row of a project, all columns, as NDJSON lines (bytes)"""
+    yield snapshots.dump_line({'type': 'archive', 'format_version': ARCHIVE_FORMAT_VERSION,
+                               'project_id': project_id})
+    counts = {}
+    for model in ARCHIVED_MODELS:
+        kind, columns = model.__tablename__, [column.name for column in model.__table__.columns]
+        rows = db.session.execute(
+            select(model.__table__)
+            .where(model.__table__.c.project_id == project_id)
+            .order_by(model.__table__.c.id)
+            .execution_options(yield_per=snapshots.SNAPSHOT_BATCH_SIZE)
+        )
+        counts[kind] = 0
+        for batch in rows.partitions():
+            yield b''.join(snapshots.dump_line(snapshots.row_record(kind, row, columns)) for row in batch)
+            counts[kind] += len(batch)
+    yield snapshots.dump_line({'type': 'end', 'counts': counts})
+
+
+def _insert_with_ids(model, rows):
+    """Insert rows under their original ids; refuses if any id was reused since archiving"""
+    ids = [row['id'] for row in rows]
+    taken = db.session.execute(select(model.id).where(model.id.in_(ids)).limit(5)).scalars().all()
+    if taken:
+        raise ArchiveError(f"{model.__tablename__} ids {taken} were reused after archiving; "
+                           f"cannot restore them under their original ids")
+    db.session.execute(insert(model), rows)
+
+
+def load_archive_records(lines, project_id):
+    """Insert the rows of an archive copy back into the hot tables; returns rows per table. The caller commits"""
+    models = {model.__tablename__: model for model in ARCHIVED_MODELS}
+    columns = {kind: [column.name for column in model.__table__.columns] for kind, model in models.items()}
+    pending = {kind: [] for kind in models}
+    counts = {kind: 0 for kind in models}
+
+    def flush(kind):
+        if pending[kind]:
+            _insert_with_ids(models[kind], pending[kind])
+            counts[kind] += len(pending[kind])
+            pending[kind] = []
+
+    header = end = None
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        record = json.loads(line)
+        kind = record.get('type')
+        if header is None:
+            if kind != 'archive' or record.get('format_version') != ARCHIVE_FORMAT_VERSION:
+                raise ArchiveError(f"Not a project archive (first record: {kind!r})")
+            header = record
+        elif kind in models:
+            values = snapshots.row_values(record, columns[kind], models[kind])
+            values['project_id'] = project_id
+            pending[kind].append(values)
+            if len(pending[kind]) >= snapshots.SNAPSHOT_BATCH_SIZE:
+                flush(kind)
+        elif kind == 'end':
+            end = record
+            break
+        else:
+            raise ArchiveError(f"Line {number}: unknown record type {kind!r}")
+
+    if end is None:
+        raise ArchiveError(f"Archive copy of project {project_id} is truncated")
+    for kind in models:
+        flush(kind)
+    if end.get('counts') != counts:
+        raise ArchiveError(f"Archive copy of project {project_id} is incomplete: "
+                           f"expected {end.get('counts')}, got {counts}")
+    return counts
+
+
+def _write_workspace_archive(service, project_id, workspace, sealed):
+    """Pack the workspace and seal into one tar.gz; returns (path, size) or (None, 0) if neither exists"""
+    members = [(path, name) for path, name in ((workspace, WORKSPACE_MEMBER), (sealed, SEALED_MEMBER))
+               if os.path.isdir(path)]
+    if not members:
+        return None, 0
+    path = workspace_archive_path(service, project_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = path + '.partial'
+    with tarfile.open(partial, 'w:gz') as tar:
+        for source, name in members:
+            tar.add(source, arcname=name)
+    os.rename(partial, path)
+    return path, os.path.getsize(path)
+
+
+def _remove_tree(path, scratch_root):
+    """Renamed first so nothing picks up a half-deleted directory"""
+    if not os.path.isdir(path):
+        return
+    doomed = tempfile.mkdtemp(prefix='.archived.', dir=scratch_root)
+    os.rename(path, os.path.join(doomed, 'tree'))
+    shutil.rmtree(doomed, ignore_errors=True)
+
+
+def archive_project(service, project_id, archived_by=None):
+    """Move one project into the archive database and its files into a tar.gz
+
+    Runs under the project lock. The archive copy is committed before the hot
+    rows are deleted and the files removed, so a failure part-way leaves the
+    project active and the next attempt starts over.
+    """
+    with service.project_lock(project_id):
+        project = db.session.get(Project, project_id)
+        if project is None:
+            raise ArchiveError(f"Project {project_id} not found")
+        if is_archived(project_id):
+            raise ArchiveError(f"Project {project_id} is already archived")
+        in_flight = db.session.execute(
+            select(func.count(ProvisioningJob.id))
+            .where(ProvisioningJob.project_id == project_id, ProvisioningJob.status.in_(['queued', 'running']))
+        ).scalar()
+        if in_flight:
+            raise ArchiveError(f"Project {project_id} has provisioning jobs in flight")
+        ensure_archive_database()
+
+        counts = {model.__tablename__: db.session.execute(
+            select(func.count(model.id)).where(model.project_id == project_id)).scalar()
+            for model in ARCHIVED_MODELS}
+        snapshot = b''.join(snapshots.gzip_stream(iter_archive_records(project_id)))
+        # Resolved now: the workspace_location row goes away with the hot rows
+        workspace, sealed = service.project_workspace(project_id), service.sealed_dir(project_id)
+        archive_path, archive_size = _write_workspace_archive(service, project_id, workspace, sealed)
+
+        db.session.merge(ProjectArchive(
+            project_id=project_id,
+            name=project.name,
+            snapshot=snapshot,
+            snapshot_size=len(snapshot),
+            counts=json.dumps(counts),
+            workspace_archive=archive_path,
+            workspace_size=archive_size,
+            last_activity=last_activity(project_id),
+            archived_at=datetime.utcnow(),
+            archived_by=archived_by
+        ))
+        db.session.commit()
+
+        for model in ARCHIVED_MODELS + [CertificateIndex, WorkspaceLocation]:
+            db.session.execute(delete(model).where(model.project_id == project_id)
+                               .execution_options(synchronize_session=False))
+        db.session.add(ArchivedProject(project_id=project_id, archived_by=archived_by))
+        project_cache.bump_version(project_id)
+        db.session.commit()
+
+        _remove_tree(workspace, service.workspace_dir)
+        _remove_tree(sealed, service.sealed_root())
+        service._workspace_paths.pop(project_id, None)
+
+    return {'project_id': project_id, 'counts': counts, 'snapshot_size': len(snapshot),
+            'workspace_archive': archive_path, 'workspace_size': archive_size}
+
+
+def restore_project(service, project_id):
+    """Bring an archived project back into the hot tables and its files back into the workspace"""
+    with service.project_lock(project_id):
+        if not is_archived(project_id):
+            raise ArchiveError(f"Project {project_id} is not archived")
+        archive = db.session.get(ProjectArchive, project_id)
+        if archive is None:
+            raise ArchiveError(f"No archive copy of project {project_id}")
+        # Restoring on top of rows written since archiving would duplicate them
+        present = [model.__tablename__ for model in ARCHIVED_MODELS
+                   if db.session.execute(select(model.id).where(model.project_id == project_id).limit(1)).first()]
+        if present:
+            raise ArchiveError(f"Project {project_id} already has {', '.join(present)} rows; "
+                               f"remove them before restoring")
+
+        # Unpacked next to its final place first, so a bad archive changes nothing
+        staging = None
+        if archive.workspace_archive:
+            staging = tempfile.mkdtemp(prefix=f".restore_{project_id}.", dir=service.workspace_dir)
+            try:
+                with tarfile.open(archive.workspace_archive, 'r:gz') as tar:
+                    if hasattr(tarfile, 'data_filter'):
+                        tar.extractall(staging, filter='data')
+                    else:
+                        tar.extractall(staging)
+            except Exception:
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
+
+        try:
+            restored = load_archive_records(snapshots.open_snapshot(io.BytesIO(archive.snapshot)), project_id)
+            db.session.execute(delete(ArchivedProject).where(ArchivedProject.project_id == project_id))
+            project_cache.bump_version(project_id)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            if staging:
+                shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        if staging:
+            for name, target in ((WORKSPACE_MEMBER, service.sharded_workspace(project_id)),
+                                 (SEALED_MEMBER, service.sharded_sealed_dir(project_id))):
+                source = os.path.join(staging, name)
+                if os.path.isdir(source):
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    os.rename(source, target)
+            shutil.rmtree(staging, ignore_errors=True)
+            service._workspace_paths.pop(project_id, None)
+            service.record_workspace(project_id)
+
+        workspace_archive = archive.workspace_archive
+        db.session.delete(archive)
+        db.session.commit()
+        if workspace_archive and os.path.exists(workspace_archive):
+            os.remove(workspace_archive)
+
+    return {'project_id': project_id, 'restored': restored}
+
+
+def archived_projects(limit=500):
+    """Archive rows without their snapshot blobs, most recently archived first"""
+    if not db.session.execute(archived_ids().limit(1)).first():
+        return []  # Nothing archived yet: the archive database may not exist
+    return db.session.execute(
+        select(ProjectArchive.project_id, ProjectArchive.name, ProjectArchive.counts,
+               ProjectArchive.snapshot_size, ProjectArchive.workspace_size,
+               ProjectArchive.last_activity, ProjectArchive.archived_at, ProjectArchive.archived_by)
+        .order_by(ProjectArchive.archived_at.desc())
+        .limit(limit)
+    ).all()
@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+"""
+ASGI Application
+Serves the API on an event loop. Provisioning runs the NVFlare CLI through
+asyncio subprocesses, startup kits are zipped off the loop under the project
+lock and then streamed chunk by chunk, and progress streams wait on the broker without holding a thread. Every
+other route is handed to the Flask app through asgiref's WSGI adapter.
+"""
+
+import asyncio
+import json
+import os
+import re
+import tempfile
+import time
+import zipfile
+from urllib.parse import parse_qs
+from flask_jwt_extended import decode_token
+from sqlalchemy import select
+from . import archival, audit, auth, db, downloads, jobs, progress, validation
+from .serializers import serialize_provisioning_job
+from .models import Project
+from .provisioning import NVFlareProvisioningService, ProjectFrozenError, ProjectArchivedError
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError:  # Optional: only needed for the ASGI entry point
+    WsgiToAsgi = None
+
+KIT_CHUNK_SIZE = 64 * 1024
+LOCK_POLL_INTERVAL = 0.1  # seconds
+
+PROVISION_PATH = re.compile(r'^/api/v1/provision/(\d+)$')
+EVENTS_PATH = re.compile(r'^/api/v1/provision/(\d+)/events$')
+DOWNLOAD_PATH = re.compile(r'^/api/v1/download/([a-z]+)/(\d+)$')
+
+
+class AuthError(Exception):
+    """Missing or invalid JWT on a natively served route"""
+
+
+def build_kit_zip(target_dir):
+    """Zip target_dir into a temporary file and return its path; the caller removes it"""
+    fd, path = tempfile.mkstemp(prefix='kit_', suffix='.zip')
+    try:
+        with os.fdopen(fd, 'wb') as f, zipfile.ZipFile(f, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            for file_path, arc_name in NVFlareProvisioningService.kit_files(target_dir):
+                zip_file.write(file_path, arc_name)
+    except Exception:
+        os.unlink(path)
+        raise
+    return path
+
+
+async def stream_file(path, chunk_size=KIT_CHUNK_SIZE):
+    """Yield a file's bytes in chunks without blocking the loop on disk reads"""
+    source = await asyncio.to_thread(open, path, 'rb')
+    try:
+        while True:
+            data = await asyncio.to_thread(source.read, chunk_size)
+            if not data:
+                break
+            yield data
+    finally:
+        source.close()
+
+
+class AsyncProvisioningService(NVFlareProvisioningService):
+    """NVFlare provisioning that awaits the CLI instead of blocking a thread on it"""
+
+    def __init__(self, app, workspace_dir="workspace", nvflare_bin=None, inline_participants=None):
+        super().__init__(workspace_dir, nvflare_bin, inline_participants)
+        self.app = app
+
+    async def _in_app(self, func, *args):
+        """Run a database-touching call in a worker thread with an app context"""
+        def call():
+            with self.app.app_context():
+                return func(*args)
+        return await asyncio.to_thread(call)
+
+    async def _run_cli(self, *args):
+        """Run `nvflare provision <args>` and return (returncode, stdout, stderr)"""
+        cmd = self.nvflare_command(*args)
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=self.nvflare_env()
+        )
+        stdout, stderr = await process.communicate()
+        return process.returncode, stdout.decode(errors='replace'), stderr.decode(errors='replace')
+
+    async def acquire_project_lock(self, project_id):
+        """Same workspace lock as the sync service and the workers, polled instead of blocking the loop"""
+        lock = self.project_lock(project_id)
+        while not lock.acquire(blocking=False):
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+        return lock
+
+    async def provision(self, project_id, custom_workspace=None):
+        """Async counterpart of call_nvflare_provision, with the same progress events"""
+        await self._in_app(self.ensure_not_frozen, project_id)
+        lock = await self.acquire_project_lock(project_id)
+        try:
+            return await self.provision_locked(project_id, custom_workspace)
+        finally:
+            lock.release()
+
+    async def provision_locked(self, project_id, custom_workspace=None):
+        """provision() for a caller that already holds the project lock"""
+        try:
+            workspace = await self._provision(project_id, custom_workspace)
+            if custom_workspace is None:
+                await self._in_app(self.record_workspace, project_id)
+        except Exception as e:
+            progress.publish(project_id, 'provisioning', 'failed', error=str(e))
+            raise
+        progress.publish(project_id, 'provisioning', 'completed', workspace=workspace)
+        return workspace
+
+    async def build_startup_kit(self, project_id, target_type):
+        """Provision and zip one kit under the project lock; returns the temporary zip's path
+
+        The lock is held until the zip is complete, so no other run rewrites
+        the workspace while it is read; streaming the file happens afterwards.
+        """
+        await self._in_app(self.ensure_not_frozen, project_id)
+        lock = await self.acquire_project_lock(project_id)
+        try:
+            workspace = await self.provision_locked(project_id)
+            target_dir = await asyncio.to_thread(self.find_kit_dir, workspace, target_type)
+            return await asyncio.to_thread(build_kit_zip, target_dir)
+        finally:
+            lock.release()
+
+    async def _provision(self, project_id, custom_workspace=None):
+        def prepare():
+            project = Project.query.get(project_id)
+            if not project:
+                raise ValueError(f"Project {project_id} not found")
+            validation.ensure_valid(project)
+            progress.publish(project_id, 'generating_config')
+            workspace = custom_workspace or self.project_workspace(project_id)
+            return project.server_name, workspace, self.write_project_yml(project, self.inline_participants)
+
+        progress.publish(project_id, 'validating')
+        server_name, workspace, project_file = await self._in_app(prepare)
+
+        try:
+            progress.publish(project_id, 'provisioning', participant=server_name)
+            returncode, stdout, stderr = await self._run_cli('-p', project_file, '-w', workspace)
+            print(f"Command return code: {returncode}")
+            if returncode != 0:
+                raise RuntimeError(f"NVFlare provision failed: {stderr}")
+
+            actual_workspace = await asyncio.to_thread(self.find_generated_workspace, workspace)
+            if not actual_workspace:
+                print(f"Could not find generated workspace in {workspace}")
+                return workspace
+
+            if not self.inline_participants:
+                await self._add_participants(actual_workspace, project_id)
+            return actual_workspace
+        finally:
+            await asyncio.to_thread(os.unlink, project_file)
+
+    async def _add_participants(self, workspace, project_id):
+        total, additional_servers = await self._in_app(self.count_additional_participants, project_id)
+        completed = 0
+        for kind in ('client', 'admin'):
+            after_id = 0
+            while True:
+                batch, after_id = await self._in_app(self.additional_participant_batch, project_id, kind, after_id)
+                if not batch:
+                    break
+                # The CLI edits one workspace, so participants are still added one at a time
+                for flag, label, config in batch:
+                    participant_file = await asyncio.to_thread(self.write_temp_yaml, config)
+                    try:
+                        returncode, _, stderr = await self._run_cli(flag, participant_file, '-w', workspace)
+                        if returncode != 0:
+                            print(f"Failed to add {config['type']} {label}: {stderr}")
+                    except Exception as e:
+                        print(f"Error adding {config['type']} {label}: {e}")
+                    finally:
+                        await asyncio.to_thread(os.unlink, participant_file)
+                    completed += 1
+                    progress.publish(project_id, 'adding_participants', participant=label,
+                                     participant_type=config['type'], completed=completed, total=total)
+
+        if additional_servers:
+            print(f"Warning: {additional_servers} additional servers cannot be added (NVFlare limitation)")
+
+
+class ProvisioningASGI:
+    """Routes provisioning, kit downloads and progress streams natively; the rest goes to Flask"""
+
+    def __init__(self, flask_app, workspace_dir="workspace"):
+        if WsgiToAsgi is None:
+            raise RuntimeError("The ASGI entry point requires asgiref (pip install asgiref)")
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+        self.service = AsyncProvisioningService(flask_app, workspace_dir)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] == 'http':
+            path, method = scope['path'], scope['method']
+            match = PROVISION_PATH.match(path)
+            if match and method == 'POST':
+                return await self._guarded(self.provision, scope, receive, send, int(match.group(1)))
+            match = EVENTS_PATH.match(path)
+            if match and method == 'GET':
+                return await self._guarded(self.stream_events, scope, receive, send, int(match.group(1)),
+                                           query_token=True)
+            match = DOWNLOAD_PATH.match(path)
+            if match and method == 'GET':
+                return await self._guarded(self.download, scope, receive, send,
+                                           match.group(1), int(match.group(2)))
+        return await self.wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                # Write out buffered downloads and audit events before the process exits
+                await asyncio.to_thread(downloads.download_tracker.flush)
+                await asyncio.to_thread(audit.audit_recorder.flush)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _guarded(self, handler, scope, receive, send, *args, query_token=False):
+        try:
+            user = await self._authenticate(scope, query_token)
+        except AuthError as e:
+            # Same shape as flask_jwt_extended's errors
+            return await self._send_json(send, 401, {'msg': str(e)})
+        return await handler(scope, receive, send, user, *args)
+
+    async def _authenticate(self, scope, query_token=False):
+        """Decode the bearer token (or ?jwt=, for the SSE stream only) and resolve the caller's snapshot"""
+        headers = dict(scope['headers'])
+        token = None
+        authorization = headers.get(b'authorization', b'').decode('latin-1')
+        if authorization.startswith('Bearer '):
+            token = authorization[7:]
+        if not token and query_token:
+            token = (parse_qs(scope.get('query_string', b'').decode()).get('jwt') or [None])[0]
+        if not token:
+            raise AuthError('Missing Authorization Header')
+
+        def resolve():
+            with self.flask_app.app_context():
+                try:
+                    identity = decode_token(token)['sub']
+                except Exception as e:
+                    raise AuthError(str(e))
+                return auth.resolve_identity(identity)
+
+        return await asyncio.to_thread(resolve)
+
+    @staticmethod
+    async def _send_json(send, status, payload):
+        body = json.dumps(payload).encode()
+        await send({'type': 'http.response.start', 'status': status, 'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            (b'access-control-allow-origin', b'*')
+        ]})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def provision(self, scope, receive, send, user, project_id):
+        """POST /api/v1/provision/<id>"""
+        query = parse_qs(scope.get('query_string', b'').decode())
+        if self.flask_app.config.get('PROVISION_MODE') == 'queue' or query.get('async') == ['1']:
+            return await self.enqueue(send, user, project_id)
+        try:
+            workspace = await self.service.provision(project_id)
+            audit.record_event('provision.succeeded', project_id=project_id, actor=user, workspace=workspace)
+            await self._send_json(send, 200, {
+                'message': 'Project provisioned successfully',
+                'workspace': workspace
+            })
+        except ProjectFrozenError as e:
+            await self._send_json(send, 409, {'error': str(e)})
+        except validation.ProjectValidationError as e:
+            await self._send_json(send, 422, {'error': 'Project configuration is invalid', 'validation': e.report})
+        except Exception as e:
+            audit.record_event('provision.failed', project_id=project_id, actor=user, error=str(e))
+            await self._send_json(send, 500, {'error': str(e)})
+
+    async def enqueue(self, send, user, project_id):
+        """Hand the run to the provisioning workers and answer 202 at once"""
+        def queue_job():
+            with self.flask_app.app_context():
+                project = db.session.get(Project, project_id)
+                if project is None:
+                    return None
+                self.service.ensure_not_frozen(project_id)
+                validation.ensure_valid(project)
+                job = jobs.enqueue(project_id, requested_by=user.id if user else None, reason='api')
+                db.session.commit()
+                return serialize_provisioning_job(job)
+
+        try:
+            job = await asyncio.to_thread(queue_job)
+        except ProjectFrozenError as e:
+            return await self._send_json(send, 409, {'error': str(e)})
+        except validation.ProjectValidationError as e:
+            return await self._send_json(send, 422, {'error': 'Project configuration is invalid', 'validation': e.report})
+        except Exception as e:
+            return await self._send_json(send, 500, {'error': str(e)})
+        if job is None:
+            return await self._send_json(send, 404, {'error': 'Project not found'})
+        progress.publish(project_id, 'queued', job_id=job['id'])
+        audit.record_event('provision.queued', project_id=project_id, actor=user, job_id=job['id'])
+        await self._send_json(send, 202, {'message': 'Provisioning queued', 'job': job})
+
+    async def download(self, scope, receive, send, user, target_type, project_id):
+        """GET /api/v1/download/<type>/<id>, streamed as it is compressed (or sealed, for frozen projects)"""
+        def frozen():
+            if archival.is_archived(project_id):
+                raise ProjectArchivedError(f"Project {project_id} is archived; restore it first")
+            return db.session.execute(select(Project.frozen).where(Project.id == project_id)).scalar()
+
+        participant_id = parse_qs(scope.get('query_string', b'').decode()).get('participant_id', [None])[0]
+        participant_id = int(participant_id) if participant_id and participant_id.isdigit() else None
+        sealed = kit_path = None
+        try:
+            if target_type not in ('server', 'client', 'admin'):
+                raise ValueError(f"Invalid target type: {target_type}")
+            # Only counted against a participant of this project and kit type
+            if participant_id is not None and not await self.service._in_app(
+                    downloads.participant_in_project, project_id, target_type, participant_id):
+                return await self._send_json(send, 400, {
+                    'error': f'No {target_type} {participant_id} in project {project_id}'})
+            if await self.service._in_app(frozen):
+                # Sealing the first time provisions in a worker thread, once per freeze
+                sealed = await self.service._in_app(self.service.sealed_startup_kit, project_id, target_type)
+            else:
+                kit_path = await self.service.build_startup_kit(project_id, target_type)
+        except ProjectArchivedError as e:
+            return await self._send_json(send, 410, {'error': str(e), 'project_id': project_id})
+        except ProjectFrozenError as e:
+            return await self._send_json(send, 409, {'error': str(e)})
+        except Exception as e:
+            return await self._send_json(send, 500, {'error': str(e)})
+
+        downloads.download_tracker.record(
+            user.id if user else None,
+            user.email if user else None,
+            project_id,
+            target_type,
+            participant_id=participant_id
+        )
+        audit.record_event('kit.downloaded', project_id=project_id, target_type=target_type, actor=user)
+
+        filename = self.service.kit_filename(target_type)
+        headers = [
+            (b'content-type', b'application/zip'),
+            (b'content-disposition', f'attachment; filename={filename}'.encode()),
+            (b'access-control-allow-origin', b'*')
+        ]
+        if sealed is not None:
+            return await self._send_sealed(send, headers, *sealed)
+
+        try:
+            size = await asyncio.to_thread(os.path.getsize, kit_path)
+            await send({'type': 'http.response.start', 'status': 200,
+                        'headers': headers + [(b'content-length', str(size).encode())]})
+            async for chunk in stream_file(kit_path):
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            await asyncio.to_thread(os.unlink, kit_path)
+
+    async def _send_sealed(self, send, headers, path, kit):
+        """Hand a sealed kit to the fronting web server per KIT_OFFLOAD, or stream it from disk"""
+        headers = headers + [(b'etag', f'"{kit["sha256"]}"'.encode()), (b'cache-control', b'private, no-cache')]
+        config = self.flask_app.config
+        offload = self.service.kit_offload_header(path, config.get('KIT_OFFLOAD'),
+                                                  config.get('KIT_ACCEL_PREFIX', '/sealed-kits/'))
+        if offload is not None:
+            headers.append((offload[0].lower().encode(), offload[1].encode()))
+            await send({'type': 'http.response.start', 'status': 200,
+                        'headers': headers + [(b'content-length', b'0')]})
+            return await send({'type': 'http.response.body', 'body': b''})
+
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': headers + [(b'content-length', str(kit['size']).encode())]})
+        async for chunk in stream_file(path):
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def stream_events(self, scope, receive, send, user, project_id):
+        """GET /api/v1/provision/<id>/events as Server-Sent Events"""
+        headers = dict(scope['headers'])
+        query = parse_qs(scope.get('query_string', b'').decode())
+        last_event_id = headers.get(b'last-event-id', b'').decode() or (query.get('last_event_id') or ['0'])[0]
+        last_event_id = int(last_event_id) if last_event_id.isdigit() else 0
+        keepalive = self.flask_app.config.get('SSE_KEEPALIVE_INTERVAL', 15)
+        max_duration = self.flask_app.config.get('SSE_MAX_DURATION', 300)
+
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+            (b'access-control-allow-origin', b'*')
+        ]})
+
+        async def pump():
+            await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n', 'more_body': True})
+            started = time.monotonic()
+            events = progress.broker.subscribe_async(project_id, last_event_id, timeout=keepalive)
+            try:
+                async for event in events:
+                    await send({'type': 'http.response.body',
+                                'body': progress.format_sse(event).encode(), 'more_body': True})
+                    # Bound the connection so clients periodically reconnect
+                    if time.monotonic() - started > max_duration:
+                        break
+            finally:
+                await events.aclose()
+
+        async def wait_for_disconnect():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        stream = asyncio.ensure_future(pump())
+        disconnect = asyncio.ensure_future(wait_for_disconnect())
+        done, pending = await asyncio.wait([stream, disconnect], return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        if stream in done:
+            await send({'type': 'http.response.body', 'body': b''})
+
+
+def create_asgi_app(flask_app, workspace_dir="workspace"):
+    """Wrap the Flask app for an ASGI server such as uvicorn"""
+    return ProvisioningASGI(flask_app, workspace_dir)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Audit Event Log
+Append-only record of project edits, approvals, provisioning runs and downloads.
+Events are buffered in memory and bulk-inserted by a background flusher so
+recording one never adds a database write to the request.
+"""
+
+import json
+from collections import namedtuple
+from datetime import datetime
+from flask import has_request_context
+from sqlalchemy import insert, select
+from . import db
+from .batching import BatchFlusher
+from .models import AuditEvent
+from .serializers import serialize_audit_event
+
+Event = namedtuple('Event', [
+    'event_type', 'project_id', 'actor_id', 'actor_email', 'target_type', 'target_id', 'details', 'created_at'
+])
+
+
+class AuditRecorder(BatchFlusher):
+    """Buffers audit events and writes them with one INSERT per batch"""
+
+    def __init__(self):
+        super().__init__('audit', interval=1.0, max_pending=500)
+
+    def write_batch(self, items):
+        db.session.execute(insert(AuditEvent), [event._asdict() for event in items])
+
+
+audit_recorder = AuditRecorder()
+
+
+def init_app(app):
+    """Bind the recorder to the app (AUDIT_FLUSH_INTERVAL / AUDIT_FLUSH_SIZE)"""
+    audit_recorder.init_app(
+        app,
+        interval=app.config.get('AUDIT_FLUSH_INTERVAL', 1.0),
+        max_pending=app.config.get('AUDIT_FLUSH_SIZE', 500)
+    )
+
+
+def record_event(event_type, project_id=None, target_type=None, target_id=None, actor=None, **details):
+    """Queue an audit event; the actor defaults to the caller of the current request"""
+    if actor is None and has_request_context():
+        from .auth import current_user
+        try:
+            actor = current_user()
+        except Exception:
+            actor = None  # Unauthenticated route
+
+    audit_recorder.add(Event(
+        event_type,
+        project_id,
+        actor.id if actor else None,
+        actor.email if actor else None,
+        target_type,
+        target_id,
+        json.dumps(details, default=str) if details else None,
+        datetime.utcnow()
+    ))
+
+
+def _parse_time(value):
+    """Parse an ISO-8601 timestamp from a query parameter"""
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+    except (AttributeError, ValueError):
+        raise ValueError(f"Invalid timestamp: {value}")
+
+
+def query_events(event_types=None, project_id=None, actor_id=None, since=None, until=None,
+                 page=1, per_page=50):
+    """Page through events, newest first; filters map onto the composite indexes"""
+    stmt = select(AuditEvent)
+    if event_types:
+        stmt = stmt.where(AuditEvent.event_type.in_(event_types))
+    if project_id is not None:
+        stmt = stmt.where(AuditEvent.project_id == project_id)
+    if actor_id is not None:
+        stmt = stmt.where(AuditEvent.actor_id == actor_id)
+    if since:
+        stmt = stmt.where(AuditEvent.created_at >= _parse_time(since))
+    if until:
+        stmt = stmt.where(AuditEvent.created_at < _parse_time(until))
+
+    page = max(page, 1)
+    per_page = min(max(per_page, 1), 500)
+    # Fetch one extra row to know whether another page exists without a COUNT(*)
+    rows = db.session.execute(
+        stmt.order_by(AuditEvent.created_at.desc(), AuditEvent.id.desc())
+        .offset((page - 1) * per_page)
+        .limit(per_page + 1)
+    ).scalars().all()
+
+    return {
+        'events': [serialize_audit_event(event) for event in rows[:per_page]],
+        'page': page,
+        'per_page': per_page,
+        'has_more': len(rows) > per_page,
+        'pending': audit_recorder.pending()
+    }
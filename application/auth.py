@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+JWT Identity Resolution
+Per-process LRU/TTL cache mapping JWT identities (user emails) to user snapshots
+"""
+
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import select
+from . import db
+from .models import User
+
+# Small, immutable view of the fields routes need to authorize a request
+UserSnapshot = namedtuple('UserSnapshot', [
+    'id', 'email', 'name', 'role', 'organization', 'approval_state', 'is_active'
+])
+
+
+class IdentityCache:
+    """Thread-safe LRU cache with a time-to-live per entry"""
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, maxsize=None, ttl=None):
+        """Resize the cache or change the TTL; existing entries are dropped"""
+        with self._lock:
+            if maxsize is not None:
+                self.maxsize = maxsize
+            if ttl is not None:
+                self.ttl = ttl
+            self._entries.clear()
+
+    def get(self, identity):
+        """Return the cached snapshot, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(identity)
+            if entry is None:
+                return None
+            snapshot, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[identity]
+                return None
+            self._entries.move_to_end(identity)
+            return snapshot
+
+    def put(self, identity, snapshot):
+        """Store a snapshot, evicting the least recently used entry if full"""
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[identity] = (snapshot, time.monotonic() + self.ttl)
+            self._entries.move_to_end(identity)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, identity=None, user_id=None):
+        """Drop one user by identity (email) and/or database id"""
+        with self._lock:
+            if identity is not None:
+                self._entries.pop(identity, None)
+            if user_id is not None:
+                for key, (snapshot, _) in list(self._entries.items()):
+                    if snapshot.id == user_id:
+                        del self._entries[key]
+
+    def clear(self):
+        """Drop every cached identity"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+identity_cache = IdentityCache()
+
+
+def init_app(app):
+    """Apply IDENTITY_CACHE_SIZE / IDENTITY_CACHE_TTL from the app config"""
+    identity_cache.configure(
+        maxsize=app.config.get('IDENTITY_CACHE_SIZE', 1024),
+        ttl=app.config.get('IDENTITY_CACHE_TTL', 60)
+    )
+
+
+def load_user_snapshot(email):
+    """Fetch only the snapshot columns for one user, bypassing the cache"""
+    row = db.session.execute(
+        select(User.id, User.email, User.name, User.role, User.organization,
+               User.approval_state, User.is_active)
+        .where(User.email == email)
+    ).first()
+    return UserSnapshot(*row) if row else None
+
+
+def current_user():
+    """Resolve the caller of the current JWT-protected request, or None"""
+    return resolve_identity(get_jwt_identity())
+
+
+def resolve_identity(identity):
+    """Map a JWT identity to a cached user snapshot, or None; needs an app context"""
+    if identity is None:
+        return None
+
+    snapshot = identity_cache.get(identity)
+    if snapshot is None:
+        snapshot = load_user_snapshot(identity)
+        # Unknown identities are not cached so a later registration is seen at once
+        if snapshot is not None:
+            identity_cache.put(identity, snapshot)
+    return snapshot
+
+
+def invalidate_user(email=None, user_id=None):
+    """Forget a user after their role, approval state or activity changed"""
+    identity_cache.invalidate(identity=email, user_id=user_id)
+
+
+def invalidate_all_users():
+    """Forget every cached user, e.g. after a set-based UPDATE on users"""
+    identity_cache.clear()
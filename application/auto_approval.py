@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Auto-Approval Rules
+Compiles the enabled ApprovalRule rows into SQL predicates and approves every
+pending application, client or admin that matches one of them with the same
+set-based UPDATEs as batch approvals. Rules are evaluated when rows are
+created and periodically over the whole backlog (see auto_approver.py).
+
+A rule matches a row when every condition it sets matches; a row is approved
+when any enabled rule of its kind matches:
+
+    {"name": "Partner sites", "kind": "clients", "conditions": {"orgs": ["acme", "globex"]}}
+    {"name": "Staff", "kind": "applications", "conditions": {"email_domains": ["sorachain.ai"]}}
+"""
+
+import json
+import threading
+from sqlalchemy import and_, func, or_, select
+from . import db, approvals, audit, auth, project_cache, signals
+from .models import ApprovalRule, Client, Admin, User, UserApplication
+
+RULE_KINDS = {'applications': UserApplication, 'clients': Client, 'admins': Admin}
+# Conditions each kind supports; every condition is a list of accepted values
+RULE_CONDITIONS = {
+    'applications': ['orgs', 'roles', 'email_domains'],  # Applicant's organization and email, role_requested
+    'clients': ['orgs', 'name_prefixes'],
+    'admins': ['orgs', 'roles', 'email_domains'],
+}
+
+# Rows created together (e.g. one import) are matched in id batches that fit SQLite's bind parameter limit
+ID_BATCH_SIZE = 1000
+
+_compiled_lock = threading.Lock()
+_compiled = (None, {})  # (rules stamp, kind -> [predicate])
+
+
+class RuleError(ValueError):
+    """Raised for invalid auto-approval rules"""
+
+
+def parse_rule(data):
+    """Validate rule fields from a request body; returns the column values"""
+    name = (data.get('name') or '').strip()
+    if not name:
+        raise RuleError('Missing required field: name')
+    kind = data.get('kind')
+    if kind not in RULE_KINDS:
+        raise RuleError(f"Invalid kind: {kind} (expected one of {', '.join(RULE_KINDS)})")
+
+    conditions = data.get('conditions')
+    if not isinstance(conditions, dict) or not conditions:
+        raise RuleError('A rule needs at least one condition')
+    unknown = set(conditions) - set(RULE_CONDITIONS[kind])
+    if unknown:
+        raise RuleError(f"Unsupported conditions for {kind}: {', '.join(sorted(unknown))} "
+                        f"(supported: {', '.join(RULE_CONDITIONS[kind])})")
+    cleaned = {}
+    for key, values in conditions.items():
+        if isinstance(values, str):
+            values = [values]
+        if not isinstance(values, list) or not values or not all(isinstance(v, str) and v.strip() for v in values):
+            raise RuleError(f"{key} must be a non-empty list of strings")
+        values = [v.strip() for v in values]
+        if key == 'email_domains':
+            values = [v.lower().lstrip('@') for v in values]
+        cleaned[key] = sorted(set(values))
+
+    project_id = data.get('project_id')
+    if project_id is not None:
+        try:
+            project_id = int(project_id)
+        except (TypeError, ValueError):
+            raise RuleError('project_id must be an integer')
+    return {'name': name, 'kind': kind, 'project_id': project_id,
+            'conditions': json.dumps(cleaned, sort_keys=True), 'enabled': bool(data.get('enabled', True))}
+
+
+def _email_domain_matches(column, domains):
+    return or_(*(func.lower(column).endswith(f"@{domain}", autoescape=True) for domain in domains))
+
+
+def compile_rule(rule):
+    """One rule as a WHERE clause on its kind's table"""
+    model = RULE_KINDS[rule.kind]
+    conditions = json.loads(rule.conditions)
+    clauses = []
+    if rule.project_id is not None:
+        clauses.append(model.project_id == rule.project_id)
+
+    if rule.kind == 'applications':
+        if 'roles' in conditions:
+            clauses.append(UserApplication.role_requested.in_(conditions['roles']))
+        applicant = []
+        if 'orgs' in conditions:
+            applicant.append(User.organization.in_(conditions['orgs']))
+        if 'email_domains' in conditions:
+            applicant.append(_email_domain_matches(User.email, conditions['email_domains']))
+        if applicant:
+            clauses.append(UserApplication.user_id.in_(select(User.id).where(*applicant)))
+    else:
+        if 'orgs' in conditions:
+            clauses.append(model.org.in_(conditions['orgs']))
+        if 'name_prefixes' in conditions:
+            clauses.append(or_(*(Client.name.startswith(prefix, autoescape=True)
+                                 for prefix in conditions['name_prefixes'])))
+        if 'roles' in conditions:
+            clauses.append(Admin.role.in_(conditions['roles']))
+        if 'email_domains' in conditions:
+            clauses.append(_email_domain_matches(Admin.email, conditions['email_domains']))
+    return and_(*clauses)
+
+
+def _rules_stamp():
+    """Changes whenever a rule is added, edited or deleted, on any node"""
+    return tuple(db.session.execute(
+        select(func.count(ApprovalRule.id), func.max(ApprovalRule.id), func.max(ApprovalRule.updated_at))
+    ).one())
+
+
+def compiled_rules():
+    """kind -> predicates of the enabled rules, recompiled only when the rules changed"""
+    global _compiled
+    stamp = _rules_stamp()
+    if _compiled[0] == stamp:
+        return _compiled[1]
+    with _compiled_lock:
+        if _compiled[0] != stamp:
+            predicates = {}
+            for rule in ApprovalRule.query.filter(ApprovalRule.enabled.is_(True)).order_by(ApprovalRule.id):
+                predicates.setdefault(rule.kind, []).append(compile_rule(rule))
+            _compiled = (stamp, predicates)
+    return _compiled[1]
+
+
+def _pending(kind):
+    if kind == 'applications':
+        return UserApplication.status == 'pending'
+    return RULE_KINDS[kind].approval_state == 0
+
+
+def _match_conditions(kind, predicates, ids=None, project_id=None):
+    model = RULE_KINDS[kind]
+    conditions = [_pending(kind), or_(*predicates)]
+    if ids is not None:
+        conditions.append(model.id.in_(ids))
+    if project_id is not None:
+        conditions.append(model.project_id == project_id)
+    return conditions
+
+
+def apply_rules(kinds=None, ids=None, project_id=None):
+    """Approve pending rows matching any enabled rule; the caller commits, then calls after_commit"""
+    summaries = []
+    rules = compiled_rules()
+    id_batches = [None] if ids is None else [ids[i:i + ID_BATCH_SIZE] for i in range(0, len(ids), ID_BATCH_SIZE)]
+    for kind in kinds or list(RULE_KINDS):
+        if not rules.get(kind):
+            continue
+        summary = None
+        for batch in id_batches:
+            part = approvals.review_where(kind, 'approve', None,
+                                          _match_conditions(kind, rules[kind], batch, project_id))
+            summary = part if summary is None else {
+                **summary,
+                'updated': summary['updated'] + part['updated'],
+                'users_approved': summary['users_approved'] + part['users_approved'],
+                'project_ids': sorted(set(summary['project_ids']) | set(part['project_ids']))
+            }
+        if summary and summary['updated']:
+            summaries.append(summary)
+    return summaries
+
+
+def preview(kinds=None):
+    """How many pending rows of each kind the current rules would approve"""
+    rules = compiled_rules()
+    counts = {}
+    for kind in kinds or list(RULE_KINDS):
+        model = RULE_KINDS[kind]
+        counts[kind] = db.session.execute(
+            select(func.count(model.id)).where(*_match_conditions(kind, rules[kind]))
+        ).scalar() if rules.get(kind) else 0
+    return counts
+
+
+def approved_count(summaries, kind):
+    return sum(summary['updated'] for summary in summaries if summary['kind'] == kind)
+
+
+def after_commit(summaries, sender):
+    """Follow-up work of committed auto-approvals, as the batch approval endpoint does it"""
+    for summary in summaries:
+        if summary['users_approved']:
+            auth.invalidate_all_users()
+        for project_id in summary['project_ids']:
+            audit.record_event('approvals.auto', project_id=project_id, kind=summary['kind'],
+                               updated=summary['updated'])
+        # Participant approval changes what goes into the kits
+        if summary['kind'] != 'applications':
+            signals.request_reprovision(sender, summary['project_ids'], f"{summary['kind']}_auto_approve")
+
+
+def run(sender=None):
+    """Evaluate every rule over the whole pending backlog and commit"""
+    summaries = apply_rules()
+    project_cache.bump_version(*{pid for summary in summaries for pid in summary['project_ids']})
+    db.session.commit()
+    after_commit(summaries, sender)
+    return summaries
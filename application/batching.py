@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Batched Background Writes
+In-memory buffers flushed to the database periodically by a daemon thread
+"""
+
+import atexit
+import os
+import threading
+
+
+class BatchFlusher:
+    """Buffer items in memory and write them in batches off the request path
+
+    Subclasses implement write_batch(items), which runs inside an app context.
+    The flush thread is started lazily on first use and restarted after a
+    fork, so pre-forking servers get one flusher per worker process.
+    """
+
+    def __init__(self, name, interval=5.0, max_pending=1000):
+        self.name = name
+        self.interval = interval
+        self.max_pending = max_pending
+        self.app = None
+        self._items = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def init_app(self, app, interval=None, max_pending=None):
+        """Bind the flusher to an app; the flush thread uses its app context"""
+        self.app = app
+        if interval is not None:
+            self.interval = interval
+        if max_pending is not None:
+            self.max_pending = max_pending
+
+    def _ensure_thread(self):
+        """Start the flush thread once per process (called with _lock held)"""
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None:
+            return
+        if self._pid is not None and self._pid != pid:
+            # Forked child: the parent's buffer is not ours to write
+            self._items = []
+        self._pid = pid
+        self._thread = threading.Thread(target=self._run, name=f"{self.name}-flusher", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def add(self, item):
+        """Queue one item; never touches the database"""
+        with self._lock:
+            self._ensure_thread()
+            self._items.append(item)
+            full = len(self._items) >= self.max_pending
+        if full:
+            self._wake.set()
+
+    def pending(self):
+        """Number of buffered items not yet written"""
+        with self._lock:
+            return len(self._items)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of items written"""
+        if self.app is None:
+            return 0
+        with self._flush_lock:
+            with self._lock:
+                items, self._items = self._items, []
+            if not items:
+                return 0
+
+            from . import db
+            with self.app.app_context():
+                try:
+                    self.write_batch(items)
+                    db.session.commit()
+                    return len(items)
+                except Exception as e:
+                    print(f"Error flushing {len(items)} {self.name} items: {e}")
+                    db.session.rollback()
+                    # Put the batch back so the next flush retries it
+                    with self._lock:
+                        if len(self._items) < self.max_pending * 10:
+                            self._items[:0] = items
+                    return 0
+
+    def write_batch(self, items):
+        """Persist a batch of items; the caller commits"""
+        raise NotImplementedError
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Bulk Participant Import
+Parses CSV, YAML or JSON participant lists, validates them as one batch and
+inserts them into a project with bulk inserts in a single transaction
+"""
+
+import csv
+import io
+import json
+import yaml
+from sqlalchemy import insert, select
+from . import db
+from .models import Server, Client, Admin
+
+# Participant type -> model, required fields and per-type defaults
+PARTICIPANT_TYPES = {
+    'server': {
+        'model': Server,
+        'required': ['name', 'org'],
+        'defaults': {
+            'fed_learn_port': 8002,
+            'admin_port': 8003,
+            'connection_security': 'mtls',
+            'approval_state': 1  # Auto-approved, same as add_server
+        }
+    },
+    'client': {
+        'model': Client,
+        'required': ['name', 'org'],
+        'defaults': {
+            'description': '',
+            'num_gpus': 1,
+            'gpu_memory': 16,
+            'approval_state': 0  # Pending approval, same as add_client
+        }
+    },
+    'admin': {
+        'model': Admin,
+        'required': ['email', 'org'],
+        'defaults': {
+            'role': 'project_admin',
+            'approval_state': 1  # Auto-approved, same as add_admin
+        }
+    }
+}
+
+INTEGER_FIELDS = ['fed_learn_port', 'admin_port', 'num_gpus', 'gpu_memory']
+CONNECTION_SECURITY_VALUES = ['mtls', 'tls', 'none']
+
+
+class ImportFormatError(ValueError):
+    """Raised when an import payload cannot be parsed"""
+
+
+def detect_format(content_type=None, filename=None, explicit=None):
+    """Work out the payload format from an explicit hint, file name or content type"""
+    if explicit:
+        fmt = explicit.lower()
+    elif filename and '.' in filename:
+        fmt = filename.rsplit('.', 1)[1].lower()
+    else:
+        content_type = (content_type or '').lower()
+        if 'csv' in content_type:
+            fmt = 'csv'
+        elif 'yaml' in content_type or 'yml' in content_type:
+            fmt = 'yaml'
+        else:
+            fmt = 'json'
+
+    if fmt == 'yml':
+        fmt = 'yaml'
+    if fmt not in ['csv', 'yaml', 'json']:
+        raise ImportFormatError(f"Unsupported import format: {fmt}")
+    return fmt
+
+
+def _normalize_type(value):
+    """Map 'clients', 'Client', ... to the singular participant type"""
+    value = (value or '').strip().lower()
+    if value.endswith('s'):
+        value = value[:-1]
+    return value
+
+
+def _rows_from_document(document):
+    """Flatten a parsed JSON/YAML document into a list of typed rows"""
+    if isinstance(document, list):
+        return document
+    if isinstance(document, dict):
+        # Allow both {'participants': [...]} and {'clients': [...], 'admins': [...]}
+        if 'participants' in document:
+            return _rows_from_document(document['participants'])
+        rows = []
+        for key in ['servers', 'clients', 'admins']:
+            for row in document.get(key) or []:
+                if isinstance(row, dict):
+                    row = dict(row)
+                    row.setdefault('type', key)
+                rows.append(row)
+        return rows
+    raise ImportFormatError("Import document must be a list or a mapping of participant lists")
+
+
+def parse_participants(raw, fmt):
+    """Parse raw payload bytes/text into a list of row dicts"""
+    if isinstance(raw, bytes):
+        raw = raw.decode('utf-8-sig')
+
+    try:
+        if fmt == 'csv':
+            reader = csv.DictReader(io.StringIO(raw))
+            if not reader.fieldnames or 'type' not in [f.strip() for f in reader.fieldnames]:
+                raise ImportFormatError("CSV import requires a 'type' column")
+            # Drop empty cells so that defaults apply
+            return [{k.strip(): v.strip() for k, v in row.items() if k and v not in (None, '')}
+                    for row in reader]
+        if fmt == 'yaml':
+            return _rows_from_document(yaml.safe_load(raw) or [])
+        return _rows_from_document(json.loads(raw or '[]'))
+    except ImportFormatError:
+        raise
+    except (yaml.YAMLError, ValueError, csv.Error) as e:
+        raise ImportFormatError(f"Could not parse {fmt} payload: {e}")
+
+
+def _existing_keys(project_id):
+    """Load the names/emails already used in a project"""
+    return {
+        'server': set(db.session.execute(select(Server.name).where(Server.project_id == project_id)).scalars()),
+        'client': set(db.session.execute(select(Client.name).where(Client.project_id == project_id)).scalars()),
+        'admin': set(db.session.execute(select(Admin.email).where(Admin.project_id == project_id)).scalars())
+    }
+
+
+def validate_participants(project_id, rows):
+    """Validate all rows in one pass; returns (per-row results, valid rows grouped by type)"""
+    names = _existing_keys(project_id)
+    results = []
+    valid = {'server': [], 'client': [], 'admin': []}
+
+    for index, row in enumerate(rows):
+        errors = []
+        if not isinstance(row, dict):
+            results.append({'row': index, 'status': 'error', 'errors': ['Row must be an object']})
+            continue
+
+        participant_type = _normalize_type(row.get('type'))
+        spec = PARTICIPANT_TYPES.get(participant_type)
+        if not spec:
+            results.append({'row': index, 'status': 'error',
+                            'errors': [f"Invalid participant type: {row.get('type')}"]})
+            continue
+
+        key_field = 'email' if participant_type == 'admin' else 'name'
+        key = row.get(key_field)
+        result = {'row': index, 'type': participant_type, key_field: key}
+
+        # Required fields
+        for field in spec['required']:
+            if not row.get(field):
+                errors.append(f'Missing required field: {field}')
+
+        # Build the insert values from the defaults and the supplied fields
+        values = dict(spec['defaults'])
+        for field in spec['model'].__table__.columns.keys():
+            if field in row and field not in ['id', 'project_id', 'approval_state', 'download_count', 'created_at']:
+                values[field] = row[field]
+
+        for field in INTEGER_FIELDS:
+            if field in values:
+                try:
+                    values[field] = int(values[field])
+                except (TypeError, ValueError):
+                    errors.append(f'Invalid integer for {field}: {values[field]}')
+
+        if participant_type == 'server' and not errors:
+            if values['connection_security'] not in CONNECTION_SECURITY_VALUES:
+                errors.append(f"Invalid connection_security: {values['connection_security']}")
+            for field in ['fed_learn_port', 'admin_port']:
+                if not 0 < values[field] < 65536:
+                    errors.append(f'Port out of range for {field}: {values[field]}')
+            # The server name is its host name and must be unique, so ports can only clash within a row
+            if values['fed_learn_port'] == values['admin_port']:
+                errors.append(f"fed_learn_port and admin_port clash on port {values['fed_learn_port']}")
+
+        if key and key in names[participant_type]:
+            errors.append(f'Duplicate {participant_type} {key_field}: {key}')
+
+        if errors:
+            result.update({'status': 'error', 'errors': errors})
+        else:
+            # Reserve the name so later rows in the batch see it
+            names[participant_type].add(key)
+            values['project_id'] = project_id
+            valid[participant_type].append((result, values))
+            result['status'] = 'valid'
+        results.append(result)
+
+    return results, valid
+
+
+def insert_participants(valid):
+    """Bulk insert the validated rows; the caller owns the transaction"""
+    counts = {}
+    for participant_type, entries in valid.items():
+        counts[participant_type + 's'] = len(entries)
+        if not entries:
+            continue
+        model = PARTICIPANT_TYPES[participant_type]['model']
+        # Group rows by column set so each executemany batch is homogeneous
+        batches = {}
+        for result, values in entries:
+            batches.setdefault(tuple(sorted(values)), []).append((result, values))
+        for batch in batches.values():
+            stmt = insert(model).returning(model.id, sort_by_parameter_order=True)
+            ids = db.session.execute(stmt, [values for _, values in batch]).scalars().all()
+            for (result, _), new_id in zip(batch, ids):
+                result['status'] = 'created'
+                result['id'] = new_id
+    return counts
+
+
+def import_participants(project_id, rows, atomic=True):
+    """Validate and insert participants in one transaction; returns a summary dict"""
+    results, valid = validate_participants(project_id, rows)
+    error_count = sum(1 for r in results if r['status'] == 'error')
+
+    if error_count and atomic:
+        # All-or-nothing: report what would have been inserted but write nothing
+        for result in results:
+            if result['status'] == 'valid':
+                result['status'] = 'skipped'
+        return {'imported': {'servers': 0, 'clients': 0, 'admins': 0},
+                'errors': error_count, 'results': results}
+
+    counts = insert_participants(valid)
+    return {'imported': counts, 'errors': error_count, 'results': results}
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Response Compression
+Negotiated brotli/gzip compression of text responses above a size threshold
+"""
+
+import gzip
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip only
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = ['application/json', 'text/html', 'text/plain', 'text/csv', 'application/x-yaml']
+
+
+def _choose_encoding():
+    """Pick the best encoding the client accepts, preferring brotli"""
+    accepted = request.accept_encodings
+    candidates = (['br'] if brotli else []) + ['gzip']
+    best, best_quality = None, 0
+    for encoding in candidates:
+        quality = accepted[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress_response(response):
+    """after_request hook: compress eligible responses in place"""
+    config = current_app.config
+    if (response.status_code < 200 or response.status_code >= 300
+            or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    data = response.get_data()
+    if len(data) < config.get('COMPRESS_MIN_SIZE', 1024):
+        return response
+
+    encoding = _choose_encoding()
+    response.vary.add('Accept-Encoding')
+    if encoding is None:
+        return response
+
+    if encoding == 'br':
+        compressed = brotli.compress(data, quality=config.get('COMPRESS_BR_QUALITY', 4))
+    else:
+        compressed = gzip.compress(data, compresslevel=config.get('COMPRESS_LEVEL', 6), mtime=0)
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    # The compressed body is a different representation, so a strong ETag becomes weak
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    """Register the compression hook (COMPRESS_MIN_SIZE, COMPRESS_LEVEL, COMPRESS_BR_QUALITY)"""
+    if app.config.get('COMPRESS_ENABLED', True):
+        app.after_request(compress_response)
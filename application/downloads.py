@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Download Accounting
+Buffers startup kit downloads in memory and flushes them as atomic
+download_count increments plus a per-download event log
+"""
+
+from collections import Counter, namedtuple
+from datetime import datetime
+from sqlalchemy import bindparam, func, insert, select, update
+from . import db
+from .batching import BatchFlusher
+from .models import User, Server, Client, Admin, DownloadEvent
+from .serializers import serialize_download_event
+
+PARTICIPANT_MODELS = {'server': Server, 'client': Client, 'admin': Admin}
+
+# One buffered download; participant_id is resolved at flush time when not given
+Download = namedtuple('Download', [
+    'user_id', 'user_email', 'project_id', 'target_type', 'participant_id', 'created_at'
+])
+
+
+def _increment(model, counts):
+    """UPDATE model SET download_count = download_count + n for each (id, n)"""
+    if not counts:
+        return
+    stmt = (
+        update(model.__table__)
+        .where(model.__table__.c.id == bindparam('b_id'))
+        .values(download_count=func.coalesce(model.__table__.c.download_count, 0) + bindparam('b_n'))
+    )
+    db.session.execute(stmt, [{'b_id': row_id, 'b_n': n} for row_id, n in counts.items()])
+
+
+def participant_in_project(project_id, target_type, participant_id):
+    """Whether participant_id names a target_type participant of the project"""
+    model = PARTICIPANT_MODELS.get(target_type)
+    if model is None:
+        return False
+    return db.session.execute(
+        select(model.id).where(model.id == participant_id, model.project_id == project_id)
+    ).first() is not None
+
+
+class DownloadTracker(BatchFlusher):
+    """Collects kit downloads and writes them in batches"""
+
+    def __init__(self):
+        super().__init__('download', interval=5.0, max_pending=1000)
+
+    def record(self, user_id, user_email, project_id, target_type, participant_id=None):
+        """Note one download; cheap enough for the download path"""
+        self.add(Download(user_id, user_email, project_id, target_type, participant_id, datetime.utcnow()))
+
+    def _resolve_participants(self, downloads):
+        """Fill in participant ids for server/admin downloads with two batched queries"""
+        unresolved = [d for d in downloads if d.participant_id is None]
+        server_projects = {d.project_id for d in unresolved if d.target_type == 'server'}
+        admin_projects = {d.project_id for d in unresolved if d.target_type == 'admin'}
+
+        # The primary (first) server is the one that goes into the kit
+        primary_servers = dict(db.session.execute(
+            select(Server.project_id, func.min(Server.id))
+            .where(Server.project_id.in_(server_projects))
+            .group_by(Server.project_id)
+        ).all()) if server_projects else {}
+
+        admins = {(project_id, email): admin_id for admin_id, project_id, email in db.session.execute(
+            select(Admin.id, Admin.project_id, Admin.email).where(Admin.project_id.in_(admin_projects))
+        )} if admin_projects else {}
+
+        resolved = []
+        for d in downloads:
+            if d.participant_id is None:
+                if d.target_type == 'server':
+                    d = d._replace(participant_id=primary_servers.get(d.project_id))
+                elif d.target_type == 'admin':
+                    d = d._replace(participant_id=admins.get((d.project_id, d.user_email)))
+            resolved.append(d)
+        return resolved
+
+    def write_batch(self, items):
+        downloads = self._resolve_participants(items)
+
+        _increment(User, Counter(d.user_id for d in downloads if d.user_id is not None))
+        for target_type, model in PARTICIPANT_MODELS.items():
+            _increment(model, Counter(
+                d.participant_id for d in downloads
+                if d.target_type == target_type and d.participant_id is not None
+            ))
+
+        db.session.execute(insert(DownloadEvent), [{
+            'user_id': d.user_id,
+            'project_id': d.project_id,
+            'target_type': d.target_type,
+            'participant_id': d.participant_id,
+            'created_at': d.created_at
+        } for d in downloads])
+        print(f"Flushed {len(downloads)} download events")
+
+
+download_tracker = DownloadTracker()
+
+
+def init_app(app):
+    """Bind the download tracker to the app (DOWNLOAD_FLUSH_INTERVAL / DOWNLOAD_FLUSH_SIZE)"""
+    download_tracker.init_app(
+        app,
+        interval=app.config.get('DOWNLOAD_FLUSH_INTERVAL', 5.0),
+        max_pending=app.config.get('DOWNLOAD_FLUSH_SIZE', 1000)
+    )
+
+
+def project_download_stats(project_id, recent=50):
+    """Aggregate download counts per participant plus the most recent events"""
+    last_download = dict(
+        ((target_type, participant_id), last_at) for target_type, participant_id, last_at in db.session.execute(
+            select(DownloadEvent.target_type, DownloadEvent.participant_id, func.max(DownloadEvent.created_at))
+            .where(DownloadEvent.project_id == project_id)
+            .group_by(DownloadEvent.target_type, DownloadEvent.participant_id)
+        )
+    )
+
+    participants = {}
+    for target_type, model in PARTICIPANT_MODELS.items():
+        label = model.email if model is Admin else model.name
+        rows = db.session.execute(
+            select(model.id, label, model.download_count).where(model.project_id == project_id)
+        ).all()
+        participants[target_type + 's'] = [{
+            'id': row_id,
+            'name': name,
+            'download_count': count or 0,
+            'last_downloaded_at': last_download[(target_type, row_id)].isoformat()
+            if (target_type, row_id) in last_download else None
+        } for row_id, name, count in rows]
+
+    events = db.session.execute(
+        select(DownloadEvent, User.email)
+        .outerjoin(User, User.id == DownloadEvent.user_id)
+        .where(DownloadEvent.project_id == project_id)
+        .order_by(DownloadEvent.created_at.desc(), DownloadEvent.id.desc())
+        .limit(recent)
+    ).all()
+
+    total = db.session.execute(
+        select(func.count(DownloadEvent.id)).where(DownloadEvent.project_id == project_id)
+    ).scalar()
+
+    return {
+        'project_id': project_id,
+        'total_downloads': total,
+        'pending': download_tracker.pending(),
+        'participants': participants,
+        'recent': [serialize_download_event(event, email) for event, email in events]
+    }
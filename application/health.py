@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Liveness and Readiness
+/livez answers from memory and only says the process serves requests.
+/readyz checks what requests depend on: each database answers, the schema
+matches the models, and the workspace is writable. The readiness result is
+cached for READINESS_CACHE_TTL seconds and computed by one thread at a time,
+so frequent probes from several load balancers cost one check per interval.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import text
+from . import db, sqlite_file_missing
+from .models import SchemaVersion, schema_fingerprint
+from .provisioning import get_service
+
+
+class ReadinessCache:
+    """Last readiness result per process, refreshed at most once per TTL"""
+
+    def __init__(self, ttl=5.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._result = None
+        self._checked = 0.0
+
+    def get(self):
+        result = self._result
+        if result is not None and time.monotonic() - self._checked < self.ttl:
+            return result, True
+        with self._lock:
+            # Another probe may have refreshed it while this one waited
+            if self._result is not None and time.monotonic() - self._checked < self.ttl:
+                return self._result, True
+            self._result = check_readiness()
+            self._checked = time.monotonic()
+            return self._result, False
+
+    def clear(self):
+        with self._lock:
+            self._result = None
+
+
+readiness_cache = ReadinessCache()
+_fingerprint = None
+
+
+def _timed(check):
+    started = time.perf_counter()
+    try:
+        detail = check()
+        ok = True
+    except Exception as e:
+        db.session.rollback()
+        detail, ok = str(e), False
+    return {'ok': ok, 'detail': detail, 'ms': round((time.perf_counter() - started) * 1000, 2)}
+
+
+def _check_databases():
+    connected = 0
+    for bind_key, engine in db.engines.items():
+        if bind_key is not None and sqlite_file_missing(engine):
+            continue  # Created on first use; connecting would create an empty file
+        with engine.connect() as conn:
+            conn.execute(text('SELECT 1'))
+        connected += 1
+    return f"{connected} connected"
+
+
+def _check_schema():
+    global _fingerprint
+    if _fingerprint is None:
+        _fingerprint = schema_fingerprint()  # Models do not change while the process runs
+    stamp = db.session.get(SchemaVersion, 1)
+    if stamp is None:
+        raise RuntimeError('schema not initialized')
+    if stamp.fingerprint != _fingerprint:
+        raise RuntimeError('schema differs from the models; run init_database')
+    return stamp.fingerprint[:12]
+
+
+def _check_workspace():
+    # Also builds the provisioning service, so the first real request does not pay for it
+    workspace = get_service().workspace_dir
+    if not os.access(workspace, os.W_OK):
+        raise RuntimeError(f"{workspace} is not writable")
+    return workspace
+
+
+def check_readiness():
+    """Run every check; the NVFlare binary is reported but optional (workers may run it elsewhere)"""
+    checks = {
+        'database': _timed(_check_databases),
+        'schema': _timed(_check_schema),
+        'workspace': _timed(_check_workspace),
+    }
+    nvflare_bin = get_service().nvflare_bin
+    checks['nvflare'] = {'ok': os.access(nvflare_bin, os.X_OK), 'detail': nvflare_bin, 'optional': True}
+    ready = all(check['ok'] for check in checks.values() if not check.get('optional'))
+    return {'status': 'ready' if ready else 'not_ready', 'checks': checks,
+            'checked_at': datetime.utcnow().isoformat()}
+
+
+def init_app(app):
+    readiness_cache.ttl = app.config.get('READINESS_CACHE_TTL', 5.0)
+    readiness_cache.clear()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Provisioning Job Queue
+DB-backed queue that lets provisioning run in separate worker processes,
+possibly on other nodes sharing the database and the workspace path.
+Workers claim jobs with a single conditional UPDATE, hold them under a lease
+they renew with heartbeats, and report the result back on the job row. A job
+whose worker stops heartbeating is claimed again once its lease expires.
+"""
+
+from datetime import datetime, timedelta
+from sqlalchemy import and_, case, or_, select, update
+from . import db
+from .models import Project, ProvisioningJob
+from .serializers import serialize_provisioning_job
+
+JOB_STATUSES = ['queued', 'running', 'succeeded', 'failed']
+
+
+def enqueue(project_id, requested_by=None, reason=None, max_attempts=3):
+    """Queue a provisioning run; a job already waiting for the project is reused. The caller commits"""
+    existing = db.session.execute(
+        select(ProvisioningJob)
+        .where(ProvisioningJob.project_id == project_id, ProvisioningJob.status == 'queued')
+        .order_by(ProvisioningJob.id)
+        .limit(1)
+    ).scalar()
+    if existing is not None:
+        return existing
+
+    job = ProvisioningJob(project_id=project_id, requested_by=requested_by, reason=reason,
+                          max_attempts=max_attempts, status='queued', created_at=datetime.utcnow())
+    db.session.add(job)
+    db.session.flush()
+    return job
+
+
+def _claimable(now):
+    """Queued jobs, plus running jobs whose worker stopped renewing the lease"""
+    return and_(
+        or_(ProvisioningJob.status == 'queued',
+            and_(ProvisioningJob.status == 'running', ProvisioningJob.lease_expires_at < now)),
+        ProvisioningJob.attempts < ProvisioningJob.max_attempts
+    )
+
+
+def claim(worker_id, lease_seconds=60, skip_reasons=()):
+    """Atomically take the oldest claimable job; returns (job_id, project_id, reason) or None
+
+    The candidate is re-checked in the UPDATE's own WHERE clause, so two
+    workers racing for the same row cannot both win. Projects that already
+    have a job under a live lease are skipped so one workspace is never
+    provisioned twice at once, and so are jobs queued for one of skip_reasons.
+    """
+    now = datetime.utcnow()
+
+    # Jobs abandoned on their last attempt will never be claimed again
+    db.session.execute(
+        update(ProvisioningJob)
+        .where(ProvisioningJob.status == 'running',
+               ProvisioningJob.lease_expires_at < now,
+               ProvisioningJob.attempts >= ProvisioningJob.max_attempts)
+        .values(status='failed', finished_at=now, error='Lease expired on the final attempt')
+        .execution_options(synchronize_session=False)
+    )
+
+    busy_projects = (
+        select(ProvisioningJob.project_id)
+        .where(ProvisioningJob.status == 'running', ProvisioningJob.lease_expires_at >= now)
+    )
+    candidate = (
+        select(ProvisioningJob.id)
+        .where(_claimable(now), ProvisioningJob.project_id.not_in(busy_projects),
+               or_(ProvisioningJob.reason.is_(None), ProvisioningJob.reason.not_in(list(skip_reasons))))
+        .order_by(ProvisioningJob.created_at, ProvisioningJob.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    row = db.session.execute(
+        update(ProvisioningJob)
+        .where(ProvisioningJob.id == candidate, _claimable(now))
+        .values(status='running', worker_id=worker_id, attempts=ProvisioningJob.attempts + 1,
+                started_at=now, heartbeat_at=now, lease_expires_at=now + timedelta(seconds=lease_seconds),
+                error=None)
+        .returning(ProvisioningJob.id, ProvisioningJob.project_id, ProvisioningJob.reason)
+        .execution_options(synchronize_session=False)
+    ).first()
+    db.session.commit()
+    return tuple(row) if row else None
+
+
+def heartbeat(job_id, worker_id, lease_seconds=60):
+    """Extend the lease; False means the job was taken over and the worker must stop"""
+    now = datetime.utcnow()
+    result = db.session.execute(
+        update(ProvisioningJob)
+        .where(ProvisioningJob.id == job_id, ProvisioningJob.worker_id == worker_id,
+               ProvisioningJob.status == 'running')
+        .values(heartbeat_at=now, lease_expires_at=now + timedelta(seconds=lease_seconds))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def complete(job_id, worker_id, workspace):
+    """Record a successful run; False if the lease had already been lost"""
+    result = db.session.execute(
+        update(ProvisioningJob)
+        .where(ProvisioningJob.id == job_id, ProvisioningJob.worker_id == worker_id,
+               ProvisioningJob.status == 'running')
+        .values(status='succeeded', workspace=workspace, finished_at=datetime.utcnow(), lease_expires_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def fail(job_id, worker_id, error, retry=True):
+    """Record a failed attempt; the job is queued again while attempts remain, unless retry is False"""
+    retry = and_(ProvisioningJob.attempts < ProvisioningJob.max_attempts, retry)
+    result = db.session.execute(
+        update(ProvisioningJob)
+        .where(ProvisioningJob.id == job_id, ProvisioningJob.worker_id == worker_id,
+               ProvisioningJob.status == 'running')
+        .values(status=case((retry, 'queued'), else_='failed'),
+                finished_at=case((retry, None), else_=datetime.utcnow()),
+                error=str(error)[:4000], lease_expires_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def release(job_id, worker_id):
+    """Hand a claimed job back to the queue untouched, without using up one of its attempts"""
+    result = db.session.execute(
+        update(ProvisioningJob)
+        .where(ProvisioningJob.id == job_id, ProvisioningJob.worker_id == worker_id,
+               ProvisioningJob.status == 'running')
+        .values(status='queued', attempts=ProvisioningJob.attempts - 1, worker_id=None,
+                started_at=None, heartbeat_at=None, lease_expires_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def project_jobs(project_id, limit=20):
+    """Most recent jobs of one project, newest first"""
+    jobs = db.session.execute(
+        select(ProvisioningJob)
+        .where(ProvisioningJob.project_id == project_id)
+        .order_by(ProvisioningJob.created_at.desc(), ProvisioningJob.id.desc())
+        .limit(limit)
+    ).scalars()
+    return [serialize_provisioning_job(job) for job in jobs]
+
+
+def on_reprovision_requested(sender, project_id=None, reason=None, **extra):
+    """reprovision_requested receiver used when PROVISION_MODE is 'queue'"""
+    if db.session.execute(select(Project.frozen).where(Project.id == project_id)).scalar():
+        return  # Frozen projects keep their sealed kits
+    enqueue(project_id, reason=reason)
+    db.session.commit()
+
+
+def init_app(app):
+    """In queue mode, participant changes that need new kits enqueue a provisioning job"""
+    from .signals import reprovision_requested
+    if app.config.get('PROVISION_MODE', 'inline') == 'queue':
+        reprovision_requested.connect(on_reprovision_requested)
+    else:
+        reprovision_requested.disconnect(on_reprovision_requested)
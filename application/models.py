@@ -3,6 +3,7 @@
 Database Models for Sorachain Provisioning Dashboard
 """
 
+import hashlib
 from datetime import datetime
 from . import db
 
@@ -83,6 +84,129 @@ class UserApplication(db.Model):
     reviewed_at = db.Column(db.DateTime)
     reviewed_by = db.Column(db.Integer, db.ForeignKey('user.id'))
 
+class ProjectVersion(db.Model):
+    """Per-project change counter, bumped by every route that mutates a project"""
+    project_id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class DownloadEvent(db.Model):
+    """Append-only log of startup kit downloads"""
+    __table_args__ = (
+        db.Index('ix_download_event_project_created', 'project_id', 'created_at'),
+        db.Index('ix_download_event_user_created', 'user_id', 'created_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False)
+    target_type = db.Column(db.String(64), nullable=False)  # server, client, admin
+    participant_id = db.Column(db.Integer)  # Server/Client/Admin id, when known
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class AuditEvent(db.Model):
+    """Append-only audit trail of changes made through the API"""
+    __table_args__ = (
+        db.Index('ix_audit_event_project_created', 'project_id', 'created_at'),
+        db.Index('ix_audit_event_actor_created', 'actor_id', 'created_at'),
+        db.Index('ix_audit_event_type_created', 'event_type', 'created_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    event_type = db.Column(db.String(64), nullable=False)  # e.g. project.updated, client.added
+    project_id = db.Column(db.Integer)  # No FK so the trail outlives deleted projects
+    actor_id = db.Column(db.Integer)
+    actor_email = db.Column(db.String(128))
+    target_type = db.Column(db.String(64))
+    target_id = db.Column(db.Integer)
+    details = db.Column(db.Text)  # JSON
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ProvisioningJob(db.Model):
+    """Queued provisioning run, claimed by a worker under a renewable lease"""
+    __table_args__ = (
+        db.Index('ix_provisioning_job_status_created', 'status', 'created_at'),
+        db.Index('ix_provisioning_job_project_created', 'project_id', 'created_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False)
+    status = db.Column(db.String(32), nullable=False, default='queued')  # queued, running, succeeded, failed
+    reason = db.Column(db.String(128))
+    requested_by = db.Column(db.Integer)  # User id, None for system triggers
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    worker_id = db.Column(db.String(128))
+    lease_expires_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+    workspace = db.Column(db.String(512))
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+class WorkspaceLocation(db.Model):
+    """Where a project's NVFlare workspace lives, relative to the workspace root"""
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), primary_key=True)
+    path = db.Column(db.String(512), nullable=False)
+    layout = db.Column(db.String(16), nullable=False, default='sharded')  # flat, sharded
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class CertificateIndex(db.Model):
+    """Earliest certificate expiry per provisioned workspace, rescanned only when its files change"""
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), primary_key=True)
+    workspace_stamp = db.Column(db.String(64), nullable=False)  # Digest of cert paths, sizes and mtimes
+    certificate_count = db.Column(db.Integer, nullable=False, default=0)
+    earliest_expiry = db.Column(db.DateTime, index=True)  # None when no certificate could be read
+    earliest_certificate = db.Column(db.String(512))  # Path relative to the workspace
+    scanned_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ApprovalRule(db.Model):
+    """Auto-approval rule: pending rows of one kind matching every condition get approved"""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(128), nullable=False)
+    kind = db.Column(db.String(32), nullable=False)  # applications, clients, admins
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id'))  # None: every project
+    conditions = db.Column(db.Text, nullable=False)  # JSON: orgs, roles, email_domains
+    enabled = db.Column(db.Boolean, default=True)
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ArchivedProject(db.Model):
+    """Marks a project whose data was moved to the archive database; list queries skip it"""
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), primary_key=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    archived_by = db.Column(db.Integer)  # User id, None for the CLI
+
+class ProjectArchive(db.Model):
+    """Cold copy of an archived project, kept in the separate archive database"""
+    __bind_key__ = 'archive'
+    project_id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(128), nullable=False)
+    snapshot = db.deferred(db.Column(db.LargeBinary, nullable=False))  # gzip NDJSON of whole rows, see archival.py
+    snapshot_size = db.Column(db.Integer, nullable=False)
+    counts = db.Column(db.Text)  # JSON: rows per table
+    workspace_archive = db.Column(db.String(512))  # tar.gz of workspace and seal, None if there was none
+    workspace_size = db.Column(db.Integer, default=0)
+    last_activity = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    archived_by = db.Column(db.Integer)
+
+class SchemaVersion(db.Model):
+    """Fingerprint of the schema init_database last created, so restarts can skip create_all"""
+    id = db.Column(db.Integer, primary_key=True)  # Single row, id 1
+    fingerprint = db.Column(db.String(64), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+def schema_fingerprint():
+    """Digest of every table, column and index of every bind; changes with the models"""
+    digest = hashlib.sha1()
+    for bind_key in sorted(db.metadatas, key=lambda key: key or ''):
+        for table in sorted(db.metadatas[bind_key].tables.values(), key=lambda t: t.name):
+            digest.update(f"{bind_key}.{table.name}\n".encode())
+            for column in table.columns:
+                digest.update(f"{column.name}:{column.type!r}:{column.nullable}:{column.primary_key}\n".encode())
+            for index in sorted(table.indexes, key=lambda i: i.name or ''):
+                digest.update(f"{index.name}:{[c.name for c in index.columns]}\n".encode())
+    return digest.hexdigest()
+
 def init_default_data():
     """Initialize default data if database is empty"""
     try:
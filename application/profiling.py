@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+On-Demand Request Profiling
+An admin adds `X-Profile: cprofile|sample` (or `?profile=cprofile|sample`) to a
+request to run it under a deterministic (cProfile) or sampling profiler,
+with every SQL statement and its timing recorded. Profiles go to a bounded
+on-disk ring and are listed and fetched through /api/v1/profiles. SQL
+listeners exist only while a profiled request is running. cProfile hooks
+the whole interpreter, so one cProfile session runs at a time per process;
+concurrent requests asking for it are sampled instead. Profiling is opt-in:
+without PROFILING_ENABLED=1 no hook is registered at all.
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from flask import current_app, g, request
+from flask_jwt_extended import verify_jwt_in_request
+from sqlalchemy import event
+
+PROFILE_MODES = ['cprofile', 'sample']
+PROFILE_ID = re.compile(r'^[0-9a-f]{12}$')
+TOP_FUNCTIONS = 40
+MAX_SQL_STATEMENTS = 2000
+# Held by the one request running under cProfile in this process
+_cprofile_lock = threading.Lock()
+
+
+class SamplingProfiler:
+    """Samples one thread's stack from a helper thread at a fixed interval"""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def enable(self):
+        self._thread = threading.Thread(target=self._run, name='request-sampler', daemon=True)
+        self._thread.start()
+
+    def disable(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+                self.samples += 1
+
+    def report(self):
+        """Top stacks in collapsed (flamegraph) form plus per-function self samples"""
+        own = Counter()
+        for stack, count in self.stacks.items():
+            own[stack.rsplit(';', 1)[-1]] += count
+        return {
+            'interval_ms': self.interval * 1000,
+            'samples': self.samples,
+            'top_self': [{'function': name, 'samples': count} for name, count in own.most_common(TOP_FUNCTIONS)],
+            'collapsed': [f"{stack} {count}" for stack, count in self.stacks.most_common(200)]
+        }
+
+
+def _cprofile_report(profiler):
+    """Top functions by cumulative time from a finished cProfile run"""
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_FUNCTIONS]
+    return {
+        'total_calls': stats.total_calls,
+        'top_cumulative': [{
+            'function': name,
+            'file': filename,
+            'line': line,
+            'ncalls': ncalls,
+            'tottime_ms': round(tottime * 1000, 3),
+            'cumtime_ms': round(cumtime * 1000, 3)
+        } for (filename, line, name), (_, ncalls, tottime, cumtime, _) in rows]
+    }
+
+
+class ProfileSession:
+    """State of one profiled request"""
+
+    def __init__(self, mode, user, requested_mode=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.mode = mode
+        self.requested_mode = requested_mode or mode
+        self.user = user
+        self.thread_id = threading.get_ident()
+        self.sql = []
+        self.sql_dropped = 0
+        self.started = time.perf_counter()
+        self.started_at = datetime.utcnow()
+        if mode == 'sample':
+            self.profiler = SamplingProfiler(self.thread_id, current_app.config.get('PROFILE_SAMPLE_INTERVAL', 0.005))
+        else:
+            self.profiler = cProfile.Profile()
+
+
+class SQLRecorder:
+    """Engine listeners that are attached only while at least one request is profiled"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}  # thread id -> ProfileSession
+        self._engine = None
+
+    def start(self, engine, session):
+        with self._lock:
+            if not self._sessions:
+                event.listen(engine, 'before_cursor_execute', self._before)
+                event.listen(engine, 'after_cursor_execute', self._after)
+                self._engine = engine
+            self._sessions[session.thread_id] = session
+
+    def stop(self, session):
+        with self._lock:
+            self._sessions.pop(session.thread_id, None)
+            if not self._sessions and self._engine is not None:
+                event.remove(self._engine, 'before_cursor_execute', self._before)
+                event.remove(self._engine, 'after_cursor_execute', self._after)
+                self._engine = None
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() in self._sessions:
+            conn.info.setdefault('profile_query_start', []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        session = self._sessions.get(threading.get_ident())
+        if session is None:
+            return
+        started = conn.info['profile_query_start'].pop()
+        if len(session.sql) >= MAX_SQL_STATEMENTS:
+            session.sql_dropped += 1
+            return
+        # Parameters are left out on purpose; they can hold credentials
+        session.sql.append({
+            'statement': statement,
+            'executemany': executemany,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 3)
+        })
+
+
+sql_recorder = SQLRecorder()
+
+
+class ProfileStore:
+    """Ring of the newest N profiles as JSON files in one directory"""
+
+    def __init__(self, directory, max_profiles=50):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+
+    def _files(self):
+        try:
+            return sorted(name for name in os.listdir(self.directory) if name.endswith('.json'))
+        except FileNotFoundError:
+            return []
+
+    def save(self, profile):
+        os.makedirs(self.directory, exist_ok=True)
+        # Names sort by creation time so the oldest are trimmed first
+        name = f"{time.time_ns():020d}-{profile['id']}.json"
+        path = os.path.join(self.directory, name)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(profile, f)
+        os.replace(path + '.tmp', path)
+        with self._lock:
+            files = self._files()
+            for old in files[:max(len(files) - self.max_profiles, 0)]:
+                try:
+                    os.unlink(os.path.join(self.directory, old))
+                except FileNotFoundError:
+                    pass
+
+    def list(self):
+        """Summaries of stored profiles, newest first"""
+        summaries = []
+        for name in reversed(self._files()):
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    profile = json.load(f)
+            except (OSError, ValueError):
+                continue
+            summaries.append({key: profile.get(key) for key in (
+                'id', 'mode', 'method', 'path', 'status', 'duration_ms', 'sql_count', 'sql_ms', 'user', 'created_at'
+            )})
+        return summaries
+
+    def get(self, profile_id):
+        if not PROFILE_ID.match(profile_id or ''):
+            return None
+        for name in self._files():
+            if name.endswith(f"-{profile_id}.json"):
+                with open(os.path.join(self.directory, name)) as f:
+                    return json.load(f)
+        return None
+
+
+profile_store = None
+
+
+def _requested_mode():
+    """Profiling mode asked for by this request, or None (the only work done when unprofiled)"""
+    value = request.headers.get('X-Profile') or request.args.get('profile')
+    if not value:
+        return None
+    value = value.lower()
+    return value if value in PROFILE_MODES else 'cprofile'
+
+
+def start_profile():
+    """before_request hook"""
+    mode = _requested_mode()
+    if mode is None:
+        return
+
+    from . import auth, db
+    try:
+        verify_jwt_in_request(optional=True)
+        user = auth.current_user()
+    except Exception:
+        user = None
+    if not user or user.role not in ['admin', 'proj_admin']:
+        return  # Silently ignored for everyone else
+
+    requested = mode
+    if mode == 'cprofile' and not _cprofile_lock.acquire(blocking=False):
+        mode = 'sample'  # Another request in this process is already under cProfile
+    try:
+        session = ProfileSession(mode, user.email, requested)
+    except Exception:
+        if mode == 'cprofile':
+            _cprofile_lock.release()
+        raise
+    g._profile_session = session
+    sql_recorder.start(db.engine, session)
+    session.profiler.enable()
+
+
+def _stop(session):
+    session.profiler.disable()
+    sql_recorder.stop(session)
+    if session.mode == 'cprofile':
+        _cprofile_lock.release()
+
+
+def finish_profile(response):
+    """after_request hook: stop the profiler and store the result"""
+    session = g.pop('_profile_session', None)
+    if session is None:
+        return response
+
+    _stop(session)
+    duration = time.perf_counter() - session.started
+
+    profile = {
+        'id': session.id,
+        'mode': session.mode,
+        'requested_mode': session.requested_mode,
+        'method': request.method,
+        'path': request.full_path.rstrip('?'),
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 3),
+        'user': session.user,
+        'created_at': session.started_at.isoformat(),
+        'sql_count': len(session.sql) + session.sql_dropped,
+        'sql_ms': round(sum(q['duration_ms'] for q in session.sql), 3),
+        'sql_dropped': session.sql_dropped,
+        'sql': session.sql,
+        'profile': session.profiler.report() if session.mode == 'sample' else _cprofile_report(session.profiler)
+    }
+    try:
+        profile_store.save(profile)
+        response.headers['X-Profile-Id'] = session.id
+    except Exception as e:
+        print(f"Error saving profile {session.id}: {e}")
+    return response
+
+
+def abandon_profile(exc):
+    """teardown_request hook: never leave a profiler or SQL listener running after an error"""
+    session = g.pop('_profile_session', None)
+    if session is not None:
+        _stop(session)
+
+
+def init_app(app):
+    """Register the hooks only when PROFILING_ENABLED is on (PROFILE_DIR, PROFILE_MAX_COUNT)"""
+    global profile_store
+    profile_store = ProfileStore(
+        app.config.get('PROFILE_DIR') or os.path.join(app.instance_path, 'profiles'),
+        app.config.get('PROFILE_MAX_COUNT', 50)
+    )
+    if app.config.get('PROFILING_ENABLED', False):
+        app.before_request(start_profile)
+        app.after_request(finish_profile)
+        app.teardown_request(abandon_profile)
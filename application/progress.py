@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Provisioning Progress Pub/Sub
+Provisioning publishes stage transitions and per-participant progress here;
+the SSE endpoint subscribes per project. The in-process broker serves a
+single process; the SQLite broker is a local stand-in for a real message
+broker when several worker processes share one host. Both offer a blocking
+subscribe() for WSGI workers and an async subscribe_async() for the ASGI app.
+"""
+
+import asyncio
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+
+# Stages a provisioning run moves through, in order
+STAGES = ['queued', 'validating', 'generating_config', 'provisioning', 'adding_participants']
+TERMINAL_STATUSES = ['completed', 'failed']
+
+
+def _make_event(event_id, project_id, stage, status, fields):
+    event = {
+        'id': event_id,
+        'project_id': project_id,
+        'stage': stage,
+        'status': status,
+        'timestamp': time.time()
+    }
+    event.update(fields)
+    return event
+
+
+class InProcessBroker:
+    """Fan-out to subscriber queues within this process, with a short replay history"""
+
+    def __init__(self, history=200):
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._history = {}      # project_id -> deque of recent events
+        self._subscribers = {}  # project_id -> set of delivery callables
+        self._history_size = history
+
+    def publish(self, project_id, stage, status='running', **fields):
+        with self._lock:
+            event = _make_event(self._next_id, project_id, stage, status, fields)
+            self._next_id += 1
+            self._history.setdefault(project_id, deque(maxlen=self._history_size)).append(event)
+            subscribers = list(self._subscribers.get(project_id, ()))
+        for deliver in subscribers:
+            deliver(event)
+        return event
+
+    def latest(self, project_id):
+        with self._lock:
+            history = self._history.get(project_id)
+            return history[-1] if history else None
+
+    def _attach(self, project_id, last_event_id, deliver):
+        """Register a subscriber and return the backlog it should see first"""
+        with self._lock:
+            history = self._history.get(project_id, ())
+            if last_event_id:
+                backlog = [e for e in history if e['id'] > last_event_id]
+            else:
+                # New subscribers start from the current state only
+                backlog = list(history)[-1:]
+            self._subscribers.setdefault(project_id, set()).add(deliver)
+        return backlog
+
+    def _detach(self, project_id, deliver):
+        with self._lock:
+            self._subscribers.get(project_id, set()).discard(deliver)
+
+    def subscribe(self, project_id, last_event_id=0, timeout=15.0):
+        """Yield events as they arrive; yields None every `timeout` seconds of silence"""
+        q = queue.Queue()
+        backlog = self._attach(project_id, last_event_id, q.put)
+        try:
+            for event in backlog:
+                yield event
+            while True:
+                try:
+                    yield q.get(timeout=timeout)
+                except queue.Empty:
+                    yield None
+        finally:
+            self._detach(project_id, q.put)
+
+    async def subscribe_async(self, project_id, last_event_id=0, timeout=15.0):
+        """Async variant of subscribe(); publishers on other threads hand events to the loop"""
+        loop = asyncio.get_running_loop()
+        q = asyncio.Queue()
+
+        def deliver(event):
+            loop.call_soon_threadsafe(q.put_nowait, event)
+
+        backlog = self._attach(project_id, last_event_id, deliver)
+        try:
+            for event in backlog:
+                yield event
+            while True:
+                try:
+                    yield await asyncio.wait_for(q.get(), timeout)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            self._detach(project_id, deliver)
+
+
+class SQLiteBroker:
+    """Events appended to a shared SQLite file and tailed by each subscriber"""
+
+    def __init__(self, path, poll_interval=0.5, retention=3600):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._local = threading.local()
+        self._async_subscribers = {}  # project_id -> set of asyncio queues
+        self._tail_task = None
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS progress_event ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, project_id INTEGER NOT NULL, "
+                "created REAL NOT NULL, payload TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_progress_project_id ON progress_event (project_id, id)")
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def publish(self, project_id, stage, status='running', **fields):
+        conn = self._connect()
+        event = _make_event(None, project_id, stage, status, fields)
+        cursor = conn.execute(
+            "INSERT INTO progress_event (project_id, created, payload) VALUES (?, ?, ?)",
+            (project_id, event['timestamp'], json.dumps(event))
+        )
+        event['id'] = cursor.lastrowid
+        if event['id'] % 500 == 0:
+            conn.execute("DELETE FROM progress_event WHERE created < ?", (time.time() - self.retention,))
+        return event
+
+    def _max_id(self):
+        return self._connect().execute("SELECT COALESCE(MAX(id), 0) FROM progress_event").fetchone()[0]
+
+    def _events_since(self, last_event_id):
+        """Every event after an id, across projects, for the shared async tailer"""
+        rows = self._connect().execute(
+            "SELECT id, payload FROM progress_event WHERE id > ? ORDER BY id", (last_event_id,)
+        ).fetchall()
+        events = []
+        for event_id, payload in rows:
+            event = json.loads(payload)
+            event['id'] = event_id
+            events.append(event)
+        return events
+
+    def _events_after(self, project_id, last_event_id):
+        rows = self._connect().execute(
+            "SELECT id, payload FROM progress_event WHERE project_id = ? AND id > ? ORDER BY id",
+            (project_id, last_event_id)
+        ).fetchall()
+        events = []
+        for event_id, payload in rows:
+            event = json.loads(payload)
+            event['id'] = event_id
+            events.append(event)
+        return events
+
+    def latest(self, project_id):
+        row = self._connect().execute(
+            "SELECT id, payload FROM progress_event WHERE project_id = ? ORDER BY id DESC LIMIT 1",
+            (project_id,)
+        ).fetchone()
+        if not row:
+            return None
+        event = json.loads(row[1])
+        event['id'] = row[0]
+        return event
+
+    def subscribe(self, project_id, last_event_id=0, timeout=15.0):
+        """Poll for new rows; yields None every `timeout` seconds of silence"""
+        if not last_event_id:
+            # New subscribers replay only the current run
+            latest = self.latest(project_id)
+            last_event_id = latest['id'] - 1 if latest else 0
+        quiet_since = time.monotonic()
+        while True:
+            events = self._events_after(project_id, last_event_id)
+            for event in events:
+                last_event_id = event['id']
+                yield event
+            if events:
+                quiet_since = time.monotonic()
+            elif time.monotonic() - quiet_since >= timeout:
+                quiet_since = time.monotonic()
+                yield None
+            time.sleep(self.poll_interval)
+
+    async def _tail(self):
+        """One poll loop per process fans new rows out to every async subscriber"""
+        cursor = await asyncio.to_thread(self._max_id)
+        while self._async_subscribers:
+            for event in await asyncio.to_thread(self._events_since, cursor):
+                cursor = event['id']
+                for q in self._async_subscribers.get(event['project_id'], ()):
+                    q.put_nowait(event)
+            await asyncio.sleep(self.poll_interval)
+        self._tail_task = None
+
+    async def subscribe_async(self, project_id, last_event_id=0, timeout=15.0):
+        """Async variant of subscribe(); polling is shared instead of one query loop per client"""
+        q = asyncio.Queue()
+        self._async_subscribers.setdefault(project_id, set()).add(q)
+        if self._tail_task is None:
+            self._tail_task = asyncio.get_running_loop().create_task(self._tail())
+        try:
+            if last_event_id:
+                backlog = await asyncio.to_thread(self._events_after, project_id, last_event_id)
+            else:
+                latest = await asyncio.to_thread(self.latest, project_id)
+                backlog = [latest] if latest else []
+            for event in backlog:
+                last_event_id = event['id']
+                yield event
+            while True:
+                try:
+                    event = await asyncio.wait_for(q.get(), timeout)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                # The tailer may deliver rows the backlog query already returned
+                if event['id'] > last_event_id:
+                    last_event_id = event['id']
+                    yield event
+        finally:
+            subscribers = self._async_subscribers.get(project_id, set())
+            subscribers.discard(q)
+            if not subscribers:
+                self._async_subscribers.pop(project_id, None)
+
+
+broker = InProcessBroker()
+
+
+def init_app(app):
+    """Select the broker from PROGRESS_BROKER ('memory' or 'sqlite')"""
+    global broker
+    if app.config.get('PROGRESS_BROKER', 'memory') == 'sqlite':
+        path = app.config.get('PROGRESS_BROKER_PATH') or os.path.join(app.instance_path, 'progress_events.db')
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        broker = SQLiteBroker(path)
+    else:
+        broker = InProcessBroker()
+
+
+def publish(project_id, stage, status='running', **fields):
+    """Publish a progress event; never lets a broker failure break provisioning"""
+    try:
+        return broker.publish(project_id, stage, status, **fields)
+    except Exception as e:
+        print(f"Error publishing progress for project {project_id}: {e}")
+        return None
+
+
+def format_sse(event):
+    """Encode one event (or a keep-alive for None) in text/event-stream framing"""
+    if event is None:
+        return ': keep-alive\n\n'
+    name = event['status'] if event['status'] in TERMINAL_STATUSES else 'progress'
+    return f"id: {event['id']}\nevent: {name}\ndata: {json.dumps(event)}\n\n"
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Project Response Cache
+Rendered project detail responses cached per (project, version). Mutating
+routes bump the project's version inside their own transaction, which makes
+every cached body and ETag for the old version unreachable.
+"""
+
+import threading
+from collections import OrderedDict
+from sqlalchemy import insert, select, update
+from . import db
+from .models import Project, ProjectVersion
+
+
+def get_version(project_id):
+    """Current version of a project (0 if it was never bumped), or None if there is no such project"""
+    row = db.session.execute(
+        select(Project.id, ProjectVersion.version)
+        .outerjoin(ProjectVersion, ProjectVersion.project_id == Project.id)
+        .where(Project.id == project_id)
+    ).first()
+    if row is None:
+        return None
+    return row.version or 0
+
+
+def bump_version(*project_ids):
+    """Increment the version of each project; the caller commits"""
+    project_ids = sorted(set(pid for pid in project_ids if pid is not None))
+    if not project_ids:
+        return
+    # Create missing counters first so the UPDATE below covers every project
+    db.session.execute(
+        insert(ProjectVersion).prefix_with('OR IGNORE', dialect='sqlite'),
+        [{'project_id': pid, 'version': 0} for pid in project_ids]
+    )
+    db.session.execute(
+        update(ProjectVersion)
+        .where(ProjectVersion.project_id.in_(project_ids))
+        .values(version=ProjectVersion.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def make_etag(project_id, version, variant=''):
+    """Strong ETag value for one rendering of one project version"""
+    return f"p{project_id}-v{version}{'-' + variant if variant else ''}"
+
+
+class ResponseCache:
+    """Thread-safe LRU of rendered response bodies"""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return body
+
+    def put(self, key, body):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+project_response_cache = ResponseCache()
+
+
+def init_app(app):
+    """Size the response cache from PROJECT_CACHE_SIZE"""
+    project_response_cache.maxsize = app.config.get('PROJECT_CACHE_SIZE', 256)
+    project_response_cache.clear()
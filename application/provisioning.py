@@ -11,46 +11,302 @@ import yaml
 import json
 import zipfile
 import io
+import hashlib
+import re
+import shutil
+import threading
+from datetime import datetime
 from pathlib import Path
-from .models import Project, Server, Client, Admin
+from flask import has_app_context
+from sqlalchemy import func, select
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; project locks become no-ops
+    fcntl = None
+from . import db
+from .models import Project, Server, Client, Admin, WorkspaceLocation, ArchivedProject
+from . import progress, validation
+
+# LibYAML's C emitter when PyYAML was built with it
+YamlDumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+
+# Override with NVFLARE_BIN when the CLI lives elsewhere
+DEFAULT_NVFLARE_BIN = '/home/franky/FL/bin/nvflare'
+KIT_TARGET_TYPES = ['server', 'client', 'admin']
+
+# Participants are read and written in batches of this many rows
+PARTICIPANT_BATCH_SIZE = 1000
+
+# Workspaces live in <workspace>/projects/<aa>/<bb>/project_<id>, where aa/bb are the
+# first hex digits of sha1(id), so no directory holds more than a few hundred entries
+SHARDED_DIR = 'projects'
+FLAT_WORKSPACE_PATTERN = re.compile(r'^project_(\d+)$')
+
+# Frozen projects' kits live in <workspace>/sealed/<aa>/<bb>/project_<id>/ next to a manifest
+SEALED_DIR = 'sealed'
+SEALED_MANIFEST = 'manifest.json'
+KIT_OFFLOAD_MODES = ['none', 'accel', 'sendfile']
+
+def shard_prefix(project_id):
+    """Two directory levels spreading projects evenly over 65536 shards"""
+    digest = hashlib.sha1(str(project_id).encode()).hexdigest()
+    return digest[:2], digest[2:4]
+
+class ProjectFrozenError(RuntimeError):
+    """Provisioning was requested for a frozen project, whose kits are sealed"""
+
+class ProjectArchivedError(ProjectFrozenError):
+    """Provisioning was requested for an archived project; it must be restored first"""
+
+class ProjectLock:
+    """Exclusive lock on one project's workspace, shared by threads, processes and hosts
+
+    flock() locks belong to the open file, so separate threads exclude each
+    other too; on NFS Linux maps them onto byte-range locks the server honours.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+    
+    def acquire(self, blocking=True):
+        """Take the lock; with blocking=False returns False instead of waiting"""
+        if fcntl is None:
+            return True
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        except Exception:
+            os.close(fd)
+            raise
+        self._fd = fd
+        return True
+    
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+    
+    def __enter__(self):
+        self.acquire()
+        return self
+    
+    def __exit__(self, *exc):
+        self.release()
 
 class NVFlareProvisioningService:
     """Service for generating NVFlare project configurations and calling the CLI"""
     
-    def __init__(self, workspace_dir="workspace"):
+    def __init__(self, workspace_dir="workspace", nvflare_bin=None, inline_participants=None):
         self.workspace_dir = workspace_dir
+        self.nvflare_bin = nvflare_bin or os.environ.get('NVFLARE_BIN', DEFAULT_NVFLARE_BIN)
+        # Write clients and admins into project.yml instead of one --add_client/--add_user call each
+        if inline_participants is None:
+            inline_participants = os.environ.get('PROVISION_INLINE_PARTICIPANTS') == '1'
+        self.inline_participants = inline_participants
+        # Sharded paths never move again, so they are cached for the life of the process
+        self._workspace_paths = {}
         os.makedirs(workspace_dir, exist_ok=True)
     
-    def generate_project_yml(self, project_id):
-        """Generate project.yml file from database configuration"""
-        project = Project.query.get(project_id)
-        if not project:
-            raise ValueError(f"Project {project_id} not found")
+    def flat_workspace(self, project_id):
+        """Workspace path of the original single-directory layout"""
+        return os.path.join(self.workspace_dir, f"project_{project_id}")
+    
+    def sharded_workspace(self, project_id):
+        return os.path.join(self.workspace_dir, SHARDED_DIR, *shard_prefix(project_id), f"project_{project_id}")
+    
+    def project_workspace(self, project_id):
+        """Directory the NVFlare CLI provisions a project into
         
-        servers = Server.query.filter_by(project_id=project_id).all()
-        clients = Client.query.filter_by(project_id=project_id).all()
-        admins = Admin.query.filter_by(project_id=project_id).all()
+        Looked up in the workspace_location table. Without a row (or an app
+        context), a workspace still in the flat layout is used in place until it
+        is migrated; everything else goes to the sharded layout.
+        """
+        path = self._workspace_paths.get(project_id)
+        if path is not None:
+            return path
+        if has_app_context():
+            location = db.session.get(WorkspaceLocation, project_id)
+            if location is not None:
+                path = os.path.join(self.workspace_dir, location.path)
+                if location.layout == 'sharded':
+                    self._workspace_paths[project_id] = path
+                return path
+        flat = self.flat_workspace(project_id)
+        if os.path.isdir(flat):
+            return flat
+        return self.sharded_workspace(project_id)
+    
+    def register_workspace(self, project_id):
+        """Record the project's current workspace path in workspace_location; the caller commits"""
+        relative = os.path.relpath(self.project_workspace(project_id), self.workspace_dir)
+        layout = 'flat' if FLAT_WORKSPACE_PATTERN.match(relative) else 'sharded'
+        db.session.merge(WorkspaceLocation(project_id=project_id, path=relative, layout=layout,
+                                           updated_at=datetime.utcnow()))
+    
+    def provisioned_workspaces(self):
+        """{project_id: path} of every registered workspace plus unregistered flat-layout ones"""
+        workspaces = {
+            project_id: os.path.join(self.workspace_dir, path)
+            for project_id, path in db.session.execute(select(WorkspaceLocation.project_id, WorkspaceLocation.path))
+        }
+        for project_id in self.flat_workspace_ids():
+            workspaces.setdefault(project_id, self.flat_workspace(project_id))
+        return workspaces
+    
+    def flat_workspace_ids(self):
+        """Project ids that still have a workspace in the flat layout"""
+        project_ids = []
+        try:
+            with os.scandir(self.workspace_dir) as entries:
+                for entry in entries:
+                    match = FLAT_WORKSPACE_PATTERN.match(entry.name)
+                    if match and entry.is_dir():
+                        project_ids.append(int(match.group(1)))
+        except FileNotFoundError:
+            pass
+        return sorted(project_ids)
+    
+    def migrate_workspace(self, project_id):
+        """Move one project's flat-layout workspace and seal into the sharded layout
         
-        # NVFlare only supports one server per project, so we'll use the first server
-        if not servers:
-            raise ValueError(f"Project {project_id} must have at least one server")
+        Runs under the project lock, so it is safe while the API and workers are
+        up. Returns True once moved, False if there was nothing to move and None
+        if the project is busy (try again later).
+        """
+        lock = self.project_lock(project_id)
+        if not lock.acquire(blocking=False):
+            return None
+        try:
+            moved = False
+            for source, target in ((self.flat_workspace(project_id), self.sharded_workspace(project_id)),
+                                   (os.path.join(self.sealed_root(), f"project_{project_id}"),
+                                    self.sharded_sealed_dir(project_id))):
+                if not os.path.isdir(source):
+                    continue
+                if os.path.exists(target):
+                    raise RuntimeError(f"Cannot migrate {source}: {target} already exists")
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                # Same filesystem, so the move is a single atomic rename
+                os.rename(source, target)
+                moved = True
+            if moved:
+                self._workspace_paths.pop(project_id, None)
+                db.session.merge(WorkspaceLocation(
+                    project_id=project_id,
+                    path=os.path.relpath(self.sharded_workspace(project_id), self.workspace_dir),
+                    layout='sharded',
+                    updated_at=datetime.utcnow()
+                ))
+                db.session.commit()
+            return moved
+        finally:
+            lock.release()
+    
+    def project_lock(self, project_id):
+        """Lock serializing provisioning runs of one project across workers
         
-        primary_server = servers[0]  # Use the first server as primary
+        Not sharded like the workspaces: processes from before and after the
+        sharding must lock the same file while they run side by side.
+        """
+        return ProjectLock(os.path.join(self.workspace_dir, '.locks', f"project_{project_id}.lock"))
+    
+    def nvflare_command(self, *args):
+        """Argument list for one `nvflare provision` invocation"""
+        return [self.nvflare_bin, 'provision', *args]
+    
+    def nvflare_env(self):
+        """Environment for the CLI, with its virtualenv's bin directory on PATH"""
+        env = os.environ.copy()
+        bin_dir = os.path.dirname(self.nvflare_bin)
+        if bin_dir and bin_dir not in env.get('PATH', '').split(os.pathsep):
+            env['PATH'] = bin_dir + os.pathsep + env.get('PATH', '')
+        return env
+    
+    @staticmethod
+    def write_temp_yaml(config):
+        """Write a config to a temporary .yml file and return its path; the caller unlinks it"""
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.yml', delete=False) as f:
+            yaml.dump(config, f, Dumper=YamlDumper, default_flow_style=False)
+            return f.name
+    
+    @staticmethod
+    def client_config(client):
+        """Participant definition passed to --add_client"""
+        config = {
+            'name': client.name,
+            'type': 'client',
+            'org': client.org
+        }
+        if client.description:
+            config['description'] = client.description
+        return config
+    
+    @staticmethod
+    def user_config(admin):
+        """Participant definition passed to --add_user"""
+        return {
+            'name': admin.email.split('@')[0],
+            'type': 'admin',
+            'org': admin.org,
+            'role': admin.role
+        }
+    
+    @staticmethod
+    def find_generated_workspace(workspace):
+        """Locate the prod_00 directory NVFlare creates under workspace/<Project Name>/"""
+        if not os.path.isdir(workspace):
+            print(f"Warning: Workspace directory {workspace} does not exist after command execution")
+            return None
+        for item in os.listdir(workspace):
+            prod_dir = os.path.join(workspace, item, 'prod_00')
+            if os.path.isdir(prod_dir):
+                return prod_dir
+        return None
+    
+    @staticmethod
+    def find_kit_dir(workspace, target_type):
+        """Pick the participant directory a startup kit is built from"""
+        if target_type not in KIT_TARGET_TYPES:
+            raise ValueError(f"Invalid target type: {target_type}")
         
-        # Build project configuration with only the primary server
-        project_config = {
+        for item in sorted(os.listdir(workspace)):
+            if not os.path.isdir(os.path.join(workspace, item)):
+                continue
+            # Clients are named 'site-*', admins end with '@', anything else is the server
+            if target_type == 'client' and item.startswith('site-'):
+                return os.path.join(workspace, item)
+            if target_type == 'admin' and item.endswith('@'):
+                return os.path.join(workspace, item)
+            if target_type == 'server' and not item.startswith('site-') and not item.endswith('@'):
+                return os.path.join(workspace, item)
+        raise RuntimeError(f"No {target_type} directory found")
+    
+    @staticmethod
+    def kit_files(target_dir):
+        """(path, archive name) for every file under a kit directory"""
+        for root, dirs, files in os.walk(target_dir):
+            for file in files:
+                file_path = os.path.join(root, file)
+                yield file_path, os.path.relpath(file_path, target_dir)
+    
+    @staticmethod
+    def kit_filename(target_type):
+        return f"{target_type}_startup_kit.zip"
+    
+    @staticmethod
+    def project_yml_header(project):
+        """Everything in project.yml except the participant list"""
+        return {
             'api_version': project.api_version,
             'name': project.name,
             'description': project.description,
-            'participants': [
-                {
-                    'name': project.server_name,
-                    'type': 'server',
-                    'org': primary_server.org,
-                    'fed_learn_port': primary_server.fed_learn_port,
-                    'admin_port': primary_server.admin_port
-                }
-            ],
             'builders': [
                 {
                     'path': 'nvflare.lighter.impl.workspace.WorkspaceBuilder',
@@ -82,97 +338,199 @@ class NVFlareProvisioningService:
                 }
             ]
         }
+    
+    def write_project_yml(self, project, inline_participants=False):
+        """Stream project.yml to a temporary file and return its path; the caller unlinks it
         
-        return project_config, {
-            'additional_servers': servers[1:] if len(servers) > 1 else [],
-            'clients': clients,
-            'admins': admins
-        }
+        NVFlare only supports one server per project, so only the first server is
+        written. With inline_participants the clients and admins are streamed from a
+        cursor in batches; otherwise they are added to the workspace afterwards.
+        """
+        primary_server = db.session.execute(
+            select(Server.org, Server.fed_learn_port, Server.admin_port)
+            .where(Server.project_id == project.id)
+            .order_by(Server.id)
+            .limit(1)
+        ).first()
+        if primary_server is None:
+            raise ValueError(f"Project {project.id} must have at least one server")
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.yml', delete=False) as f:
+            try:
+                yaml.dump(self.project_yml_header(project), f, Dumper=YamlDumper, default_flow_style=False)
+                # A block sequence at column 0 is a valid value for the key above it
+                f.write('participants:\n')
+                yaml.dump([{
+                    'name': project.server_name,
+                    'type': 'server',
+                    'org': primary_server.org,
+                    'fed_learn_port': primary_server.fed_learn_port,
+                    'admin_port': primary_server.admin_port
+                }], f, Dumper=YamlDumper, default_flow_style=False)
+                
+                if inline_participants:
+                    for model, make_config in ((Client, self.client_config), (Admin, self.user_config)):
+                        rows = db.session.execute(
+                            self._participant_query(model, project.id).execution_options(yield_per=PARTICIPANT_BATCH_SIZE)
+                        )
+                        for batch in rows.partitions():
+                            yaml.dump([make_config(row) for row in batch], f, Dumper=YamlDumper,
+                                      default_flow_style=False)
+            except Exception:
+                f.close()
+                os.unlink(f.name)
+                raise
+            return f.name
+    
+    @staticmethod
+    def _participant_query(model, project_id):
+        """Columns the participant config builders need, in id order"""
+        if model is Client:
+            columns = (Client.id, Client.name, Client.org, Client.description)
+        else:
+            columns = (Admin.id, Admin.email, Admin.org, Admin.role)
+        return select(*columns).where(model.project_id == project_id).order_by(model.id)
+    
+    def count_additional_participants(self, project_id):
+        """(clients + admins, servers beyond the first) for progress totals and warnings"""
+        clients, admins, servers = (
+            db.session.execute(select(func.count(model.id)).where(model.project_id == project_id)).scalar()
+            for model in (Client, Admin, Server)
+        )
+        return clients + admins, max(servers - 1, 0)
+    
+    def additional_participant_batch(self, project_id, kind, after_id=0, batch_size=PARTICIPANT_BATCH_SIZE):
+        """Next page of ('--add_client'|'--add_user', label, config) after a row id
+        
+        Keyset pages are fetched whole, so no read cursor stays open on the
+        database while the CLI runs for each participant.
+        """
+        model, flag = (Client, '--add_client') if kind == 'client' else (Admin, '--add_user')
+        rows = db.session.execute(
+            self._participant_query(model, project_id).where(model.id > after_id).limit(batch_size)
+        ).all()
+        if model is Client:
+            batch = [(flag, row.name, self.client_config(row)) for row in rows]
+        else:
+            batch = [(flag, row.email, self.user_config(row)) for row in rows]
+        return batch, (rows[-1].id if rows else None)
+    
+    def iter_additional_participants(self, project_id):
+        """Every client, then every admin, one page at a time"""
+        for kind in ('client', 'admin'):
+            after_id = 0
+            while True:
+                batch, after_id = self.additional_participant_batch(project_id, kind, after_id)
+                if not batch:
+                    break
+                yield from batch
+    
+    @staticmethod
+    def ensure_not_frozen(project_id):
+        """Raise ProjectFrozenError for frozen projects, and its subclass for archived ones; neither is reprovisioned"""
+        row = db.session.execute(
+            select(Project.frozen, ArchivedProject.project_id)
+            .outerjoin(ArchivedProject, ArchivedProject.project_id == Project.id)
+            .where(Project.id == project_id)
+        ).first()
+        if row is not None and row[1] is not None:
+            raise ProjectArchivedError(f"Project {project_id} is archived; restore it first")
+        if row is not None and row[0]:
+            raise ProjectFrozenError(f"Project {project_id} is frozen; its startup kits are sealed")
     
     def call_nvflare_provision(self, project_id, custom_workspace=None):
-        """Call the NVFlare CLI provision command"""
+        """Call the NVFlare CLI provision command, publishing progress events as it goes"""
+        self.ensure_not_frozen(project_id)
+        with self.project_lock(project_id):
+            return self._provision_and_report(project_id, custom_workspace)
+    
+    def rotate_certificates(self, project_id):
+        """Provision a project from a fresh workspace so every participant gets new certificates
+        
+        NVFlare keeps issued certificates in the workspace state and reuses them,
+        so the old workspace is moved aside first and put back if provisioning fails.
+        """
+        self.ensure_not_frozen(project_id)
+        with self.project_lock(project_id):
+            workspace = self.project_workspace(project_id)
+            previous = None
+            if os.path.isdir(workspace):
+                previous = workspace + '.rotating'
+                shutil.rmtree(previous, ignore_errors=True)
+                os.rename(workspace, previous)
+            try:
+                result = self._provision_and_report(project_id)
+            except Exception:
+                if previous:
+                    shutil.rmtree(workspace, ignore_errors=True)
+                    os.rename(previous, workspace)
+                raise
+            if previous:
+                shutil.rmtree(previous, ignore_errors=True)
+            return result
+    
+    def _provision_and_report(self, project_id, custom_workspace=None):
+        """Provision with the project lock held and publish the outcome"""
+        try:
+            workspace = self._call_nvflare_provision(project_id, custom_workspace)
+        except Exception as e:
+            progress.publish(project_id, 'provisioning', 'failed', error=str(e))
+            raise
+        if custom_workspace is None:
+            self.record_workspace(project_id)
+        progress.publish(project_id, 'provisioning', 'completed', workspace=workspace)
+        return workspace
+    
+    def record_workspace(self, project_id):
+        """Register a freshly provisioned workspace; lookups fall back to the filesystem if this fails"""
+        try:
+            self.register_workspace(project_id)
+            db.session.commit()
+        except Exception as e:
+            print(f"Warning: could not record workspace of project {project_id}: {e}")
+            db.session.rollback()
+    
+    def _call_nvflare_provision(self, project_id, custom_workspace=None):
+        """Run the NVFlare CLI for the primary server, then add the remaining participants"""
         project = Project.query.get(project_id)
         if not project:
             raise ValueError(f"Project {project_id} not found")
         
-        # Generate project.yml with primary server only
-        project_config, additional_participants = self.generate_project_yml(project_id)
-        print(f"Generated project config: {project_config}")
-        
-        # Create temporary project.yml file
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.yml', delete=False) as f:
-            yaml.dump(project_config, f, default_flow_style=False)
-            project_file = f.name
+        # Reject bad configurations before the CLI runs
+        progress.publish(project_id, 'validating')
+        validation.ensure_valid(project)
         
+        progress.publish(project_id, 'generating_config')
+        project_file = self.write_project_yml(project, self.inline_participants)
         print(f"Created temporary project file: {project_file}")
         
         try:
             # Determine workspace directory
-            workspace = custom_workspace or os.path.join(self.workspace_dir, f"project_{project_id}")
+            workspace = custom_workspace or self.project_workspace(project_id)
             print(f"Target workspace: {workspace}")
             
             # Call nvflare provision command for the primary server
-            cmd = [
-                '/home/franky/FL/bin/nvflare', 'provision',
-                '-p', project_file,
-                '-w', workspace
-            ]
+            cmd = self.nvflare_command('-p', project_file, '-w', workspace)
             
+            progress.publish(project_id, 'provisioning', participant=project.server_name)
             print(f"Executing: {' '.join(cmd)}")
-            print(f"Current working directory: {os.getcwd()}")
-            print(f"Environment PATH: {os.environ.get('PATH', 'Not set')}")
-            
-            # Ensure the virtual environment is in the PATH
-            env = os.environ.copy()
-            if '/home/franky/FL/bin' not in env.get('PATH', ''):
-                env['PATH'] = '/home/franky/FL/bin:' + env.get('PATH', '')
-                print(f"Updated PATH: {env['PATH']}")
             
             result = subprocess.run(
                 cmd,
                 capture_output=True,
                 text=True,
                 cwd=os.getcwd(),
-                env=env
+                env=self.nvflare_env()
             )
             
             print(f"Command return code: {result.returncode}")
-            print(f"Command stdout: {result.stdout}")
-            print(f"Command stderr: {result.stderr}")
-            
             if result.returncode != 0:
+                print(f"Command stderr: {result.stderr}")
                 raise RuntimeError(f"NVFlare provision failed: {result.stderr}")
             
             print(f"Provisioning successful. Workspace: {workspace}")
             
-            # Check if workspace directory exists
-            if not os.path.exists(workspace):
-                print(f"Warning: Workspace directory {workspace} does not exist after command execution")
-                # List contents of parent directory
-                parent_dir = os.path.dirname(workspace)
-                if os.path.exists(parent_dir):
-                    print(f"Contents of {parent_dir}: {os.listdir(parent_dir)}")
-                return workspace
-            
-            # Find the actual workspace directory created by NVFlare
-            # NVFlare creates a nested structure: workspace/Project Name/prod_00/
-            actual_workspace = None
-            print(f"Searching for generated workspace in: {workspace}")
-            if os.path.exists(workspace):
-                print(f"Workspace directory exists, contents: {os.listdir(workspace)}")
-                for item in os.listdir(workspace):
-                    project_dir = os.path.join(workspace, item)
-                    print(f"Checking item: {item} -> {project_dir}")
-                    if os.path.isdir(project_dir):
-                        prod_dir = os.path.join(project_dir, 'prod_00')
-                        print(f"Checking for prod_00: {prod_dir}")
-                        if os.path.exists(prod_dir):
-                            actual_workspace = prod_dir
-                            print(f"Found prod_00 directory: {actual_workspace}")
-                            break
-            else:
-                print(f"Workspace directory {workspace} does not exist")
-            
+            actual_workspace = self.find_generated_workspace(workspace)
             if not actual_workspace:
                 print(f"Could not find generated workspace in {workspace}")
                 # Return the base workspace for now
@@ -181,121 +539,52 @@ class NVFlareProvisioningService:
             print(f"Actual workspace found: {actual_workspace}")
             
             # Now add additional participants using the appropriate flags
-            self._add_additional_participants(actual_workspace, additional_participants)
+            if not self.inline_participants:
+                self._add_additional_participants(actual_workspace, project_id)
             
             return actual_workspace
             
         finally:
             # Clean up temporary file
             os.unlink(project_file)
-            print(f"Cleaned up temporary file: {project_file}")
     
-    def _add_additional_participants(self, workspace, additional_participants):
-        """Add additional participants to the provisioned workspace"""
+    def _add_additional_participants(self, workspace, project_id):
+        """Add clients and admins to the provisioned workspace one CLI call at a time"""
         print(f"Adding additional participants to {workspace}")
         
-        # Add additional clients
-        for client in additional_participants['clients']:
-            self._add_client(workspace, client)
-        
-        # Add additional admins
-        for admin in additional_participants['admins']:
-            self._add_user(workspace, admin)
+        total, additional_servers = self.count_additional_participants(project_id)
+        for completed, (flag, label, config) in enumerate(self.iter_additional_participants(project_id), 1):
+            self._add_participant(workspace, flag, config, label)
+            progress.publish(project_id, 'adding_participants', participant=label,
+                             participant_type=config['type'], completed=completed, total=total)
         
         # Note: Additional servers are not supported by NVFlare
-        if additional_participants['additional_servers']:
-            print(f"Warning: {len(additional_participants['additional_servers'])} additional servers cannot be added (NVFlare limitation)")
-    
-    def _add_client(self, workspace, client):
-        """Add a client to the provisioned workspace"""
-        try:
-            # Create client configuration
-            client_config = {
-                'name': client.name,
-                'type': 'client',
-                'org': client.org
-            }
-            if client.description:
-                client_config['description'] = client.description
-            
-            # Create temporary client file
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.yml', delete=False) as f:
-                yaml.dump(client_config, f, default_flow_style=False)
-                client_file = f.name
-            
-            try:
-                # Add client using NVFlare
-                cmd = [
-                    '/home/franky/FL/bin/nvflare', 'provision',
-                    '--add_client', client_file,
-                    '-w', workspace
-                ]
-                
-                print(f"Adding client {client.name}: {' '.join(cmd)}")
-                
-                result = subprocess.run(
-                    cmd,
-                    capture_output=True,
-                    text=True,
-                    cwd=os.getcwd(),
-                    env=os.environ.copy()
-                )
-                
-                if result.returncode == 0:
-                    print(f"Successfully added client {client.name}")
-                else:
-                    print(f"Failed to add client {client.name}: {result.stderr}")
-                    
-            finally:
-                os.unlink(client_file)
-                
-        except Exception as e:
-            print(f"Error adding client {client.name}: {e}")
+        if additional_servers:
+            print(f"Warning: {additional_servers} additional servers cannot be added (NVFlare limitation)")
     
-    def _add_user(self, workspace, admin):
-        """Add an admin user to the provisioned workspace"""
+    def _add_participant(self, workspace, flag, config, label):
+        """Add one client (--add_client) or admin user (--add_user) to the provisioned workspace"""
         try:
-            # Create user configuration
-            user_config = {
-                'name': admin.email.split('@')[0],
-                'type': 'admin',
-                'org': admin.org,
-                'role': admin.role
-            }
-            
-            # Create temporary user file
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.yml', delete=False) as f:
-                yaml.dump(user_config, f, default_flow_style=False)
-                user_file = f.name
-            
+            participant_file = self.write_temp_yaml(config)
             try:
-                # Add user using NVFlare
-                cmd = [
-                    '/home/franky/FL/bin/nvflare', 'provision',
-                    '--add_user', user_file,
-                    '-w', workspace
-                ]
-                
-                print(f"Adding user {admin.email}: {' '.join(cmd)}")
+                cmd = self.nvflare_command(flag, participant_file, '-w', workspace)
                 
                 result = subprocess.run(
                     cmd,
                     capture_output=True,
                     text=True,
                     cwd=os.getcwd(),
-                    env=os.environ.copy()
+                    env=self.nvflare_env()
                 )
                 
-                if result.returncode == 0:
-                    print(f"Successfully added user {admin.email}")
-                else:
-                    print(f"Failed to add user {admin.email}: {result.stderr}")
+                if result.returncode != 0:
+                    print(f"Failed to add {config['type']} {label}: {result.stderr}")
                     
             finally:
-                os.unlink(user_file)
+                os.unlink(participant_file)
                 
         except Exception as e:
-            print(f"Error adding user {admin.email}: {e}")
+            print(f"Error adding {config['type']} {label}: {e}")
     
     def generate_startup_kit(self, project_id, target_type='server'):
         """Generate startup kit for server, client, or admin"""
@@ -303,62 +592,155 @@ class NVFlareProvisioningService:
         if not project:
             raise ValueError(f"Project {project_id} not found")
         
-        # Call provisioning first
-        workspace = self.call_nvflare_provision(project_id)
+        if project.frozen:
+            path, kit = self.sealed_startup_kit(project_id, target_type)
+            with open(path, 'rb') as f:
+                return io.BytesIO(f.read()), self.kit_filename(target_type)
         
-        # Find the target directory
-        if target_type == 'server':
-            # Look for server directory (usually named after the server)
-            for item in os.listdir(workspace):
-                if os.path.isdir(os.path.join(workspace, item)) and not item.startswith('site-') and not item.endswith('@'):
-                    # This should be the server directory
-                    target_dir = os.path.join(workspace, item)
-                    break
-            else:
-                raise RuntimeError("No server directory found")
-        elif target_type == 'client':
-            # Find client directory (usually starts with 'site-')
-            for item in os.listdir(workspace):
-                if item.startswith('site-'):
-                    target_dir = os.path.join(workspace, item)
-                    break
-            else:
-                raise RuntimeError("No client directory found")
-        elif target_type == 'admin':
-            # Find admin directory (usually ends with '@')
-            for item in os.listdir(workspace):
-                if item.endswith('@'):
-                    target_dir = os.path.join(workspace, item)
-                    break
-            else:
-                raise RuntimeError("No admin directory found")
-        else:
-            raise ValueError(f"Invalid target type: {target_type}")
+        self.ensure_not_frozen(project_id)  # Archived projects have nothing to provision
+        # Provision first; the lock also keeps other runs from rewriting the tree mid-zip
+        with self.project_lock(project_id):
+            workspace = self._provision_and_report(project_id)
+            
+            target_dir = self.find_kit_dir(workspace, target_type)
+            print(f"Creating startup kit for {target_type} from {target_dir}")
+            
+            # Create zip file
+            zip_buffer = io.BytesIO()
+            with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+                for file_path, arc_name in self.kit_files(target_dir):
+                    zip_file.write(file_path, arc_name)
         
-        if not os.path.exists(target_dir):
-            raise RuntimeError(f"Target directory {target_dir} not found")
+        zip_buffer.seek(0)
+        return zip_buffer, self.kit_filename(target_type)
+    
+    def sealed_root(self):
+        """Directory holding the sealed kits of every frozen project"""
+        return os.path.join(self.workspace_dir, SEALED_DIR)
+    
+    def sealed_dir(self, project_id):
+        """A seal from before sharding is used in place until it is migrated"""
+        flat = os.path.join(self.sealed_root(), f"project_{project_id}")
+        if os.path.isdir(flat):
+            return flat
+        return self.sharded_sealed_dir(project_id)
+    
+    def sharded_sealed_dir(self, project_id):
+        return os.path.join(self.sealed_root(), *shard_prefix(project_id), f"project_{project_id}")
+    
+    def sealed_manifest(self, project_id):
+        """Manifest of a project's sealed kits, or None if it has not been sealed"""
+        try:
+            with open(os.path.join(self.sealed_dir(project_id), SEALED_MANIFEST)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+    
+    def sealed_startup_kit(self, project_id, target_type):
+        """(path, manifest entry) of a frozen project's kit, sealing the project on first use"""
+        if target_type not in KIT_TARGET_TYPES:
+            raise ValueError(f"Invalid target type: {target_type}")
+        manifest = self.sealed_manifest(project_id) or self.seal_startup_kits(project_id)
+        kit = manifest['kits'].get(target_type)
+        if kit is None:
+            raise RuntimeError(f"No {target_type} directory found")
+        return os.path.join(self.sealed_dir(project_id), kit['file']), kit
+    
+    def seal_startup_kits(self, project_id):
+        """Zip every kit of a project once into read-only archives and return the manifest
         
-        print(f"Creating startup kit for {target_type} from {target_dir}")
+        The existing workspace is reused; a project that was never provisioned is
+        provisioned one last time. The archives are built in a staging directory
+        and renamed into place, so readers see either no seal or a complete one.
+        """
+        with self.project_lock(project_id):
+            manifest = self.sealed_manifest(project_id)
+            if manifest is not None:
+                return manifest  # Sealed by another request while this one waited
+            
+            workspace = self.project_workspace(project_id)
+            prod_dir = self.find_generated_workspace(workspace) if os.path.isdir(workspace) else None
+            if prod_dir is None:
+                prod_dir = self._provision_and_report(project_id)
+            
+            os.makedirs(self.sealed_root(), exist_ok=True)
+            staging = tempfile.mkdtemp(prefix=f".project_{project_id}.", dir=self.sealed_root())
+            try:
+                kits = {}
+                for target_type in KIT_TARGET_TYPES:
+                    try:
+                        target_dir = self.find_kit_dir(prod_dir, target_type)
+                    except RuntimeError:
+                        continue
+                    filename = self.kit_filename(target_type)
+                    path = os.path.join(staging, filename)
+                    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+                        for file_path, arc_name in self.kit_files(target_dir):
+                            zip_file.write(file_path, arc_name)
+                    digest = hashlib.sha256()
+                    with open(path, 'rb') as f:
+                        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                            digest.update(chunk)
+                    os.chmod(path, 0o444)
+                    kits[target_type] = {'file': filename, 'size': os.path.getsize(path), 'sha256': digest.hexdigest()}
+                if not kits:
+                    raise RuntimeError(f"No startup kits found to seal in {prod_dir}")
+                
+                manifest = {
+                    'project_id': project_id,
+                    'sealed_at': datetime.utcnow().isoformat(),
+                    'workspace': prod_dir,
+                    'kits': kits
+                }
+                with open(os.path.join(staging, SEALED_MANIFEST), 'w') as f:
+                    json.dump(manifest, f)
+                # mkdtemp creates 0700; the fronting web server must be able to read the seal
+                os.chmod(staging, 0o755)
+                sealed = self.sealed_dir(project_id)
+                os.makedirs(os.path.dirname(sealed), exist_ok=True)
+                os.rename(staging, sealed)
+            except Exception:
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
         
-        # Create zip file
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            for root, dirs, files in os.walk(target_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arc_name = os.path.relpath(file_path, target_dir)
-                    zip_file.write(file_path, arc_name)
+        print(f"Sealed {len(kits)} startup kits of project {project_id}")
+        return manifest
+    
+    def discard_sealed_kits(self, project_id):
+        """Remove a project's seal once it is unfrozen, so the next freeze seals fresh kits"""
+        with self.project_lock(project_id):
+            sealed = self.sealed_dir(project_id)
+            if not os.path.isdir(sealed):
+                return False
+            # Renamed first so no download picks up a half-deleted seal
+            doomed = tempfile.mkdtemp(prefix=f".discard_{project_id}.", dir=self.sealed_root())
+            os.rename(sealed, os.path.join(doomed, 'kits'))
+        shutil.rmtree(doomed, ignore_errors=True)
+        return True
+    
+    def kit_offload_header(self, path, mode, accel_prefix='/sealed-kits/'):
+        """(header, value) handing a sealed kit to the fronting web server, or None to send it ourselves
         
-        zip_buffer.seek(0)
-        return zip_buffer, f"{target_type}_startup_kit.zip"
+        'accel' makes nginx serve the file from an internal location mapped to
+        the sealed directory; 'sendfile' gives Apache/lighttpd its absolute path.
+        """
+        if mode == 'accel':
+            relative = os.path.relpath(path, self.sealed_root()).replace(os.sep, '/')
+            return 'X-Accel-Redirect', accel_prefix.rstrip('/') + '/' + relative
+        if mode == 'sendfile':
+            return 'X-Sendfile', os.path.abspath(path)
+        return None
     
     def get_project_status(self, project_id):
         """Get the status of a project provisioning"""
         project = Project.query.get(project_id)
         if not project:
             return None
-        
-        workspace = os.path.join(self.workspace_dir, f"project_{project_id}")
+        return self.workspace_status(project)
+    
+    def workspace_status(self, project):
+        """Provisioning status of an already loaded project"""
+        workspace = self.project_workspace(project.id)
         
         if not os.path.exists(workspace):
             return {'status': 'not_provisioned'}
@@ -372,5 +754,23 @@ class NVFlareProvisioningService:
             'items': items,
             'last_updated': project.updated_at.isoformat()
         }
+    
+    def workspace_stamp(self, project_id):
+        """Changes whenever the workspace is created or its entries change (0 if absent)"""
+        try:
+            return os.stat(self.project_workspace(project_id)).st_mtime_ns
+        except OSError:
+            return 0
+
 
+_service = None
+_service_lock = threading.Lock()
 
+def get_service():
+    """Process-wide provisioning service, built on first use instead of at import"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = NVFlareProvisioningService()
+    return _service
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Certificate Rotation
+Indexes the earliest certificate expiry of every provisioned workspace and
+queues reprovisioning jobs for projects that are close to expiry. Certificates
+are parsed again only when a workspace's certificate files changed since the
+last scan. Rotations are queued only inside the configured time windows, and
+never more than CERT_ROTATION_MAX_CONCURRENT are queued or running at once
+across every scheduler and worker sharing the database.
+"""
+
+import hashlib
+import os
+import re
+import subprocess
+from datetime import datetime, time, timedelta
+from sqlalchemy import and_, func, select
+from . import db, jobs
+from .models import CertificateIndex, Project, ProvisioningJob
+
+try:
+    from cryptography import x509
+except ImportError:  # Optional: falls back to the openssl command line tool
+    x509 = None
+
+ROTATION_REASON = 'certificate_rotation'
+CERTIFICATE_SUFFIXES = ('.crt', '.pem')
+WINDOW_PATTERN = re.compile(r'^(\d{1,2}):(\d{2})-(\d{1,2}):(\d{2})$')
+
+
+def certificate_expiry(path):
+    """notAfter of a PEM certificate as naive UTC, or None if it cannot be read"""
+    if x509 is not None:
+        try:
+            with open(path, 'rb') as f:
+                certificate = x509.load_pem_x509_certificate(f.read())
+        except (OSError, ValueError):
+            return None
+        expiry = getattr(certificate, 'not_valid_after_utc', None)
+        return expiry.replace(tzinfo=None) if expiry else certificate.not_valid_after
+
+    try:
+        result = subprocess.run(['openssl', 'x509', '-noout', '-enddate', '-in', path],
+                                capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0 or '=' not in result.stdout:
+        return None
+    try:
+        # notAfter=Jun  1 12:00:00 2027 GMT
+        return datetime.strptime(result.stdout.strip().split('=', 1)[1], '%b %d %H:%M:%S %Y %Z')
+    except ValueError:
+        return None
+
+
+def certificate_files(prod_dir):
+    """(path, stat) of every certificate in the participants' startup folders, in path order"""
+    files = []
+    for root, dirs, names in os.walk(prod_dir):
+        if os.path.basename(root) != 'startup':
+            continue
+        for name in names:
+            if name.endswith(CERTIFICATE_SUFFIXES):
+                path = os.path.join(root, name)
+                files.append((path, os.stat(path)))
+    files.sort(key=lambda item: item[0])
+    return files
+
+
+def files_stamp(files):
+    """Changes whenever a certificate is added, removed or rewritten"""
+    digest = hashlib.sha1()
+    for path, stat in files:
+        digest.update(f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def scan_workspace(service, project_id, index=None):
+    """Bring one project's index row up to date; returns (row, rescanned) or (None, False) without a workspace"""
+    workspace = service.project_workspace(project_id)
+    prod_dir = service.find_generated_workspace(workspace) if os.path.isdir(workspace) else None
+    if prod_dir is None:
+        return None, False
+
+    files = certificate_files(prod_dir)
+    stamp = files_stamp(files)
+    if index is not None and index.workspace_stamp == stamp:
+        return index, False
+
+    earliest, earliest_path = None, None
+    for path, _ in files:
+        expiry = certificate_expiry(path)
+        if expiry is not None and (earliest is None or expiry < earliest):
+            earliest, earliest_path = expiry, os.path.relpath(path, workspace)
+
+    if index is None:
+        index = CertificateIndex(project_id=project_id)
+        db.session.add(index)
+    index.workspace_stamp = stamp
+    index.certificate_count = len(files)
+    index.earliest_expiry = earliest
+    index.earliest_certificate = earliest_path
+    index.scanned_at = datetime.utcnow()
+    return index, True
+
+
+def refresh_index(service):
+    """Rescan every workspace whose certificates changed and drop rows of removed workspaces"""
+    indexed = {index.project_id: index for index in CertificateIndex.query.all()}
+    project_ids = set(db.session.execute(select(Project.id)).scalars())
+
+    workspaces = rescanned = 0
+    for project_id in sorted(service.provisioned_workspaces()):
+        if project_id not in project_ids:
+            continue  # Left behind by a deleted project
+        index, changed = scan_workspace(service, project_id, indexed.pop(project_id, None))
+        if index is not None:
+            workspaces += 1
+            rescanned += changed
+
+    for index in indexed.values():
+        db.session.delete(index)
+    db.session.commit()
+    return {'workspaces': workspaces, 'rescanned': rescanned, 'removed': len(indexed)}
+
+
+def parse_windows(spec):
+    """'01:00-05:00,22:00-02:00' -> [(start, end)]; an empty spec allows rotations at any time"""
+    windows = []
+    for part in (spec or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        match = WINDOW_PATTERN.match(part)
+        if not match:
+            raise ValueError(f"Invalid rotation window: {part} (expected HH:MM-HH:MM)")
+        start_h, start_m, end_h, end_m = (int(value) for value in match.groups())
+        windows.append((time(start_h, start_m), time(end_h, end_m)))
+    return windows
+
+
+def in_window(moment, windows):
+    """Whether a local time of day falls in any window; windows may wrap past midnight"""
+    if not windows:
+        return True
+    for start, end in windows:
+        if start <= end and start <= moment < end:
+            return True
+        if start > end and (moment >= start or moment < end):
+            return True
+    return False
+
+
+def rotation_allowed(config, now=None):
+    """Whether rotations may run now, in local time; checked when queueing and again by the workers"""
+    now = now or datetime.now()
+    return in_window(now.time(), parse_windows(config.get('CERT_ROTATION_WINDOWS')))
+
+
+def _active_job(project_id_column):
+    return (
+        select(ProvisioningJob.id)
+        .where(ProvisioningJob.project_id == project_id_column,
+               ProvisioningJob.status.in_(['queued', 'running']))
+        .exists()
+    )
+
+
+def active_rotations():
+    """Rotation jobs queued or running right now, across every node"""
+    return db.session.execute(
+        select(func.count(ProvisioningJob.id))
+        .where(ProvisioningJob.reason == ROTATION_REASON, ProvisioningJob.status.in_(['queued', 'running']))
+    ).scalar()
+
+
+def due_projects(threshold_days, limit, now=None):
+    """(project_id, earliest_expiry) of projects expiring within the threshold, soonest first
+
+    Frozen projects are never reprovisioned, projects with a job in flight are
+    skipped, and a rotation is not tried again until the workspace changes.
+    """
+    now = now or datetime.utcnow()
+    tried_since_scan = (
+        select(ProvisioningJob.id)
+        .where(ProvisioningJob.project_id == CertificateIndex.project_id,
+               ProvisioningJob.reason == ROTATION_REASON,
+               ProvisioningJob.created_at >= CertificateIndex.scanned_at)
+        .exists()
+    )
+    return db.session.execute(
+        select(CertificateIndex.project_id, CertificateIndex.earliest_expiry)
+        .join(Project, Project.id == CertificateIndex.project_id)
+        .where(CertificateIndex.earliest_expiry < now + timedelta(days=threshold_days),
+               Project.frozen.isnot(True),
+               ~tried_since_scan,
+               ~_active_job(CertificateIndex.project_id))
+        .order_by(CertificateIndex.earliest_expiry)
+        .limit(limit)
+    ).all()
+
+
+def schedule_rotations(config, now=None):
+    """Queue rotations for due projects while inside a window and under the concurrency cap"""
+    summary = {'in_window': rotation_allowed(config, now), 'active': active_rotations(), 'queued': []}
+    if not summary['in_window']:
+        return summary
+
+    capacity = config.get('CERT_ROTATION_MAX_CONCURRENT', 2) - summary['active']
+    if capacity <= 0:
+        return summary
+
+    for project_id, expiry in due_projects(config.get('CERT_ROTATION_THRESHOLD_DAYS', 30), capacity):
+        jobs.enqueue(project_id, reason=ROTATION_REASON)
+        summary['queued'].append({'project_id': project_id, 'earliest_expiry': expiry.isoformat()})
+    db.session.commit()
+    return summary
+
+
+def expiring_certificates(days=None, limit=500):
+    """Index rows with their project, soonest expiry first; optionally only those expiring within days"""
+    query = (
+        select(CertificateIndex, Project.name, Project.frozen)
+        .join(Project, Project.id == CertificateIndex.project_id)
+        .order_by(CertificateIndex.earliest_expiry)
+        .limit(limit)
+    )
+    if days is not None:
+        query = query.where(and_(CertificateIndex.earliest_expiry.isnot(None),
+                                 CertificateIndex.earliest_expiry < datetime.utcnow() + timedelta(days=days)))
+    return db.session.execute(query).all()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Serialization Layer
+Per-model serializer functions shared by all views, plus the pluggable JSON
+provider used to encode them
+"""
+
+import json
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Optional: falls back to the standard library encoder
+    orjson = None
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def serialize_user(user):
+    """Public fields of a User (or auth.UserSnapshot)"""
+    return {
+        'id': user.id,
+        'email': user.email,
+        'name': user.name,
+        'role': user.role,
+        'organization': user.organization,
+        'approval_state': user.approval_state,
+        'is_active': user.is_active
+    }
+
+
+def serialize_project(project, creator=None, include_creator=False):
+    """Project summary; with include_creator also the creator's name and email"""
+    data = {
+        'id': project.id,
+        'name': project.name,
+        'description': project.description,
+        'scheme': project.scheme,
+        'ha_mode': project.ha_mode,
+        'frozen': project.frozen,
+        'public': project.public,
+        'server_name': project.server_name,
+        'created_by': project.created_by,
+        'created_at': _isoformat(project.created_at)
+    }
+    if include_creator:
+        data['creator_name'] = creator.name if creator else 'Unknown'
+        data['creator_email'] = creator.email if creator else 'Unknown'
+    return data
+
+
+def serialize_server(server):
+    return {
+        'id': server.id,
+        'name': server.name,
+        'org': server.org,
+        'fed_learn_port': server.fed_learn_port,
+        'admin_port': server.admin_port,
+        'connection_security': server.connection_security,
+        'approval_state': server.approval_state
+    }
+
+
+def serialize_client(client):
+    return {
+        'id': client.id,
+        'name': client.name,
+        'org': client.org,
+        'description': client.description,
+        'num_gpus': client.num_gpus,
+        'gpu_memory': client.gpu_memory,
+        'approval_state': client.approval_state
+    }
+
+
+def serialize_admin(admin):
+    return {
+        'id': admin.id,
+        'email': admin.email,
+        'org': admin.org,
+        'role': admin.role,
+        'approval_state': admin.approval_state
+    }
+
+
+def serialize_application(application, user):
+    """A UserApplication together with the applicant's details"""
+    return {
+        'id': application.id,
+        'user_name': user.name,
+        'user_email': user.email,
+        'organization': user.organization,
+        'role_requested': application.role_requested,
+        'message': application.message,
+        'status': application.status,
+        'created_at': _isoformat(application.created_at)
+    }
+
+
+def serialize_download_event(event, user_email=None):
+    return {
+        'id': event.id,
+        'user_id': event.user_id,
+        'user_email': user_email,
+        'target_type': event.target_type,
+        'participant_id': event.participant_id,
+        'created_at': _isoformat(event.created_at)
+    }
+
+
+def serialize_audit_event(event):
+    return {
+        'id': event.id,
+        'event_type': event.event_type,
+        'project_id': event.project_id,
+        'actor_id': event.actor_id,
+        'actor_email': event.actor_email,
+        'target_type': event.target_type,
+        'target_id': event.target_id,
+        'details': json.loads(event.details) if event.details else {},
+        'created_at': _isoformat(event.created_at)
+    }
+
+
+def serialize_provisioning_job(job):
+    return {
+        'id': job.id,
+        'project_id': job.project_id,
+        'status': job.status,
+        'reason': job.reason,
+        'requested_by': job.requested_by,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'worker_id': job.worker_id,
+        'lease_expires_at': _isoformat(job.lease_expires_at),
+        'heartbeat_at': _isoformat(job.heartbeat_at),
+        'workspace': job.workspace,
+        'error': job.error,
+        'created_at': _isoformat(job.created_at),
+        'started_at': _isoformat(job.started_at),
+        'finished_at': _isoformat(job.finished_at)
+    }
+
+
+def serialize_certificate_index(index, project_name=None, frozen=None):
+    return {
+        'project_id': index.project_id,
+        'project_name': project_name,
+        'frozen': bool(frozen),
+        'certificate_count': index.certificate_count,
+        'earliest_expiry': _isoformat(index.earliest_expiry),
+        'earliest_certificate': index.earliest_certificate,
+        'scanned_at': _isoformat(index.scanned_at)
+    }
+
+
+def serialize_approval_rule(rule):
+    return {
+        'id': rule.id,
+        'name': rule.name,
+        'kind': rule.kind,
+        'project_id': rule.project_id,
+        'conditions': json.loads(rule.conditions),
+        'enabled': bool(rule.enabled),
+        'created_by': rule.created_by,
+        'created_at': _isoformat(rule.created_at),
+        'updated_at': _isoformat(rule.updated_at)
+    }
+
+
+def serialize_project_archive(archive):
+    """An archived project from archival.archived_projects (no snapshot blob)"""
+    return {
+        'project_id': archive.project_id,
+        'name': archive.name,
+        'counts': json.loads(archive.counts) if archive.counts else {},
+        'snapshot_size': archive.snapshot_size,
+        'workspace_size': archive.workspace_size,
+        'last_activity': _isoformat(archive.last_activity),
+        'archived_at': _isoformat(archive.archived_at),
+        'archived_by': archive.archived_by
+    }
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson; output matches the default provider's sorted keys"""
+
+    options = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        return self._dumps_bytes(obj).decode('utf-8')
+
+    def _dumps_bytes(self, obj):
+        return orjson.dumps(obj, default=self.default, option=self.options)
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Skip the bytes -> str -> bytes round trip of the default implementation
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._dumps_bytes(obj), mimetype=self.mimetype)
+
+
+JSON_PROVIDERS = {
+    'std': DefaultJSONProvider,
+    'orjson': OrjsonProvider
+}
+
+
+def init_app(app):
+    """Install the JSON provider named by JSON_ENCODER ('auto', 'orjson' or 'std')"""
+    name = app.config.get('JSON_ENCODER', 'auto')
+    if name == 'auto':
+        name = 'orjson' if orjson else 'std'
+    if name == 'orjson' and orjson is None:
+        print("JSON_ENCODER=orjson requested but orjson is not installed; using the standard encoder")
+        name = 'std'
+    app.json = JSON_PROVIDERS[name](app)
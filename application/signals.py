@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Application Signals
+Blinker signals used to decouple mutating endpoints from downstream work
+"""
+
+from blinker import Namespace
+from sqlalchemy import update
+from datetime import datetime
+from . import db
+from .models import Project
+
+dashboard_signals = Namespace()
+
+# Sent once per project whose participants changed in a way that needs new kits
+reprovision_requested = dashboard_signals.signal('reprovision-requested')
+
+
+def request_reprovision(sender, project_ids, reason):
+    """Touch the affected projects and fire one reprovision trigger per project"""
+    project_ids = sorted(set(pid for pid in project_ids if pid is not None))
+    if not project_ids:
+        return []
+
+    # One set-based UPDATE so status/last_updated reflects the change
+    db.session.execute(
+        update(Project)
+        .where(Project.id.in_(project_ids))
+        .values(updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+    for project_id in project_ids:
+        reprovision_requested.send(sender, project_id=project_id, reason=reason)
+    return project_ids
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Project Snapshots
+Exports a project with its servers, clients, admins and applications as
+newline-delimited JSON records (optionally gzip-compressed) and imports such
+a snapshot as a new project. Both directions stream: rows are read and
+written in fixed-size batches, so memory does not grow with project size.
+
+    {"type": "snapshot", "format_version": 1, ...}
+    {"type": "project", "name": ..., ...}
+    {"type": "server" | "client" | "admin" | "application", ...}   (any number)
+    {"type": "end", "counts": {"server": 1, "client": 50000, ...}}
+"""
+
+import gzip
+import io
+import json
+import zlib
+from datetime import datetime
+from sqlalchemy import insert, select
+from sqlalchemy.orm import aliased
+from . import db
+from .models import Project, Server, Client, Admin, User, UserApplication
+
+try:
+    import orjson
+except ImportError:  # Optional: falls back to the standard library encoder
+    orjson = None
+
+FORMAT_VERSION = 1
+SNAPSHOT_BATCH_SIZE = 1000
+GZIP_MAGIC = b'\x1f\x8b'
+
+PARTICIPANT_MODELS = {'server': Server, 'client': Client, 'admin': Admin}
+# Never exported: surrogate keys, and fields tied to the source environment
+SKIPPED_COLUMNS = {'id', 'project_id', 'created_by', 'download_count'}
+PROJECT_COLUMNS = [c.name for c in Project.__table__.columns if c.name not in SKIPPED_COLUMNS]
+PARTICIPANT_COLUMNS = {
+    kind: [c.name for c in model.__table__.columns if c.name not in SKIPPED_COLUMNS]
+    for kind, model in PARTICIPANT_MODELS.items()
+}
+APPLICATION_COLUMNS = ['role_requested', 'message', 'status', 'created_at', 'reviewed_at']
+
+
+class SnapshotError(ValueError):
+    """Raised when a snapshot cannot be parsed or is incomplete"""
+
+
+def dump_line(record):
+    """One NDJSON line (bytes) for a record"""
+    if orjson is not None:
+        return orjson.dumps(record) + b'\n'
+    return json.dumps(record, separators=(',', ':'), default=str).encode() + b'\n'
+
+
+def _value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def row_record(kind, row, columns):
+    """Record of the given columns of a row, datetimes as ISO strings"""
+    record = {'type': kind}
+    for name in columns:
+        record[name] = _value(getattr(row, name))
+    return record
+
+
+def iter_records(project_id):
+    """Yield the snapshot of one project as NDJSON lines (bytes)"""
+    project = db.session.get(Project, project_id)
+    if project is None:
+        raise SnapshotError(f"Project {project_id} not found")
+
+    yield dump_line({'type': 'snapshot', 'format_version': FORMAT_VERSION,
+                  'exported_at': datetime.utcnow().isoformat(), 'source_project_id': project_id})
+    yield dump_line(row_record('project', project, PROJECT_COLUMNS))
+
+    counts = {}
+    for kind, model in PARTICIPANT_MODELS.items():
+        columns = PARTICIPANT_COLUMNS[kind]
+        rows = db.session.execute(
+            select(*(getattr(model, name) for name in columns))
+            .where(model.project_id == project_id)
+            .order_by(model.id)
+            .execution_options(yield_per=SNAPSHOT_BATCH_SIZE)
+        )
+        counts[kind] = 0
+        for batch in rows.partitions():
+            yield b''.join(dump_line(row_record(kind, row, columns)) for row in batch)
+            counts[kind] += len(batch)
+
+    # Users differ between environments, so applications refer to them by email
+    reviewer = aliased(User)
+    rows = db.session.execute(
+        select(*(getattr(UserApplication, name) for name in APPLICATION_COLUMNS),
+               User.email.label('user_email'), reviewer.email.label('reviewed_by_email'))
+        .join(User, User.id == UserApplication.user_id)
+        .outerjoin(reviewer, reviewer.id == UserApplication.reviewed_by)
+        .where(UserApplication.project_id == project_id)
+        .order_by(UserApplication.id)
+        .execution_options(yield_per=SNAPSHOT_BATCH_SIZE)
+    )
+    counts['application'] = 0
+    for batch in rows.partitions():
+        yield b''.join(dump_line(row_record('application', row, APPLICATION_COLUMNS + ['user_email', 'reviewed_by_email']))
+                       for row in batch)
+        counts['application'] += len(batch)
+
+    # Lets the importer tell a complete snapshot from a truncated one
+    yield dump_line({'type': 'end', 'counts': counts})
+
+
+def gzip_stream(chunks, level=6):
+    """Compress an iterable of byte chunks into a gzip stream as it is produced"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def open_snapshot(stream):
+    """Wrap a binary stream, transparently decompressing gzip (detected by its magic bytes)"""
+    buffered = stream if hasattr(stream, 'peek') else io.BufferedReader(stream)
+    if buffered.peek(2)[:2] == GZIP_MAGIC:
+        return gzip.GzipFile(fileobj=buffered, mode='rb')
+    return buffered
+
+
+def _parse_datetime(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def row_values(record, columns, model):
+    """Insert values for the known columns of a record; datetimes are parsed back"""
+    values = {}
+    for name in columns:
+        if name in record:
+            value = record[name]
+            if value is not None and isinstance(model.__table__.columns[name].type, db.DateTime):
+                value = _parse_datetime(value)
+            values[name] = value
+    return values
+
+
+class _Importer:
+    """Buffers one batch per table and flushes it with a single executemany INSERT"""
+
+    def __init__(self, project_id):
+        self.project_id = project_id
+        self.pending = {kind: [] for kind in list(PARTICIPANT_MODELS) + ['application']}
+        self.counts = {kind: 0 for kind in self.pending}
+        self.skipped_applications = 0
+
+    def add(self, kind, values):
+        self.pending[kind].append(values)
+        if len(self.pending[kind]) >= SNAPSHOT_BATCH_SIZE:
+            self.flush(kind)
+
+    def flush(self, kind):
+        rows = self.pending[kind]
+        if not rows:
+            return
+        if kind == 'application':
+            rows = self._resolve_users(rows)
+        if rows:
+            model = UserApplication if kind == 'application' else PARTICIPANT_MODELS[kind]
+            db.session.execute(insert(model), rows)
+        self.counts[kind] += len(rows)
+        self.pending[kind] = []
+
+    def flush_all(self):
+        for kind in self.pending:
+            self.flush(kind)
+
+    def _resolve_users(self, rows):
+        """Map user emails to this environment's user ids, one query per batch"""
+        emails = {row['user_email'] for row in rows} | {row['reviewed_by_email'] for row in rows
+                                                       if row.get('reviewed_by_email')}
+        user_ids = dict(db.session.execute(select(User.email, User.id).where(User.email.in_(emails))).all())
+        resolved = []
+        for row in rows:
+            user_id = user_ids.get(row.pop('user_email'))
+            reviewer = row.pop('reviewed_by_email', None)
+            if user_id is None:
+                self.skipped_applications += 1  # Applicant has no account here
+                continue
+            row.update(user_id=user_id, project_id=self.project_id, reviewed_by=user_ids.get(reviewer))
+            resolved.append(row)
+        return resolved
+
+
+def import_snapshot(lines, created_by, name=None, into_project_id=None):
+    """Create a new project from snapshot lines; the caller commits or rolls back
+
+    With into_project_id the participants and applications are loaded into
+    that existing project instead, and the project record is not applied.
+    Returns (project_id, summary). Raises SnapshotError on malformed or
+    truncated input, in which case nothing must be committed.
+    """
+    importer = None
+    header = end = None
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise SnapshotError(f"Line {number}: invalid JSON ({e})")
+        kind = record.get('type') if isinstance(record, dict) else None
+
+        if header is None:
+            if kind != 'snapshot':
+                raise SnapshotError("Not a project snapshot: the first record must have type 'snapshot'")
+            if record.get('format_version') != FORMAT_VERSION:
+                raise SnapshotError(f"Unsupported snapshot format_version: {record.get('format_version')}")
+            header = record
+        elif kind == 'project':
+            if importer is not None:
+                raise SnapshotError(f"Line {number}: a snapshot holds exactly one project")
+            if into_project_id is not None:
+                importer = _Importer(into_project_id)
+                continue
+            values = row_values(record, PROJECT_COLUMNS, Project)
+            if name:
+                values['name'] = name
+            if not values.get('name'):
+                raise SnapshotError(f"Line {number}: project has no name")
+            project = Project(created_by=created_by, **values)
+            db.session.add(project)
+            db.session.flush()
+            importer = _Importer(project.id)
+        elif kind in PARTICIPANT_MODELS or kind == 'application':
+            if importer is None:
+                raise SnapshotError(f"Line {number}: {kind} record before the project record")
+            if kind == 'application':
+                if not record.get('user_email'):
+                    raise SnapshotError(f"Line {number}: application has no user_email")
+                values = row_values(record, APPLICATION_COLUMNS, UserApplication)
+                values['user_email'] = record['user_email']
+                values['reviewed_by_email'] = record.get('reviewed_by_email')
+            else:
+                values = row_values(record, PARTICIPANT_COLUMNS[kind], PARTICIPANT_MODELS[kind])
+                values['project_id'] = importer.project_id
+            importer.add(kind, values)
+        elif kind == 'end':
+            end = record
+            break
+        else:
+            raise SnapshotError(f"Line {number}: unknown record type {kind!r}")
+
+    if importer is None:
+        raise SnapshotError("Snapshot contains no project")
+    if end is None:
+        raise SnapshotError("Snapshot is truncated: no end record")
+    importer.flush_all()
+
+    expected = end.get('counts') or {}
+    received = dict(importer.counts)
+    received['application'] += importer.skipped_applications
+    for kind, count in expected.items():
+        if received.get(kind) != count:
+            raise SnapshotError(f"Snapshot is incomplete: expected {count} {kind} records, got {received.get(kind)}")
+
+    return importer.project_id, {
+        'imported': importer.counts,
+        'skipped_applications': importer.skipped_applications,
+        'source_project_id': header.get('source_project_id')
+    }
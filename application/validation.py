@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Project Validation
+Checks a project's configuration against what the NVFlare CLI accepts before
+any subprocess is started. Participants are read column-only in batches and
+checked against hash-set indexes, so a project with 100k participants is
+validated in one pass over the database.
+"""
+
+import time
+from sqlalchemy import select
+from . import db
+from .models import Server, Client, Admin
+
+PROJECT_SCHEMES = ['grpc', 'http', 'tcp']
+CONNECTION_SECURITY_VALUES = ['mtls', 'tls', 'none']
+VALIDATION_BATCH_SIZE = 1000
+# Keeps the report small when thousands of rows share the same problem
+MAX_REPORTED_ISSUES = 200
+
+
+class ProjectValidationError(ValueError):
+    """Raised instead of provisioning a project whose configuration is invalid"""
+
+    def __init__(self, report):
+        self.report = report
+        messages = [issue['message'] for issue in report['errors'][:3]]
+        more = report['error_count'] - len(messages)
+        super().__init__('; '.join(messages) + (f" (and {more} more)" if more > 0 else ''))
+
+
+class _Report:
+    """Collects errors and warnings up to MAX_REPORTED_ISSUES each"""
+
+    def __init__(self):
+        self.errors = []
+        self.warnings = []
+        self.error_count = 0
+        self.warning_count = 0
+
+    def error(self, code, message, **context):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ISSUES:
+            self.errors.append(dict(code=code, message=message, **context))
+
+    def warning(self, code, message, **context):
+        self.warning_count += 1
+        if len(self.warnings) < MAX_REPORTED_ISSUES:
+            self.warnings.append(dict(code=code, message=message, **context))
+
+
+def _rows(query):
+    """Stream a column-only query in batches"""
+    for batch in db.session.execute(query.execution_options(yield_per=VALIDATION_BATCH_SIZE)).partitions():
+        yield from batch
+
+
+def _is_valid_name(name):
+    """Participant names become directory names in the workspace"""
+    return bool(name) and name == name.strip() and '/' not in name and '\\' not in name
+
+
+def _describe(participant_type, participant_id):
+    return participant_type if participant_id is None else f"{participant_type} #{participant_id}"
+
+
+def validate_project(project):
+    """Validate a loaded project and its participants; returns the report as a dict"""
+    started = time.perf_counter()
+    report = _Report()
+
+    if project.scheme not in PROJECT_SCHEMES:
+        report.error('invalid_scheme', f"Invalid scheme: {project.scheme} (expected one of {', '.join(PROJECT_SCHEMES)})")
+    if not _is_valid_name(project.server_name):
+        report.error('invalid_server_name', f"Invalid server name: {project.server_name!r}")
+
+    # Every participant name in project.yml must be unique; the server is named after server_name
+    names = {project.server_name: ('server', None)}
+
+    servers = 0
+    server_ports = set()
+    for row in _rows(select(Server.id, Server.name, Server.org, Server.fed_learn_port, Server.admin_port,
+                            Server.connection_security)
+                     .where(Server.project_id == project.id).order_by(Server.id)):
+        servers += 1
+        context = {'participant_type': 'server', 'participant_id': row.id, 'name': row.name}
+        if not row.org:
+            report.error('missing_org', f"Server {row.name} has no organization", **context)
+        if row.connection_security not in CONNECTION_SECURITY_VALUES:
+            report.error('invalid_connection_security',
+                         f"Server {row.name} has invalid connection_security: {row.connection_security}", **context)
+        for field in ('fed_learn_port', 'admin_port'):
+            port = getattr(row, field)
+            if port is None or not 0 < port < 65536:
+                report.error('port_out_of_range', f"Server {row.name} {field} out of range: {port}", **context)
+        if row.fed_learn_port == row.admin_port:
+            report.error('port_clash', f"Server {row.name} uses port {row.fed_learn_port} for both "
+                                       f"fed_learn_port and admin_port", **context)
+        for port in {row.fed_learn_port, row.admin_port}:
+            if (row.name, port) in server_ports:
+                report.error('port_clash', f"Port {port} is used twice on server host {row.name}", **context)
+            server_ports.add((row.name, port))
+
+    if servers == 0:
+        report.error('missing_server', f"Project {project.id} must have at least one server")
+    elif servers > 1:
+        # Mirrors the provisioning warning: only the first server is written to project.yml
+        report.warning('additional_servers_ignored',
+                       f"{servers - 1} additional servers will be ignored (NVFlare supports one server)")
+
+    clients = 0
+    for row in _rows(select(Client.id, Client.name, Client.org)
+                     .where(Client.project_id == project.id).order_by(Client.id)):
+        clients += 1
+        context = {'participant_type': 'client', 'participant_id': row.id, 'name': row.name}
+        if not _is_valid_name(row.name):
+            report.error('invalid_name', f"Invalid client name: {row.name!r}", **context)
+        elif row.name in names:
+            other_type, other_id = names[row.name]
+            report.error('duplicate_name',
+                         f"Client name {row.name} is already used by {_describe(other_type, other_id)}",
+                         conflicts_with={'participant_type': other_type, 'participant_id': other_id}, **context)
+        else:
+            names[row.name] = ('client', row.id)
+            if not row.name.startswith('site-'):
+                # find_kit_dir picks client kits by their 'site-' prefix
+                report.warning('client_kit_lookup',
+                               f"Client {row.name} does not start with 'site-'; its kit cannot be downloaded",
+                               **context)
+        if not row.org:
+            report.error('missing_org', f"Client {row.name} has no organization", **context)
+
+    admins = 0
+    for row in _rows(select(Admin.id, Admin.email, Admin.org)
+                     .where(Admin.project_id == project.id).order_by(Admin.id)):
+        admins += 1
+        context = {'participant_type': 'admin', 'participant_id': row.id, 'email': row.email}
+        # Admins are provisioned under the local part of their email (see user_config)
+        username = (row.email or '').split('@')[0]
+        if '@' not in (row.email or '') or not _is_valid_name(username):
+            report.error('invalid_email', f"Invalid admin email: {row.email!r}", **context)
+        elif username in names:
+            other_type, other_id = names[username]
+            report.error('admin_name_collision',
+                         f"Admin {row.email} is provisioned as {username}, "
+                         f"already used by {_describe(other_type, other_id)}",
+                         conflicts_with={'participant_type': other_type, 'participant_id': other_id}, **context)
+        else:
+            names[username] = ('admin', row.id)
+        if not row.org:
+            report.error('missing_org', f"Admin {row.email} has no organization", **context)
+
+    return {
+        'project_id': project.id,
+        'valid': report.error_count == 0,
+        'error_count': report.error_count,
+        'warning_count': report.warning_count,
+        'errors': report.errors,
+        'warnings': report.warnings,
+        'checked': {'servers': servers, 'clients': clients, 'admins': admins},
+        'duration_ms': round((time.perf_counter() - started) * 1000, 3)
+    }
+
+
+def ensure_valid(project):
+    """Raise ProjectValidationError if the project cannot be provisioned; returns the report otherwise"""
+    report = validate_project(project)
+    if not report['valid']:
+        raise ProjectValidationError(report)
+    return report
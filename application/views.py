@@ -3,21 +3,31 @@
 API Views for Sorachain Provisioning Dashboard
 """
 
-from flask import Blueprint, request, jsonify, send_file, make_response
-from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token
+from flask import Blueprint, Response, abort, current_app, request, jsonify, send_file, make_response, stream_with_context
+from flask_jwt_extended import jwt_required, create_access_token
+from sqlalchemy import select
+from werkzeug.local import LocalProxy
 from werkzeug.security import check_password_hash, generate_password_hash
 from . import db
-from .models import User, Project, Server, Client, Admin, UserApplication
-from .provisioning import NVFlareProvisioningService
+from .models import User, Project, Server, Client, Admin, UserApplication, ProvisioningJob, ApprovalRule
+from .provisioning import ProjectFrozenError, ProjectArchivedError, get_service as get_provisioning_service
+from .serializers import (
+    serialize_user, serialize_project, serialize_server, serialize_client, serialize_admin,
+    serialize_application, serialize_provisioning_job, serialize_certificate_index, serialize_approval_rule,
+    serialize_project_archive
+)
+from . import bulk_import, approvals, signals, auth, downloads, audit, project_cache, progress, profiling, jobs, validation, rotation, snapshots, cloning, auto_approval, archival, health
 import io
+import os
+import time
 from datetime import datetime
 
 # Create blueprints
 main_bp = Blueprint('main', __name__)
 api_bp = Blueprint('api', __name__)
 
-# Initialize provisioning service
-provisioning_service = NVFlareProvisioningService()
+# Built on first use: importing the views must not touch the filesystem
+provisioning_service = LocalProxy(get_provisioning_service)
 
 def add_cors_headers(response):
     """Add CORS headers to response"""
@@ -38,15 +48,29 @@ def add_cors_headers(response):
 
 @api_bp.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
-    try:
-        # Test database connection
-        User.query.first()
+    """Health check endpoint, answered from the cached readiness result"""
+    result, _ = health.readiness_cache.get()
+    database = result['checks']['database']
+    if database['ok']:
         return jsonify({'status': 'healthy', 'database': 'connected'})
-    except Exception as e:
-        response = jsonify({'status': 'unhealthy', 'error': str(e)})
-        response.status_code = 500
-        return response
+    response = jsonify({'status': 'unhealthy', 'error': database['detail']})
+    response.status_code = 500
+    return response
+
+@api_bp.route('/livez', methods=['GET'])
+def liveness_check():
+    """Liveness probe: the process is up and serving; touches nothing else"""
+    return jsonify({'status': 'alive'})
+
+@api_bp.route('/readyz', methods=['GET'])
+def readiness_check():
+    """Readiness probe: databases, schema and workspace, cached for READINESS_CACHE_TTL seconds"""
+    result, cached = health.readiness_cache.get()
+    response = jsonify({**result, 'cached': cached})
+    if result['status'] != 'ready':
+        response.status_code = 503
+    response.headers['Cache-Control'] = 'no-store'
+    return response
 
 @main_bp.route('/')
 def index():
@@ -110,17 +134,7 @@ def users_api():
         try:
             # Get users (no authentication required for basic listing)
             users = User.query.all()
-            response = jsonify({
-                'users': [{
-                    'id': user.id,
-                    'email': user.email,
-                    'name': user.name,
-                    'role': user.role,
-                    'organization': user.organization,
-                    'approval_state': user.approval_state,
-                    'is_active': user.is_active
-                } for user in users]
-            })
+            response = jsonify({'users': [serialize_user(user) for user in users]})
             return add_cors_headers(response)
         except Exception as e:
             print(f"Error in GET /users: {e}")
@@ -164,6 +178,8 @@ def users_api():
             db.session.add(user)
             db.session.commit()
             
+            audit.record_event('user.registered', target_type='user', target_id=user.id,
+                               email=user.email, organization=user.organization)
             print(f"User created successfully: {user.email}")
             response = jsonify({'message': 'User created successfully', 'user_id': user.id})
             return add_cors_headers(response)
@@ -200,14 +216,7 @@ def login():
             print(f"User logged in successfully: {user.email}")
             response = jsonify({
                 'access_token': access_token,
-                'user': {
-                    'id': user.id,
-                    'email': user.email,
-                    'name': user.name,
-                    'role': user.role,
-                    'organization': user.organization,
-                    'approval_state': user.approval_state
-                }
+                'user': serialize_user(user)
             })
             return add_cors_headers(response)
         
@@ -227,29 +236,19 @@ def get_projects():
     """Get all projects"""
     try:
         print("Getting projects...")
-        projects = Project.query.all()
+        # Archived projects are left out unless asked for
+        if request.args.get('include_archived', 'false').lower() in ['1', 'true', 'yes']:
+            projects = Project.query.all()
+            archived = set(db.session.execute(archival.archived_ids()).scalars())
+        else:
+            projects = Project.query.filter(Project.id.not_in(archival.archived_ids())).all()
+            archived = set()
         print(f"Found {len(projects)} projects")
         
-        project_list = []
-        for project in projects:
-            try:
-                project_data = {
-                    'id': project.id,
-                    'name': project.name,
-                    'description': project.description,
-                    'scheme': project.scheme,
-                    'ha_mode': project.ha_mode,
-                    'frozen': project.frozen,
-                    'public': project.public,
-                    'server_name': project.server_name,
-                    'created_by': project.created_by,
-                    'created_at': project.created_at.isoformat()
-                }
-                project_list.append(project_data)
-                print(f"Processed project: {project.name}")
-            except Exception as e:
-                print(f"Error processing project {project.id}: {e}")
-                continue
+        project_list = [serialize_project(project) for project in projects]
+        for data in project_list:
+            if data['id'] in archived:
+                data['archived'] = True
         
         print(f"Returning {len(project_list)} projects")
         response = jsonify({'projects': project_list})
@@ -268,9 +267,7 @@ def create_project():
     try:
         print(f"Creating project - request headers: {dict(request.headers)}")
         # Get current user
-        current_user_email = get_jwt_identity()
-        print(f"Current user email from JWT: {current_user_email}")
-        current_user = User.query.filter_by(email=current_user_email).first()
+        current_user = auth.current_user()
         print(f"Current user found: {current_user}")
         
         if not current_user:
@@ -294,6 +291,8 @@ def create_project():
         db.session.add(project)
         db.session.commit()
         
+        audit.record_event('project.created', project_id=project.id, target_type='project',
+                           target_id=project.id, name=project.name)
         return jsonify({'message': 'Project created successfully', 'project_id': project.id})
         
     except Exception as e:
@@ -303,59 +302,106 @@ def create_project():
         response.status_code = 500
         return response
 
+# Sections GET /projects/<id> can expand with ?include=; without it the
+# response keeps its original shape (participants plus creator)
+PROJECT_INCLUDES = ['participants', 'applications', 'status', 'creator']
+DEFAULT_PROJECT_INCLUDES = ('creator', 'participants')
+
+def _parse_project_includes():
+    """Effective include set for the caller; applications are only expanded for admins"""
+    raw = request.args.get('include')
+    if raw is None:
+        return DEFAULT_PROJECT_INCLUDES
+    
+    includes = {item.strip() for item in raw.split(',') if item.strip()}
+    unknown = includes - set(PROJECT_INCLUDES)
+    if unknown:
+        raise ValueError(f"Unknown include: {', '.join(sorted(unknown))}")
+    
+    if 'applications' in includes:
+        user = auth.current_user()
+        if not user or user.role not in ['admin', 'proj_admin']:
+            includes.discard('applications')
+    return tuple(sorted(includes))
+
 @api_bp.route('/projects/<int:project_id>', methods=['GET'])
 @jwt_required()
 def get_project(project_id):
-    """Get project details"""
-    project = Project.query.get_or_404(project_id)
-    servers = Server.query.filter_by(project_id=project_id).all()
-    clients = Client.query.filter_by(project_id=project_id).all()
-    admins = Admin.query.filter_by(project_id=project_id).all()
+    """Get project details, answering If-None-Match with 304 while the project is unchanged"""
+    try:
+        includes = _parse_project_includes()
+    except ValueError as e:
+        response = jsonify({'error': str(e)})
+        response.status_code = 400
+        return response
+    
+    # Checked in the same query, so unknown ids never get a 304
+    version = project_cache.get_version(project_id)
+    if version is None:
+        response = jsonify({'error': 'Project not found'})
+        response.status_code = 404
+        return response
+    variant = '' if includes == DEFAULT_PROJECT_INCLUDES else '.'.join(includes)
+    if 'status' in includes:
+        # Provisioning changes the workspace on disk, not the project version
+        variant += f"-w{provisioning_service.workspace_stamp(project_id)}"
+    etag = project_cache.make_etag(project_id, version, variant)
+    
+    # Compressed responses carry the weak form of the same ETag
+    if request.if_none_match.contains_weak(etag):
+        response = make_response('', 304)
+        response.set_etag(etag)
+        return response
+    
+    body = project_cache.project_response_cache.get((project_id, version, variant))
+    if body is None:
+        body = _render_project_detail(project_id, includes)
+        project_cache.project_response_cache.put((project_id, version, variant), body)
+    
+    response = make_response(body)
+    response.mimetype = 'application/json'
+    response.set_etag(etag)
+    # Clients may keep the body but must revalidate it on every use
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def _render_project_detail(project_id, includes=DEFAULT_PROJECT_INCLUDES):
+    """Build the project detail JSON body with one query per requested section"""
+    row = db.session.execute(
+        select(Project, User)
+        .outerjoin(User, User.id == Project.created_by)
+        .where(Project.id == project_id)
+    ).first()
+    if row is None:
+        abort(404)
+    archived = _archived_response(project_id)
+    if archived is not None:
+        # Only reached on a cache miss; archiving bumps the version
+        abort(archived)
+    project, creator = row
+    
+    result = {'project': serialize_project(project, creator, include_creator='creator' in includes)}
+    
+    if 'participants' in includes:
+        result['servers'] = [serialize_server(server) for server in Server.query.filter_by(project_id=project_id)]
+        result['clients'] = [serialize_client(client) for client in Client.query.filter_by(project_id=project_id)]
+        result['admins'] = [serialize_admin(admin) for admin in Admin.query.filter_by(project_id=project_id)]
+    
+    if 'applications' in includes:
+        result['applications'] = _project_applications(project_id)
     
-    # Get creator information
-    creator = User.query.get(project.created_by)
+    if 'status' in includes:
+        result['status'] = provisioning_service.workspace_status(project)
     
-    return jsonify({
-        'project': {
-            'id': project.id,
-            'name': project.name,
-            'description': project.description,
-            'scheme': project.scheme,
-            'ha_mode': project.ha_mode,
-            'frozen': project.frozen,
-            'public': project.public,
-            'server_name': project.server_name,
-            'created_by': project.created_by,
-            'creator_name': creator.name if creator else 'Unknown',
-            'creator_email': creator.email if creator else 'Unknown',
-            'created_at': project.created_at.isoformat()
-        },
-        'servers': [{
-            'id': server.id,
-            'name': server.name,
-            'org': server.org,
-            'fed_learn_port': server.fed_learn_port,
-            'admin_port': server.admin_port,
-            'connection_security': server.connection_security,
-            'approval_state': server.approval_state
-        } for server in servers],
-        'clients': [{
-            'id': client.id,
-            'name': client.name,
-            'org': client.org,
-            'description': client.description,
-            'num_gpus': client.num_gpus,
-            'gpu_memory': client.gpu_memory,
-            'approval_state': client.approval_state
-        } for client in clients],
-        'admins': [{
-            'id': admin.id,
-            'email': admin.email,
-            'org': admin.org,
-            'role': admin.role,
-            'approval_state': admin.approval_state
-        } for admin in admins]
-    })
+    return jsonify(result).get_data()
+
+def _archived_response(project_id):
+    """410 for routes that read or write the participants of an archived project, else None"""
+    if not archival.is_archived(project_id):
+        return None
+    response = jsonify({'error': 'Project is archived; restore it first', 'project_id': project_id})
+    response.status_code = 410
+    return response
 
 @api_bp.route('/projects/<int:project_id>', methods=['PUT'])
 @jwt_required()
@@ -363,8 +409,7 @@ def update_project(project_id):
     """Update project details - only project creator can update"""
     try:
         # Get current user
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
+        current_user = auth.current_user()
         
         if not current_user:
             response = jsonify({'error': 'User not found'})
@@ -397,14 +442,23 @@ def update_project(project_id):
             project.server_name = data['server_name']
         if 'ha_mode' in data:
             project.ha_mode = data['ha_mode']
+        unfrozen = False
         if 'frozen' in data:
+            unfrozen = bool(project.frozen) and not data['frozen']
             project.frozen = data['frozen']
         if 'public' in data:
             project.public = data['public']
         
         project.updated_at = datetime.utcnow()
+        project_cache.bump_version(project_id)
         db.session.commit()
         
+        if unfrozen:
+            # Kits are sealed again from the current workspace on the next freeze
+            provisioning_service.discard_sealed_kits(project_id)
+        
+        audit.record_event('project.updated', project_id=project_id, target_type='project',
+                           target_id=project_id, fields=sorted(data.keys()))
         return jsonify({'message': 'Project updated successfully'})
         
     except Exception as e:
@@ -440,10 +494,12 @@ def add_server(project_id):
             response = jsonify({'error': 'Project not found'})
             response.status_code = 404
             return response
+        archived = _archived_response(project_id)
+        if archived is not None:
+            return archived
         
         # Check if user has permission to modify this project
-        current_user_email = get_jwt_identity()
-        current_user = User.query.filter_by(email=current_user_email).first()
+        current_user = auth.current_user()
         
         if not current_user:
             response = jsonify({'error': 'User not found'})
@@ -467,8 +523,11 @@ def add_server(project_id):
         )
         
         db.session.add(server)
+        project_cache.bump_version(project_id)
         db.session.commit()
         
+        audit.record_event('server.added', project_id=project_id, target_type='server',
+                           target_id=server.id, name=server.name)
         print(f"Server added successfully: {server.name}")
         return jsonify({'message': 'Server added successfully', 'server_id': server.id})
         
@@ -485,8 +544,7 @@ def update_server(project_id, server_id):
     """Update server in project"""
     try:
         # Check if user has permission to modify this project
-        current_user_email = get_jwt_identity()
-        current_user = User.query.filter_by(email=current_user_email).first()
+        current_user = auth.current_user()
         
         if not current_user:
             response = jsonify({'error': 'User not found'})
@@ -513,14 +571,17 @@ def update_server(project_id, server_id):
             response = jsonify({'error': 'Server not found'})
             response.status_code = 404
             return response
-    
-            server.name = data['name']
+        
+        server.name = data['name']
         server.org = data['org']
         server.fed_learn_port = data.get('fed_learn_port', 8002)
         server.admin_port = data.get('admin_port', 8003)
         server.connection_security = data.get('connection_security', 'mtls')
         
+        project_cache.bump_version(project_id)
         db.session.commit()
+        audit.record_event('server.updated', project_id=project_id, target_type='server',
+                           target_id=server_id, name=server.name)
         return jsonify({'message': 'Server updated successfully'})
         
     except Exception as e:
@@ -536,8 +597,7 @@ def delete_server(project_id, server_id):
     """Delete server from project"""
     try:
         # Check if user has permission to modify this project
-        current_user_email = get_jwt_identity()
-        current_user = User.query.filter_by(email=current_user_email).first()
+        current_user = auth.current_user()
         
         if not current_user:
             response = jsonify({'error': 'User not found'})
@@ -563,9 +623,12 @@ def delete_server(project_id, server_id):
             response = jsonify({'error': 'Server not found'})
             response.status_code = 403
             return response
-    
-            db.session.delete(server)
+        
+        db.session.delete(server)
+        project_cache.bump_version(project_id)
         db.session.commit()
+        audit.record_event('server.deleted', project_id=project_id, target_type='server',
+                           target_id=server_id, name=server.name)
         return jsonify({'message': 'Server deleted successfully'})
         
     except Exception as e:
@@ -575,6 +638,12 @@ def delete_server(project_id, server_id):
         response.status_code = 500
         return response
 
+def _auto_approve(kinds, ids=None, project_id=None):
+    """Run the auto-approval rules over rows created in this transaction, before the commit"""
+    if not current_app.config.get('AUTO_APPROVAL_ON_CREATE', True):
+        return []
+    return auto_approval.apply_rules([kinds] if isinstance(kinds, str) else kinds, ids=ids, project_id=project_id)
+
 @api_bp.route('/projects/<int:project_id>/clients', methods=['POST'])
 @jwt_required()
 def add_client(project_id):
@@ -601,6 +670,9 @@ def add_client(project_id):
             response = jsonify({'error': 'Project not found'})
             response.status_code = 404
             return response
+        archived = _archived_response(project_id)
+        if archived is not None:
+            return archived
         
         client = Client(
             project_id=project_id,
@@ -613,10 +685,17 @@ def add_client(project_id):
         )
         
         db.session.add(client)
+        db.session.flush()
+        auto_approved = _auto_approve('clients', ids=[client.id])
+        project_cache.bump_version(project_id)
         db.session.commit()
         
+        audit.record_event('client.added', project_id=project_id, target_type='client',
+                           target_id=client.id, name=client.name)
+        auto_approval.after_commit(auto_approved, api_bp)
         print(f"Client added successfully: {client.name}")
-        return jsonify({'message': 'Client added successfully', 'client_id': client.id})
+        return jsonify({'message': 'Client added successfully', 'client_id': client.id,
+                        'auto_approved': bool(auto_approved)})
         
     except Exception as e:
         print(f"Error adding client: {e}")
@@ -625,6 +704,303 @@ def add_client(project_id):
         response.status_code = 500
         return response
 
+@api_bp.route('/projects/<int:project_id>/participants/import', methods=['POST'])
+@jwt_required()
+def import_participants(project_id):
+    """Bulk import servers, clients and admins from CSV, YAML or JSON"""
+    try:
+        # Check if project exists
+        project = Project.query.get(project_id)
+        if not project:
+            response = jsonify({'error': 'Project not found'})
+            response.status_code = 404
+            return response
+        archived = _archived_response(project_id)
+        if archived is not None:
+            return archived
+
+        # Check if user has permission to modify this project
+        current_user = auth.current_user()
+
+        if not current_user:
+            response = jsonify({'error': 'User not found'})
+            response.status_code = 401
+            return response
+
+        if current_user.role != 'admin' and project.created_by != current_user.id:
+            response = jsonify({'error': 'Only the project creator can modify this project'})
+            response.status_code = 403
+            return response
+
+        # Accept either a multipart file upload or a raw request body
+        upload = request.files.get('file')
+        try:
+            if upload:
+                fmt = bulk_import.detect_format(upload.mimetype, upload.filename, request.args.get('format'))
+                rows = bulk_import.parse_participants(upload.read(), fmt)
+            else:
+                fmt = bulk_import.detect_format(request.content_type, None, request.args.get('format'))
+                rows = bulk_import.parse_participants(request.get_data(), fmt)
+        except bulk_import.ImportFormatError as e:
+            response = jsonify({'error': str(e)})
+            response.status_code = 400
+            return response
+
+        if not rows:
+            response = jsonify({'error': 'No participants provided'})
+            response.status_code = 400
+            return response
+
+        atomic = request.args.get('atomic', 'true').lower() not in ['0', 'false', 'no']
+        summary = bulk_import.import_participants(project_id, rows, atomic=atomic)
+
+        if summary['errors'] and atomic:
+            db.session.rollback()
+            response = jsonify({'error': 'Validation failed, nothing was imported', **summary})
+            response.status_code = 400
+            return response
+
+        # Only the rows this import created; older pending rows wait for a review or the next sweep
+        auto_approved = []
+        for participant_type in ['client', 'admin']:
+            created = [result['id'] for result in summary['results']
+                       if result['status'] == 'created' and result['type'] == participant_type]
+            if created:
+                auto_approved += _auto_approve(participant_type + 's', ids=created)
+        summary['auto_approved'] = {kind: auto_approval.approved_count(auto_approved, kind)
+                                    for kind in ['clients', 'admins']}
+        project_cache.bump_version(project_id)
+        db.session.commit()
+
+        audit.record_event('participants.imported', project_id=project_id, imported=summary['imported'])
+        auto_approval.after_commit(auto_approved, api_bp)
+        print(f"Imported participants into project {project_id}: {summary['imported']}")
+        return jsonify({'message': 'Participants imported successfully', **summary})
+
+    except Exception as e:
+        print(f"Error importing participants: {e}")
+        db.session.rollback()
+        response = jsonify({'error': 'Internal server error'})
+        response.status_code = 500
+        return response
+
+@api_bp.route('/projects/<int:project_id>/export', methods=['GET'])
+@jwt_required()
+def export_project(project_id):
+    """Stream a project snapshot as newline-delimited JSON, gzip-compressed with ?gzip=1"""
+    try:
+        project = Project.query.get(project_id)
+        if not project:
+            response = jsonify({'error': 'Project not found'})
+            response.status_code = 404
+            return response
+        archived = _archived_response(project_id)
+        if archived is not None:
+            return archived
+        
+        current_user = auth.current_user()
+        if not current_user:
+            response = jsonify({'error': 'User not found'})
+            response.status_code = 401
+            return response
+        
+        if current_user.role != 'admin' and project.created_by != current_user.id:
+            response = jsonify({'error': 'Only the project creator can export this project'})
+            response.status_code = 403
+            return response
+        
+        compress = request.args.get('gzip', 'false').lower() in ['1', 'true', 'yes']
+        chunks = snapshots.iter_records(project_id)
+        if compress:
+            chunks = snapshots.gzip_stream(chunks)
+        filename = f"project_{project_id}.ndjson" + ('.gz' if compress else '')
+        
+        audit.record_event('project.exported', project_id=project_id, target_type='project',
+                           target_id=project_id, gzip=compress)
+        # Rows are fetched and sent in batches while the client reads
+        response = Response(stream_with_context(chunks),
+                            mimetype='application/gzip' if compress else 'application/x-ndjson')
+        response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+        
+    except Exception as e:
+        print(f"Error exporting project: {e}")
+        response = jsonify({'error': 'Internal server error'})
+        response.status_code = 500
+        return response
+
+@api_bp.route('/projects/import', methods=['POST'])
+@jwt_required()
+def import_project():
+    """Create a project from an NDJSON snapshot (plain or gzip), all in one transaction"""
+    try:
+        current_user = auth.current_user()
+        if not current_user:
+            response = jsonify({'error': 'User not found'})
+            response.status_code = 401
+            return response
+        
+        # Accept either a multipart file upload or a raw request body, read line by line
+        upload = request.files.get('file')
+        stream = snapshots.open_snapshot(upload.stream if upload else request.stream)
+        try:
+            project_id, summary = snapshots.import_snapshot(stream, current_user.id, name=request.args.get('name'))
+        except (snapshots.SnapshotError, OSError, EOFError) as e:
+            # Also covers corrupt or truncated gzip data; nothing has been committed
+            db.session.rollback()
+            response = jsonify({'error': f"Invalid snapshot: {e}"})
+            response.status_code = 400
+            return response
+        
+        project_cache.bump_version(project_id)
+        db.session.commit()
+        
+        audit.record_event('project.imported', project_id=project_id, target_type='project',
+                           target_id=project_id, **summary)
+        print(f"Imported project {project_id} from snapshot: {summary['imported']}")
+        return jsonify({'message': 'Project imported successfully', 'project_id': project_id, **summary})
+        
+    except Exception as e:
+        print(f"Error importing project: {e}")
+        db.session.rollback()
+        response = jsonify({'error': 'Internal server error'})
+        response.status_code = 500
+        return response
+
+@api_bp.route('/projects/<int:project_id>/clone', methods=['POST'])
+@jwt_required()
+def clone_project(project_id):
+    """Copy a project with all its servers, clients and admins in one transaction"""
+    try:
+        project = Project.query.get(project_id)
+        if not project:
+            response = jsonify({'error': 'Project not found'})
+            response.status_code = 404
+            return response
+        archived = _archived_response(project_id)
+        if archived is not None:
+            return archived
+        
+        current_user = auth.current_user()
+        if not current_user:
+            response = jsonify({'error': 'User not found'})
+            response.status_code = 401
+            return response
+        
+        # Public projects serve as templates anyone can clone
+        if current_user.role != 'admin' and project.created_by != current_user.id and not project.public:
+            response = jsonify({'error': 'Only the project creator can clone this project'})
+            response.status_code = 403
+            return response
+        
+        data = request.get_json(silent=True) or {}
+        try:
+            reset = cloning.approval_reset(data.get('reset_approvals'))
+        except cloning.CloneError as e:
+            response = jsonify({'error': str(e)})
+            response.status_code = 400
+            return response
+        
+        started = time.perf_counter()
+        clone, copied = cloning.clone_project(project, current_user.id, name=data.get('name'),
+                                              reset_approvals=reset)
+        db.session.commit()
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        
+        audit.record_event('project.cloned', project_id=clone.id, target_type='project', target_id=clone.id,
+                           source_project_id=project_id, copied=copied, reset_approvals=reset)
+        print(f"Cloned project {project_id} into {clone.id} in {elapsed_ms}ms: {copied}")
+        return jsonify({'message': 'Project cloned successfully', 'project_id': clone.id,
+                        'source_project_id': project_id, 'copied': copied, 'reset_approvals': reset})
+        
+    except Exception as e:
+        print(f"Error cloning project: {e}")
+        db.session.rollback()
+        response = jsonify({'error': 'Internal server error'})
+        response.status_code = 500
+        return response
+
+@api_bp.route('/projects/<int:project_id>/archive', methods=['POST'])
+@jwt_required()
+def archive_project(project_id):
+    """Move a project's participants and workspace into the archive"""
+    try:
+        admin_user = auth.current_user()
+        if not admin_user or admin_user.role != 'admin':
+            response = jsonify({'error': 'Unauthorized'})
+            response.status_code = 403
+            return response
+        
+        if not db.session.get(Project, project_id):
+            response = jsonify({'error': 'Project not found'})
+            response.status_code = 404
+            return response
+        
+        try:
+            summary = archival.archive_project(provisioning_service, project_id, archived_by=admin_user.id)
+        except archival.ArchiveError as e:
+            db.session.rollback()
+            response = jsonify({'error': str(e)})
+            response.status_code = 409
+            return response
+        
+        audit.record_event('project.archived', project_id=project_id, target_type='project',
+                           target_id=project_id, actor=admin_user, counts=summary['counts'])
+        print(f"Archived project {project_id}: {summary}")
+        return jsonify({'message': 'Project archived successfully', **summary})
+        
+    except Exception as e:
+        print(f"Error archiving project: {e}")
+        db.session.rollback()
+        response = jsonify({'error': 'Internal server error'})
+        response.status_code = 500
+        return response
+
+@api_bp.route('/projects/<int:project_id>/restore', methods=['POST'])
+@jwt_required()
+def restore_project(project_id):
+    """Bring an archived project back"""
+    try:
+        admin_user = auth.current_user()
+        if not admin_user or admin_user.role != 'admin':
+            response = jsonify({'error': 'Unauthorized'})
+            response.status_code = 403
+            return response
+        
+        try:
+            summary = archival.restore_project(provisioning_service, project_id)
+        except archival.ArchiveError as e:
+            db.session.rollback()
+            response = jsonify({'error': str(e)})
+            response.status_code = 409
+            return response
+        
+        audit.record_event('project.restored', project_id=project_id, target_type='project',
+                           target_id=project_id, actor=admin_user, restored=summary['restored'])
+        print(f"Restored project {project_id}: {summary['restored']}")
+        return jsonify({'message': 'Project restored successfully', **summary})
+        
+    except Exception as e:
+        print(f"Error restoring project: {e}")
+        db.session.rollback()
+        response = jsonify({'error': 'Internal server error'})
+        response.status_code = 500
+        return response
+
+@api_bp.route('/archive', methods=['GET'])
+@jwt_required()
+def list_archived_projects():
+    """List archived projects with their sizes, most recently archived first"""
+    admin_user = auth.current_user()
+    if not admin_user or admin_user.role not in ['admin', 'proj_admin']:
+        response = jsonify({'error': 'Unauthorized'})
+        response.status_code = 403
+        return response
+    
+    limit = min(request.args.get('limit', 500, type=int), 5000)
+    return jsonify({'projects': [serialize_project_archive(row) for row in archival.archived_projects(limit)]})
+
 @api_bp.route('/projects/<int:project_id>/clients/<int:client_id>', methods=['PUT'])
 @jwt_required()
 def update_client(project_id, client_id):
@@ -643,7 +1019,10 @@ def update_client(project_id, client_id):
     client.num_gpus = data.get('num_gpus', 1)
     client.gpu_memory = data.get('gpu_memory', 16)
     
+    project_cache.bump_version(project_id)
     db.session.commit()
+    audit.record_event('client.updated', project_id=project_id, target_type='client',
+                       target_id=client_id, name=client.name)
     return jsonify({'message': 'Client updated successfully'})
 
 @api_bp.route('/projects/<int:project_id>/clients/<int:client_id>', methods=['DELETE'])
@@ -658,7 +1037,10 @@ def delete_client(project_id, client_id):
         return response
     
     db.session.delete(client)
+    project_cache.bump_version(project_id)
     db.session.commit()
+    audit.record_event('client.deleted', project_id=project_id, target_type='client',
+                       target_id=client_id, name=client.name)
     return jsonify({'message': 'Client deleted successfully'})
 
 @api_bp.route('/projects/<int:project_id>/admins', methods=['POST'])
@@ -687,6 +1069,9 @@ def add_admin(project_id):
             response = jsonify({'error': 'Project not found'})
             response.status_code = 404
             return response
+        archived = _archived_response(project_id)
+        if archived is not None:
+            return archived
         
         admin = Admin(
             project_id=project_id,
@@ -697,8 +1082,11 @@ def add_admin(project_id):
         )
         
         db.session.add(admin)
+        project_cache.bump_version(project_id)
         db.session.commit()
         
+        audit.record_event('admin.added', project_id=project_id, target_type='admin',
+                           target_id=admin.id, email=admin.email)
         print(f"Admin added successfully: {admin.email}")
         return jsonify({'message': 'Admin added successfully', 'admin_id': admin.id})
         
@@ -725,7 +1113,10 @@ def update_admin(project_id, admin_id):
     admin.org = data['org']
     admin.role = data.get('role', 'project_admin')
     
+    project_cache.bump_version(project_id)
     db.session.commit()
+    audit.record_event('admin.updated', project_id=project_id, target_type='admin',
+                       target_id=admin_id, email=admin.email)
     return jsonify({'message': 'Admin updated successfully'})
 
 @api_bp.route('/projects/<int:project_id>/admins/<int:admin_id>', methods=['DELETE'])
@@ -740,7 +1131,10 @@ def delete_admin(project_id, admin_id):
         return response
     
     db.session.delete(admin)
+    project_cache.bump_version(project_id)
     db.session.commit()
+    audit.record_event('admin.deleted', project_id=project_id, target_type='admin',
+                       target_id=admin_id, email=admin.email)
     return jsonify({'message': 'Admin deleted successfully'})
 
 # User Application endpoints
@@ -749,14 +1143,17 @@ def delete_admin(project_id, admin_id):
 def apply_to_project(project_id):
     """User applies to join a project"""
     try:
-        current_user_email = get_jwt_identity()
-        user = User.query.filter_by(email=current_user_email).first()
+        user = auth.current_user()
         
         if not user:
             response = jsonify({'error': 'User not found'})
             response.status_code = 404
             return response
         
+        archived = _archived_response(project_id)
+        if archived is not None:
+            return archived
+        
         data = request.get_json()
         
         # Check if already applied
@@ -778,9 +1175,17 @@ def apply_to_project(project_id):
         )
         
         db.session.add(application)
+        db.session.flush()
+        auto_approved = _auto_approve('applications', ids=[application.id])
+        project_cache.bump_version(project_id)
         db.session.commit()
         
-        return jsonify({'message': 'Application submitted successfully'})
+        audit.record_event('application.submitted', project_id=project_id, target_type='application',
+                           target_id=application.id, actor=user, role_requested=application.role_requested)
+        auto_approval.after_commit(auto_approved, api_bp)
+        if auto_approved:
+            return jsonify({'message': 'Application approved automatically', 'auto_approved': True})
+        return jsonify({'message': 'Application submitted successfully', 'auto_approved': False})
         
     except Exception as e:
         print(f"Error applying to project: {e}")
@@ -794,31 +1199,14 @@ def apply_to_project(project_id):
 def get_project_applications(project_id):
     """Get applications for a project (admin only)"""
     try:
-        current_user_email = get_jwt_identity()
-        user = User.query.filter_by(email=current_user_email).first()
+        user = auth.current_user()
         
         if not user or user.role not in ['admin', 'proj_admin']:
             response = jsonify({'error': 'Unauthorized'})
             response.status_code = 403
             return response
         
-        applications = UserApplication.query.filter_by(project_id=project_id).all()
-        
-        result = []
-        for app in applications:
-            app_user = User.query.get(app.user_id)
-            result.append({
-                'id': app.id,
-                'user_name': app_user.name,
-                'user_email': app_user.email,
-                'organization': app_user.organization,
-                'role_requested': app.role_requested,
-                'message': app.message,
-                'status': app.status,
-                'created_at': app.created_at.isoformat()
-            })
-        
-        return jsonify({'applications': result})
+        return jsonify({'applications': _project_applications(project_id)})
         
     except Exception as e:
         print(f"Error getting applications: {e}")
@@ -826,13 +1214,22 @@ def get_project_applications(project_id):
         response.status_code = 500
         return response
 
+def _project_applications(project_id):
+    """Serialized applications for a project, applicants loaded in the same query"""
+    rows = db.session.execute(
+        select(UserApplication, User)
+        .join(User, User.id == UserApplication.user_id)
+        .where(UserApplication.project_id == project_id)
+        .order_by(UserApplication.id)
+    ).all()
+    return [serialize_application(application, user) for application, user in rows]
+
 @api_bp.route('/applications/<int:application_id>/approve', methods=['POST'])
 @jwt_required()
 def approve_application(application_id):
     """Approve or reject a user application"""
     try:
-        current_user_email = get_jwt_identity()
-        admin_user = User.query.filter_by(email=current_user_email).first()
+        admin_user = auth.current_user()
         
         if not admin_user or admin_user.role not in ['admin', 'proj_admin']:
             response = jsonify({'error': 'Unauthorized'})
@@ -864,7 +1261,16 @@ def approve_application(application_id):
         application.reviewed_at = datetime.utcnow()
         application.reviewed_by = admin_user.id
         
+        project_cache.bump_version(application.project_id)
         db.session.commit()
+
+        # The applicant's cached approval state is now stale
+        if action == 'approve':
+            auth.invalidate_user(user_id=application.user_id)
+        
+        audit.record_event(f"application.{application.status}", project_id=application.project_id,
+                           target_type='application', target_id=application.id, actor=admin_user,
+                           user_id=application.user_id)
         
         return jsonify({'message': f'Application {action}ed successfully'})
         
@@ -875,39 +1281,542 @@ def approve_application(application_id):
         response.status_code = 500
         return response
 
+@api_bp.route('/approvals/batch', methods=['POST'])
+@jwt_required()
+def batch_review():
+    """Approve or reject many applications, clients or admins in one request"""
+    try:
+        admin_user = auth.current_user()
+
+        if not admin_user or admin_user.role not in ['admin', 'proj_admin']:
+            response = jsonify({'error': 'Unauthorized'})
+            response.status_code = 403
+            return response
+
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            response = jsonify({'error': 'Request body must be a JSON object'})
+            response.status_code = 400
+            return response
+
+        try:
+            summary = approvals.batch_review(
+                data.get('kind', 'applications'),
+                data.get('action'),
+                admin_user.id,
+                ids=data.get('ids'),
+                filters=data.get('filter')
+            )
+        except approvals.BatchReviewError as e:
+            response = jsonify({'error': str(e)})
+            response.status_code = 400
+            return response
+
+        # Applications are part of the expanded project detail too
+        project_cache.bump_version(*summary['project_ids'])
+        db.session.commit()
+
+        if summary['users_approved']:
+            auth.invalidate_all_users()
+
+        for project_id in summary['project_ids']:
+            audit.record_event('approvals.batch', project_id=project_id, actor=admin_user,
+                               kind=summary['kind'], action=summary['action'],
+                               ids=data.get('ids'), filter=data.get('filter'))
+
+        # Participant approval changes what goes into the kits
+        if summary['kind'] != 'applications' and summary['updated']:
+            signals.request_reprovision(api_bp, summary['project_ids'], f"{summary['kind']}_{summary['action']}")
+
+        print(f"Batch {summary['action']} of {summary['updated']} {summary['kind']} by {admin_user.email}")
+        past_tense = 'approved' if summary['action'] == 'approve' else 'rejected'
+        return jsonify({'message': f"{summary['updated']} {summary['kind']} {past_tense}", **summary})
+
+    except Exception as e:
+        print(f"Error processing batch review: {e}")
+        db.session.rollback()
+        response = jsonify({'error': 'Internal server error'})
+        response.status_code = 500
+        return response
+
+@api_bp.route('/approval-rules', methods=['GET'])
+@jwt_required()
+def list_approval_rules():
+    """List auto-approval rules with how many pending rows they would approve now"""
+    admin_user = auth.current_user()
+    if not admin_user or admin_user.role not in ['admin', 'proj_admin']:
+        response = jsonify({'error': 'Unauthorized'})
+        response.status_code = 403
+        return response
+    
+    rules = ApprovalRule.query.order_by(ApprovalRule.id).all()
+    return jsonify({'rules': [serialize_approval_rule(rule) for rule in rules],
+                    'pending_matches': auto_approval.preview()})
+
+@api_bp.route('/approval-rules', methods=['POST'])
+@jwt_required()
+def create_approval_rule():
+    """Add an auto-approval rule"""
+    try:
+        admin_user = auth.current_user()
+        if not admin_user or admin_user.role != 'admin':
+            response = jsonify({'error': 'Unauthorized'})
+            response.status_code = 403
+            return response
+        
+        try:
+            values = auto_approval.parse_rule(request.get_json() or {})
+        except auto_approval.RuleError as e:
+            response = jsonify({'error': str(e)})
+            response.status_code = 400
+            return response
+        
+        rule = ApprovalRule(created_by=admin_user.id, **values)
+        db.session.add(rule)
+        db.session.commit()
+        
+        audit.record_event('approval_rule.created', project_id=rule.project_id, target_type='approval_rule',
+                           target_id=rule.id, actor=admin_user, name=rule.name, kind=rule.kind)
+        return jsonify({'message': 'Approval rule created successfully', 'rule': serialize_approval_rule(rule)})
+        
+    except Exception as e:
+        print(f"Error creating approval rule: {e}")
+        db.session.rollback()
+        response = jsonify({'error': 'Internal server error'})
+        response.status_code = 500
+        return response
+
+@api_bp.route('/approval-rules/<int:rule_id>', methods=['PUT'])
+@jwt_required()
+def update_approval_rule(rule_id):
+    """Replace an auto-approval rule's fields, e.g. to disable it"""
+    try:
+        admin_user = auth.current_user()
+        if not admin_user or admin_user.role != 'admin':
+            response = jsonify({'error': 'Unauthorized'})
+            response.status_code = 403
+            return response
+        
+        rule = db.session.get(ApprovalRule, rule_id)
+        if not rule:
+            response = jsonify({'error': 'Approval rule not found'})
+            response.status_code = 404
+            return response
+        
+        data = {**serialize_approval_rule(rule), **(request.get_json() or {})}
+        try:
+            values = auto_approval.parse_rule(data)
+        except auto_approval.RuleError as e:
+            response = jsonify({'error': str(e)})
+            response.status_code = 400
+            return response
+        
+        for key, value in values.items():
+            setattr(rule, key, value)
+        db.session.commit()
+        
+        audit.record_event('approval_rule.updated', project_id=rule.project_id, target_type='approval_rule',
+                           target_id=rule.id, actor=admin_user, name=rule.name, enabled=rule.enabled)
+        return jsonify({'message': 'Approval rule updated successfully', 'rule': serialize_approval_rule(rule)})
+        
+    except Exception as e:
+        print(f"Error updating approval rule: {e}")
+        db.session.rollback()
+        response = jsonify({'error': 'Internal server error'})
+        response.status_code = 500
+        return response
+
+@api_bp.route('/approval-rules/<int:rule_id>', methods=['DELETE'])
+@jwt_required()
+def delete_approval_rule(rule_id):
+    """Delete an auto-approval rule"""
+    try:
+        admin_user = auth.current_user()
+        if not admin_user or admin_user.role != 'admin':
+            response = jsonify({'error': 'Unauthorized'})
+            response.status_code = 403
+            return response
+        
+        rule = db.session.get(ApprovalRule, rule_id)
+        if not rule:
+            response = jsonify({'error': 'Approval rule not found'})
+            response.status_code = 404
+            return response
+        
+        db.session.delete(rule)
+        db.session.commit()
+        
+        audit.record_event('approval_rule.deleted', project_id=rule.project_id, target_type='approval_rule',
+                           target_id=rule_id, actor=admin_user, name=rule.name)
+        return jsonify({'message': 'Approval rule deleted successfully'})
+        
+    except Exception as e:
+        print(f"Error deleting approval rule: {e}")
+        db.session.rollback()
+        response = jsonify({'error': 'Internal server error'})
+        response.status_code = 500
+        return response
+
+@api_bp.route('/approval-rules/run', methods=['POST'])
+@jwt_required()
+def run_approval_rules():
+    """Apply the auto-approval rules to the whole pending backlog now"""
+    try:
+        admin_user = auth.current_user()
+        if not admin_user or admin_user.role not in ['admin', 'proj_admin']:
+            response = jsonify({'error': 'Unauthorized'})
+            response.status_code = 403
+            return response
+        
+        summaries = auto_approval.run(api_bp)
+        approved = {kind: auto_approval.approved_count(summaries, kind) for kind in auto_approval.RULE_KINDS}
+        print(f"Auto-approval run by {admin_user.email}: {approved}")
+        return jsonify({'message': f"{sum(approved.values())} pending rows approved", 'approved': approved,
+                        'project_ids': sorted({pid for summary in summaries for pid in summary['project_ids']})})
+        
+    except Exception as e:
+        print(f"Error running approval rules: {e}")
+        db.session.rollback()
+        response = jsonify({'error': 'Internal server error'})
+        response.status_code = 500
+        return response
+
 @api_bp.route('/provision/<int:project_id>', methods=['POST'])
 @jwt_required()
 def provision_project(project_id):
-    """Provision a project using NVFlare CLI"""
+    """Provision a project using NVFlare CLI, or queue it for the provisioning workers"""
+    if current_app.config.get('PROVISION_MODE') == 'queue' or request.args.get('async') == '1':
+        return _enqueue_provisioning(project_id)
     try:
         workspace = provisioning_service.call_nvflare_provision(project_id)
+        audit.record_event('provision.succeeded', project_id=project_id, workspace=workspace)
         return jsonify({
             'message': 'Project provisioned successfully',
             'workspace': workspace
         })
+    except ProjectFrozenError as e:
+        response = jsonify({'error': str(e)})
+        response.status_code = 409
+        return response
+    except validation.ProjectValidationError as e:
+        audit.record_event('provision.rejected', project_id=project_id, error_count=e.report['error_count'])
+        response = jsonify({'error': 'Project configuration is invalid', 'validation': e.report})
+        response.status_code = 422
+        return response
     except Exception as e:
+        audit.record_event('provision.failed', project_id=project_id, error=str(e))
         response = jsonify({'error': str(e)})
         response.status_code = 500
         return response
 
+def _enqueue_provisioning(project_id):
+    """Queue a provisioning job and answer 202 with it"""
+    try:
+        project = Project.query.get(project_id)
+        if not project:
+            response = jsonify({'error': 'Project not found'})
+            response.status_code = 404
+            return response
+        try:
+            provisioning_service.ensure_not_frozen(project_id)
+        except ProjectFrozenError as e:  # Frozen or archived
+            response = jsonify({'error': str(e)})
+            response.status_code = 409
+            return response
+        # A job that can only fail is not worth queueing
+        report = validation.validate_project(project)
+        if not report['valid']:
+            response = jsonify({'error': 'Project configuration is invalid', 'validation': report})
+            response.status_code = 422
+            return response
+        
+        user = auth.current_user()
+        job = jobs.enqueue(project_id, requested_by=user.id if user else None, reason='api')
+        db.session.commit()
+        
+        progress.publish(project_id, 'queued', job_id=job.id)
+        audit.record_event('provision.queued', project_id=project_id, actor=user, job_id=job.id)
+        response = jsonify({'message': 'Provisioning queued', 'job': serialize_provisioning_job(job)})
+        response.status_code = 202
+        return response
+    except Exception as e:
+        print(f"Error queueing provisioning: {e}")
+        db.session.rollback()
+        response = jsonify({'error': 'Internal server error'})
+        response.status_code = 500
+        return response
+
+@api_bp.route('/provision/<int:project_id>/validate', methods=['GET', 'POST'])
+@jwt_required()
+def validate_project(project_id):
+    """Dry run: report what provisioning would reject, without running NVFlare"""
+    try:
+        project = Project.query.get(project_id)
+        if not project:
+            response = jsonify({'error': 'Project not found'})
+            response.status_code = 404
+            return response
+        archived = _archived_response(project_id)
+        if archived is not None:
+            return archived
+        return jsonify(validation.validate_project(project))
+    except Exception as e:
+        print(f"Error validating project: {e}")
+        response = jsonify({'error': 'Internal server error'})
+        response.status_code = 500
+        return response
+
+@api_bp.route('/provision/<int:project_id>/jobs', methods=['GET'])
+@jwt_required()
+def get_provisioning_jobs(project_id):
+    """Recent provisioning jobs of a project, newest first"""
+    try:
+        limit = min(request.args.get('limit', 20, type=int), 200)
+        return jsonify({'jobs': jobs.project_jobs(project_id, limit=limit)})
+    except Exception as e:
+        print(f"Error getting provisioning jobs: {e}")
+        response = jsonify({'error': 'Internal server error'})
+        response.status_code = 500
+        return response
+
+@api_bp.route('/provision/jobs/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_provisioning_job(job_id):
+    """One provisioning job with its status, worker and result"""
+    try:
+        job = db.session.get(ProvisioningJob, job_id)
+        if not job:
+            response = jsonify({'error': 'Job not found'})
+            response.status_code = 404
+            return response
+        return jsonify({'job': serialize_provisioning_job(job)})
+    except Exception as e:
+        print(f"Error getting provisioning job: {e}")
+        response = jsonify({'error': 'Internal server error'})
+        response.status_code = 500
+        return response
+
+@api_bp.route('/certificates', methods=['GET'])
+@jwt_required()
+def get_certificate_expiry():
+    """Earliest certificate expiry of each provisioned project, soonest first (admin only)"""
+    try:
+        user = auth.current_user()
+        
+        if not user or user.role not in ['admin', 'proj_admin']:
+            response = jsonify({'error': 'Unauthorized'})
+            response.status_code = 403
+            return response
+        
+        days = request.args.get('days', type=int)
+        rows = rotation.expiring_certificates(days=days)
+        return jsonify({
+            'threshold_days': current_app.config.get('CERT_ROTATION_THRESHOLD_DAYS', 30),
+            'active_rotations': rotation.active_rotations(),
+            'certificates': [serialize_certificate_index(index, name, frozen) for index, name, frozen in rows]
+        })
+    except Exception as e:
+        print(f"Error getting certificate expiry: {e}")
+        response = jsonify({'error': 'Internal server error'})
+        response.status_code = 500
+        return response
+
+@api_bp.route('/provision/<int:project_id>/events')
+@jwt_required(locations=['headers', 'query_string'])  # EventSource cannot set headers
+def stream_provisioning_events(project_id):
+    """Server-Sent Events stream of provisioning progress for one project"""
+    # EventSource reconnects send the last id they saw
+    last_event_id = request.headers.get('Last-Event-ID', type=int) or request.args.get('last_event_id', 0, type=int)
+    keepalive = current_app.config.get('SSE_KEEPALIVE_INTERVAL', 15)
+    max_duration = current_app.config.get('SSE_MAX_DURATION', 300)
+    
+    def generate():
+        # Tell the browser how long to wait before reconnecting
+        yield 'retry: 3000\n\n'
+        started = time.monotonic()
+        for event in progress.broker.subscribe(project_id, last_event_id, timeout=keepalive):
+            yield progress.format_sse(event)
+            # Bound how long one connection holds a worker thread; the client reconnects
+            if time.monotonic() - started > max_duration:
+                break
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Disable proxy buffering (nginx)
+    return response
+
 @api_bp.route('/download/<target_type>/<int:project_id>')
 @jwt_required()
 def download_startup_kit(target_type, project_id):
     """Download startup kit for server, client, or admin"""
     try:
-        zip_buffer, filename = provisioning_service.generate_startup_kit(project_id, target_type)
+        archived = _archived_response(project_id)
+        if archived is not None:
+            return archived
+        
+        # Only counted against a participant of this project and kit type
+        participant_id = request.args.get('participant_id', type=int)
+        if participant_id is not None and not downloads.participant_in_project(project_id, target_type, participant_id):
+            response = jsonify({'error': f'No {target_type} {participant_id} in project {project_id}'})
+            response.status_code = 400
+            return response
+        
+        frozen = db.session.execute(select(Project.frozen).where(Project.id == project_id)).scalar()
+        if frozen:
+            # Sealed archive: only the authorization check happens here
+            path, kit = provisioning_service.sealed_startup_kit(project_id, target_type)
+            response = _sealed_kit_response(path, kit, provisioning_service.kit_filename(target_type))
+        else:
+            zip_buffer, filename = provisioning_service.generate_startup_kit(project_id, target_type)
+            response = send_file(
+                io.BytesIO(zip_buffer.getvalue()),
+                mimetype='application/zip',
+                as_attachment=True,
+                download_name=filename
+            )
         
-        return send_file(
-            io.BytesIO(zip_buffer.getvalue()),
-            mimetype='application/zip',
-            as_attachment=True,
-            download_name=filename
+        # Buffered in memory; counters and the event log are written in batches
+        user = auth.current_user()
+        downloads.download_tracker.record(
+            user.id if user else None,
+            user.email if user else None,
+            project_id,
+            target_type,
+            participant_id=participant_id
         )
+        audit.record_event('kit.downloaded', project_id=project_id, target_type=target_type, actor=user)
+        
+        return response
+    except ProjectArchivedError as e:  # Archived while this request was building the kit
+        response = jsonify({'error': str(e), 'project_id': project_id})
+        response.status_code = 410
+        return response
+    except ProjectFrozenError as e:
+        response = jsonify({'error': str(e)})
+        response.status_code = 409
+        return response
     except Exception as e:
         response = jsonify({'error': str(e)})
         response.status_code = 500
         return response
 
+def _sealed_kit_response(path, kit, filename):
+    """Serve a sealed kit through X-Accel-Redirect/X-Sendfile per KIT_OFFLOAD, or from disk"""
+    offload = provisioning_service.kit_offload_header(
+        path, current_app.config.get('KIT_OFFLOAD'), current_app.config.get('KIT_ACCEL_PREFIX', '/sealed-kits/')
+    )
+    if offload is None:
+        # Relative paths would be resolved against the app package, not the working directory
+        response = send_file(os.path.abspath(path), mimetype='application/zip', as_attachment=True,
+                             download_name=filename, etag=kit['sha256'], conditional=True)
+    else:
+        # Empty body; the web server in front streams the file with its own sendfile()
+        response = Response(mimetype='application/zip')
+        response.headers[offload[0]] = offload[1]
+        response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+        response.set_etag(kit['sha256'])
+    # Sealed kits never change, but every download must pass the authorization check again
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@api_bp.route('/projects/<int:project_id>/downloads', methods=['GET'])
+@jwt_required()
+def get_download_stats(project_id):
+    """Get per-participant download counts and recent download events"""
+    try:
+        project = Project.query.get(project_id)
+        if not project:
+            response = jsonify({'error': 'Project not found'})
+            response.status_code = 404
+            return response
+
+        recent = min(request.args.get('recent', 50, type=int), 500)
+        return jsonify(downloads.project_download_stats(project_id, recent=recent))
+    except Exception as e:
+        print(f"Error getting download stats: {e}")
+        response = jsonify({'error': 'Internal server error'})
+        response.status_code = 500
+        return response
+
+@api_bp.route('/events', methods=['GET'])
+@jwt_required()
+def get_events():
+    """Query the audit log (admin only), filtered by type, project, actor and time range"""
+    try:
+        user = auth.current_user()
+
+        if not user or user.role not in ['admin', 'proj_admin']:
+            response = jsonify({'error': 'Unauthorized'})
+            response.status_code = 403
+            return response
+
+        event_types = [t for t in request.args.get('type', '').split(',') if t]
+        try:
+            result = audit.query_events(
+                event_types=event_types,
+                project_id=request.args.get('project_id', type=int),
+                actor_id=request.args.get('actor_id', type=int),
+                since=request.args.get('since'),
+                until=request.args.get('until'),
+                page=request.args.get('page', 1, type=int),
+                per_page=request.args.get('per_page', 50, type=int)
+            )
+        except ValueError as e:
+            response = jsonify({'error': str(e)})
+            response.status_code = 400
+            return response
+
+        return jsonify(result)
+    except Exception as e:
+        print(f"Error querying events: {e}")
+        response = jsonify({'error': 'Internal server error'})
+        response.status_code = 500
+        return response
+
+@api_bp.route('/profiles', methods=['GET'])
+@jwt_required()
+def list_profiles():
+    """List stored request profiles, newest first (admin only)"""
+    try:
+        user = auth.current_user()
+
+        if not user or user.role not in ['admin', 'proj_admin']:
+            response = jsonify({'error': 'Unauthorized'})
+            response.status_code = 403
+            return response
+
+        return jsonify({'profiles': profiling.profile_store.list()})
+    except Exception as e:
+        print(f"Error listing profiles: {e}")
+        response = jsonify({'error': 'Internal server error'})
+        response.status_code = 500
+        return response
+
+@api_bp.route('/profiles/<profile_id>', methods=['GET'])
+@jwt_required()
+def get_profile(profile_id):
+    """Fetch one request profile with its SQL timings and profiler output (admin only)"""
+    try:
+        user = auth.current_user()
+
+        if not user or user.role not in ['admin', 'proj_admin']:
+            response = jsonify({'error': 'Unauthorized'})
+            response.status_code = 403
+            return response
+
+        profile = profiling.profile_store.get(profile_id)
+        if profile is None:
+            response = jsonify({'error': 'Profile not found'})
+            response.status_code = 404
+            return response
+
+        return jsonify(profile)
+    except Exception as e:
+        print(f"Error getting profile: {e}")
+        response = jsonify({'error': 'Internal server error'})
+        response.status_code = 500
+        return response
+
 @api_bp.route('/status/<int:project_id>')
 @jwt_required()
 def get_project_status(project_id):
@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+"""
+NVFlare Provisioning Dashboard - ASGI Entry Point
+Serves the same API as wsgi.py on an event loop, e.g. `uvicorn asgi:app`
+"""
+
+import os
+import sys
+from application import create_app
+from application.asgi import create_asgi_app
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+app = create_asgi_app(create_app())
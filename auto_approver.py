@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Sorachain Auto-Approver
+Evaluates the auto-approval rules (see /api/v1/approval-rules) over every
+pending application, client and admin at a fixed interval, approving all
+matches with one UPDATE per kind:
+
+    python auto_approver.py --interval 60
+
+New rows are already checked when they are created; this catches rows that
+were pending before a rule was added or that arrived through other paths.
+"""
+
+import argparse
+import os
+import signal
+import sys
+import threading
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+stopping = threading.Event()
+
+
+def run_once(app):
+    """Apply the rules to the pending backlog; returns the per-kind summaries"""
+    from application import db, audit, auto_approval
+
+    with app.app_context():
+        try:
+            summaries = auto_approval.run('auto_approver')
+        except Exception as e:
+            print(f"Auto-approval failed: {e}")
+            db.session.rollback()
+            return None
+        finally:
+            audit.audit_recorder.flush()
+
+    for summary in summaries:
+        print(f"Auto-approved {summary['updated']} {summary['kind']} in projects {summary['project_ids']}")
+    return summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Approve pending rows matching the auto-approval rules')
+    parser.add_argument('--interval', type=float,
+                        help='Seconds between runs (default: AUTO_APPROVAL_INTERVAL, 60)')
+    parser.add_argument('--once', action='store_true', help='Run once, then exit')
+    args = parser.parse_args()
+
+    from application import create_app, init_database
+
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    signal.signal(signal.SIGINT, lambda *_: stopping.set())
+
+    app = create_app()
+    init_database(app)
+    interval = args.interval if args.interval is not None else app.config['AUTO_APPROVAL_INTERVAL']
+
+    while not stopping.is_set():
+        run_once(app)
+        if args.once:
+            break
+        stopping.wait(interval)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+API Scaling Benchmark
+Seeds a throwaway SQLite database at a chosen scale, drives the main API
+endpoints through the Flask test client and runs the provisioning pipeline
+against benchmarks/fake_nvflare.py. Prints one JSON document with latency
+percentiles, throughput, SQL queries per request and peak RSS, so runs on
+different commits can be compared.
+
+    python benchmarks/api_scaling.py --projects 1000 --users 10000 --participants 100000
+    python benchmarks/api_scaling.py --output after.json --baseline before.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKE_NVFLARE = os.path.join(ROOT, 'benchmarks', 'fake_nvflare.py')
+sys.path.insert(0, ROOT)
+
+BENCH_PASSWORD = 'bench-password'
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (ru_maxrss is in KB on Linux)"""
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1)
+
+
+def summarize(latencies, elapsed, queries):
+    """Latency percentiles (ms), throughput and queries per request"""
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        'requests': count,
+        'p50_ms': round(latencies[count // 2] * 1000, 3),
+        'p99_ms': round(latencies[min(count - 1, int(count * 0.99))] * 1000, 3),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 3),
+        'max_ms': round(latencies[-1] * 1000, 3),
+        'throughput_rps': round(count / elapsed, 1) if elapsed else None,
+        'queries_per_request': round(queries / count, 2)
+    }
+
+
+class QueryCounter:
+    """Counts statements sent to the database engine"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+
+def seed(app, projects, users, participants, applications, rng):
+    """Bulk-insert the benchmark dataset; returns the seeded ids"""
+    from sqlalchemy import insert, select
+    from werkzeug.security import generate_password_hash
+    from application import db
+    from application.models import User, Project, Server, Client, Admin, UserApplication, init_default_data
+
+    with app.app_context():
+        db.create_all(bind_key=None)  # The archive database is not part of the benchmark
+        init_default_data()
+        now = datetime.utcnow()
+        # Hash once; per-row hashing would dominate seeding time
+        password_hash = generate_password_hash(BENCH_PASSWORD)
+
+        user_ids = list(db.session.execute(
+            insert(User).returning(User.id, sort_by_parameter_order=True),
+            [{'email': f'user{i}@bench.example', 'name': f'Bench User {i}', 'password_hash': password_hash,
+              'role': 'proj_admin' if i % 100 == 0 else 'user', 'organization': f'org{i % 50}',
+              'approval_state': 1, 'is_active': True, 'created_at': now} for i in range(users)]
+        ).scalars())
+
+        project_ids = list(db.session.execute(
+            insert(Project).returning(Project.id, sort_by_parameter_order=True),
+            [{'name': f'Bench Project {i}', 'description': f'Benchmark project {i}', 'scheme': 'grpc',
+              'server_name': f'server{i}.bench.example', 'created_by': rng.choice(user_ids) if user_ids else 1,
+              'api_version': 3, 'public': i % 2 == 0, 'created_at': now, 'updated_at': now}
+             for i in range(projects)]
+        ).scalars())
+
+        db.session.execute(insert(Server), [
+            {'project_id': pid, 'name': f'server{i}.bench.example', 'org': 'bench', 'fed_learn_port': 8002,
+             'admin_port': 8003, 'connection_security': 'mtls', 'approval_state': 1, 'created_at': now}
+            for i, pid in enumerate(project_ids)
+        ])
+
+        # Four clients for every admin, spread round-robin over the projects
+        admins = participants // 5
+        clients = participants - admins
+        if project_ids:
+            db.session.execute(insert(Client), [
+                {'project_id': project_ids[i % len(project_ids)], 'name': f'site-{i}', 'org': f'org{i % 50}',
+                 'num_gpus': 1 + i % 8, 'gpu_memory': 16, 'approval_state': i % 3, 'created_at': now}
+                for i in range(clients)
+            ])
+            db.session.execute(insert(Admin), [
+                {'project_id': project_ids[i % len(project_ids)], 'email': f'admin{i}@bench.example',
+                 'org': f'org{i % 50}', 'role': 'project_admin', 'approval_state': 1, 'created_at': now}
+                for i in range(admins)
+            ])
+
+        pairs = set()
+        while user_ids and project_ids and len(pairs) < min(applications, len(user_ids) * len(project_ids)):
+            pairs.add((rng.choice(user_ids), rng.choice(project_ids)))
+        if pairs:
+            db.session.execute(insert(UserApplication), [
+                {'user_id': user_id, 'project_id': project_id, 'role_requested': 'user',
+                 'message': 'benchmark', 'status': 'pending', 'created_at': now}
+                for user_id, project_id in sorted(pairs)
+            ])
+        db.session.commit()
+
+        admin_id = db.session.execute(select(User.id).where(User.email == 'admin@example.com')).scalar()
+        return {'user_ids': user_ids, 'project_ids': project_ids, 'admin_id': admin_id}
+
+
+def run_endpoint(client, counter, name, make_request, count):
+    """Issue `count` requests and summarize them; non-2xx responses are counted as errors"""
+    latencies, errors = [], 0
+    queries_before = counter.count
+    started = time.perf_counter()
+    for i in range(count):
+        start = time.perf_counter()
+        response = make_request(i)
+        latencies.append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            errors += 1
+    elapsed = time.perf_counter() - started
+    result = summarize(latencies, elapsed, counter.count - queries_before)
+    result['errors'] = errors
+    result['peak_rss_mb'] = peak_rss_mb()
+    print(f"  {name}: p50 {result['p50_ms']}ms p99 {result['p99_ms']}ms "
+          f"{result['throughput_rps']} req/s {result['queries_per_request']} queries/req", file=sys.stderr)
+    return result
+
+
+def bench_api(app, ids, args, rng):
+    """Drive each endpoint through the test client"""
+    from application import db
+
+    client = app.test_client()
+    with app.app_context():
+        counter = QueryCounter(db.engine)
+
+    login = client.post('/api/v1/login', json={'email': 'admin@example.com', 'password': 'admin123'})
+    headers = {'Authorization': f"Bearer {login.get_json()['access_token']}"}
+    project_ids = ids['project_ids'] or [1]
+    picks = [rng.choice(project_ids) for _ in range(max(args.requests, args.downloads))]
+    user_emails = [f'user{rng.randrange(max(args.users, 1))}@bench.example' for _ in range(args.login_requests)]
+
+    endpoints = [
+        ('GET /projects', lambda i: client.get('/api/v1/projects', headers=headers), args.list_requests),
+        ('GET /projects/<id>', lambda i: client.get(f'/api/v1/projects/{picks[i]}', headers=headers),
+         args.requests),
+        ('GET /projects/<id>?include=all', lambda i: client.get(
+            f'/api/v1/projects/{picks[i]}?include=participants,applications,status,creator', headers=headers),
+         args.requests),
+        ('GET /projects/<id>/applications', lambda i: client.get(
+            f'/api/v1/projects/{picks[i]}/applications', headers=headers), args.requests),
+        ('POST /login', lambda i: client.post('/api/v1/login', json={
+            'email': user_emails[i] if args.users else 'admin@example.com',
+            'password': BENCH_PASSWORD if args.users else 'admin123'}), args.login_requests),
+        ('GET /download/client/<id>', lambda i: client.get(
+            f'/api/v1/download/client/{picks[i]}', headers=headers), args.downloads),
+    ]
+
+    results = {}
+    for name, make_request, count in endpoints:
+        if count > 0:
+            results[name] = run_endpoint(client, counter, name, make_request, count)
+    return results
+
+
+def bench_provisioning(app, args):
+    """Provision projects of increasing participant counts with the fake CLI"""
+    from sqlalchemy import insert
+    from application import db
+    from application.models import Project, Server, Client, Admin
+    from application.provisioning import NVFlareProvisioningService
+
+    service = NVFlareProvisioningService(workspace_dir=os.path.join(args.workdir, 'provision_bench'),
+                                         nvflare_bin=FAKE_NVFLARE)
+    results = {}
+    for size in args.provision_sizes:
+        with app.app_context():
+            project_id = db.session.execute(insert(Project).returning(Project.id), {
+                'name': f'Provision Bench {size}', 'server_name': f'pb{size}.bench.example', 'created_by': 1
+            }).scalar()
+            db.session.execute(insert(Server), {'project_id': project_id, 'name': f'pb{size}.bench.example',
+                                                'org': 'bench'})
+            admins = max(size // 5, 1)
+            db.session.execute(insert(Client), [{'project_id': project_id, 'name': f'site-{i}', 'org': 'bench'}
+                                                for i in range(size - admins)])
+            db.session.execute(insert(Admin), [{'project_id': project_id, 'email': f'pb{i}@bench.example',
+                                                'org': 'bench'} for i in range(admins)])
+            db.session.commit()
+
+            start = time.perf_counter()
+            workspace = service.call_nvflare_provision(project_id)
+            provision_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            kit, _ = service.generate_startup_kit(project_id, 'server')
+            kit_seconds = time.perf_counter() - start
+
+        results[str(size)] = {
+            'participants': size,
+            'provision_s': round(provision_seconds, 3),
+            'per_participant_ms': round(provision_seconds / size * 1000, 2),
+            'startup_kit_s': round(kit_seconds, 3),
+            'startup_kit_bytes': len(kit.getvalue()),
+            'workspace_entries': len(os.listdir(workspace)),
+            'peak_rss_mb': peak_rss_mb()
+        }
+        print(f"  provision {size}: {results[str(size)]['provision_s']}s", file=sys.stderr)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(report, baseline):
+    """Print the p50/p99 ratio of each endpoint against a previous report"""
+    print("Compared with baseline (ratio > 1 is slower):", file=sys.stderr)
+    for name, result in report['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(name)
+        if before:
+            print(f"  {name}: p50 x{result['p50_ms'] / before['p50_ms']:.2f} "
+                  f"p99 x{result['p99_ms'] / before['p99_ms']:.2f} "
+                  f"queries {before['queries_per_request']} -> {result['queries_per_request']}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the API and provisioning pipeline at scale')
+    parser.add_argument('--projects', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--participants', type=int, default=10000, help='Clients plus admins across all projects')
+    parser.add_argument('--applications', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=200, help='Requests per project endpoint')
+    parser.add_argument('--list-requests', type=int, default=20, help='Requests to GET /projects')
+    parser.add_argument('--login-requests', type=int, default=20)
+    parser.add_argument('--downloads', type=int, default=10)
+    parser.add_argument('--provision-sizes', type=lambda v: [int(s) for s in v.split(',') if s], default=[10, 50])
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Write the JSON report here as well as to stdout')
+    parser.add_argument('--baseline', help='Previous JSON report to compare against')
+    parser.add_argument('--verbose', action='store_true', help="Keep the application's own logging")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # The run happens inside a temporary directory
+    args.output = os.path.abspath(args.output) if args.output else None
+    args.baseline = os.path.abspath(args.baseline) if args.baseline else None
+    with tempfile.TemporaryDirectory(prefix='sora_bench_') as workdir:
+        args.workdir = workdir
+        # Configure before the app (and the views' provisioning service) are created
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        os.environ['NVFLARE_BIN'] = FAKE_NVFLARE
+        os.chdir(workdir)  # Kit downloads provision into ./workspace
+
+        quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        with quiet:
+            from application import create_app
+            app = create_app()
+
+            print(f"Seeding {args.projects} projects, {args.users} users, {args.participants} participants...",
+                  file=sys.stderr)
+            start = time.perf_counter()
+            ids = seed(app, args.projects, args.users, args.participants, args.applications, rng)
+            seed_seconds = time.perf_counter() - start
+
+            print("Endpoints:", file=sys.stderr)
+            endpoints = bench_api(app, ids, args, rng)
+            print("Provisioning:", file=sys.stderr)
+            provisioning = bench_provisioning(app, args) if args.provision_sizes else {}
+
+            from application import downloads, audit
+            downloads.download_tracker.flush()
+            audit.audit_recorder.flush()
+
+        report = {
+            'revision': git_revision(),
+            'timestamp': datetime.utcnow().isoformat(),
+            'python': sys.version.split()[0],
+            'scale': {
+                'projects': args.projects,
+                'users': args.users,
+                'participants': args.participants,
+                'applications': args.applications
+            },
+            'seed_s': round(seed_seconds, 3),
+            'endpoints': endpoints,
+            'provisioning': provisioning,
+            'peak_rss_mb': peak_rss_mb()
+        }
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Cold Start Benchmark
+Starts run_dashboard.py against a throwaway database and workspace and
+measures the time from process start until /api/v1/livez and /api/v1/readyz
+first answer 200. The first start creates the schema; later starts reuse the
+stamped schema. Also times the in-process startup phases (imports, create_app,
+init_database). Prints one JSON document with the median of each measurement.
+
+    python benchmarks/cold_start.py --runs 5
+"""
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in a fresh interpreter so every phase starts cold
+PHASES_SCRIPT = r'''
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import application
+from application import create_app, init_database
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+init_database(app)
+initialized = time.perf_counter()
+app.test_client().get('/api/v1/livez')
+first_request = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'init_database_ms': (initialized - created) * 1000,
+    'first_request_ms': (first_request - initialized) * 1000,
+}))
+'''
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(port, path, deadline):
+    """Poll until path answers 200; returns the time it did, or None at the deadline"""
+    while time.perf_counter() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', path)
+            if conn.getresponse().status == 200:
+                return time.perf_counter()
+        except OSError:
+            pass
+        time.sleep(0.005)
+    return None
+
+
+def server_start(env, cwd, timeout):
+    """Milliseconds from spawning the dashboard until it is live and until it is ready"""
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'run_dashboard.py'), '--port', str(port), '--host', '127.0.0.1',
+         '--workspace', os.path.join(cwd, 'workspace')],
+        cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = started + timeout
+        live = wait_for(port, '/api/v1/livez', deadline)
+        ready = wait_for(port, '/api/v1/readyz', deadline) if live else None
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    return {
+        'live_ms': (live - started) * 1000 if live else None,
+        'ready_ms': (ready - started) * 1000 if ready else None,
+    }
+
+
+def in_process_phases(env, cwd):
+    output = subprocess.run([sys.executable, '-c', PHASES_SCRIPT, ROOT], cwd=cwd, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def median(samples, key):
+    values = [sample[key] for sample in samples if sample.get(key) is not None]
+    return round(statistics.median(values), 1) if values else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure dashboard startup time to first request')
+    parser.add_argument('--runs', type=int, default=5, help='Starts per scenario')
+    parser.add_argument('--timeout', type=float, default=60, help='Seconds to wait for one start')
+    parser.add_argument('--output', help='Write the JSON report here as well as to stdout')
+    args = parser.parse_args()
+
+    report = {'runs': args.runs, 'server': {}, 'phases': {}}
+    for scenario in ['first_start', 'restart']:
+        server, phases = [], []
+        for _ in range(args.runs):
+            with tempfile.TemporaryDirectory(prefix='cold_start_') as scratch:
+                def database_env(name):
+                    return dict(os.environ, PYTHONDONTWRITEBYTECODE='1',
+                                DATABASE_URL=f"sqlite:///{os.path.join(scratch, name + '.db')}",
+                                ARCHIVE_DATABASE_URL=f"sqlite:///{os.path.join(scratch, name + '_archive.db')}")
+                if scenario == 'first_start':
+                    # Each measurement gets its own empty database
+                    phases.append(in_process_phases(database_env('phases'), scratch))
+                    server.append(server_start(database_env('server'), scratch, args.timeout))
+                else:
+                    env = database_env('dashboard')
+                    in_process_phases(env, scratch)  # Creates and stamps the schema
+                    phases.append(in_process_phases(env, scratch))
+                    server.append(server_start(env, scratch, args.timeout))
+        report['server'][scenario] = {key: median(server, key) for key in ['live_ms', 'ready_ms']}
+        report['phases'][scenario] = {key: median(phases, key)
+                                      for key in ['import_ms', 'create_app_ms', 'init_database_ms', 'first_request_ms']}
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Fake NVFlare CLI
+Stands in for `nvflare provision` in benchmarks. Builds the same workspace
+layout the real CLI produces (<workspace>/<Project Name>/prod_00/<participant>/
+with startup/, local/ and transfer/ folders and certificate-sized files)
+without needing NVFlare installed.
+
+    NVFLARE_BIN=benchmarks/fake_nvflare.py python benchmarks/api_scaling.py
+
+FAKE_NVFLARE_DELAY adds a fixed delay (seconds) per invocation.
+"""
+
+import os
+import sys
+import time
+import yaml
+
+# (relative path, size in bytes) of the files each participant kit contains
+STARTUP_FILES = {
+    'server': [('startup/fed_server.json', 2400), ('startup/server.crt', 1800), ('startup/server.key', 1700),
+               ('startup/rootCA.pem', 1800), ('startup/signature.json', 900), ('startup/start.sh', 600),
+               ('startup/sub_start.sh', 1500), ('startup/stop_fl.sh', 400),
+               ('startup/authorization.json', 1200)],
+    'client': [('startup/fed_client.json', 1100), ('startup/client.crt', 1800), ('startup/client.key', 1700),
+               ('startup/rootCA.pem', 1800), ('startup/signature.json', 800), ('startup/start.sh', 600),
+               ('startup/sub_start.sh', 1400), ('startup/stop_fl.sh', 400)],
+    'admin': [('startup/fed_admin.json', 900), ('startup/client.crt', 1800), ('startup/client.key', 1700),
+              ('startup/rootCA.pem', 1800), ('startup/signature.json', 600), ('startup/fl_admin.sh', 300)],
+}
+LOCAL_FILES = [('local/log.config.default', 700), ('local/resources.json.default', 500),
+               ('local/privacy.json.sample', 400), ('local/authorization.json.default', 1200)]
+
+
+def write_participant(prod_dir, name, kind):
+    """Create one participant directory with realistic file names and sizes"""
+    root = os.path.join(prod_dir, name)
+    os.makedirs(os.path.join(root, 'transfer'), exist_ok=True)
+    for rel_path, size in STARTUP_FILES[kind] + LOCAL_FILES:
+        path = os.path.join(root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Certificates and keys are random (incompressible); configs are text
+        data = os.urandom(size) if rel_path.endswith(('.crt', '.key', '.pem')) else (b'x' * size)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+
+def main(argv):
+    if len(argv) < 2 or argv[1] != 'provision':
+        print("usage: fake_nvflare.py provision (-p project.yml | --add_client f | --add_user f) -w workspace")
+        return 2
+    args = argv[2:]
+    options = dict(zip(args[::2], args[1::2]))
+    workspace = options.get('-w')
+    if not workspace:
+        print("missing -w", file=sys.stderr)
+        return 2
+
+    time.sleep(float(os.environ.get('FAKE_NVFLARE_DELAY', '0')))
+
+    if '-p' in options:
+        with open(options['-p']) as f:
+            config = yaml.safe_load(f)
+        prod_dir = os.path.join(workspace, config['name'], 'prod_00')
+        for participant in config.get('participants', []):
+            write_participant(prod_dir, participant['name'], participant.get('type', 'client'))
+    elif '--add_client' in options:
+        with open(options['--add_client']) as f:
+            config = yaml.safe_load(f)
+        write_participant(workspace, config['name'], 'client')
+    elif '--add_user' in options:
+        with open(options['--add_user']) as f:
+            config = yaml.safe_load(f)
+        # Admin kits are looked up by their trailing '@'
+        write_participant(workspace, config['name'] + '@', 'admin')
+    else:
+        print("nothing to do", file=sys.stderr)
+        return 2
+
+    print("Provisioning completed")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
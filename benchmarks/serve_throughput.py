@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Serving Throughput Benchmark
+Starts run_dashboard.py in development and production mode against a
+throwaway database and drives both with the same concurrent HTTP load.
+
+    python benchmarks/serve_throughput.py --concurrency 32 --duration 10
+"""
+
+import argparse
+import http.client
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def wait_for_server(port, timeout=30):
+    """Poll the health endpoint until the server answers"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/api/v1/health')
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def login(port):
+    """Log in as the default admin and return an Authorization header"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    conn.request('POST', '/api/v1/login',
+                 body=json.dumps({'email': 'admin@example.com', 'password': 'admin123'}),
+                 headers={'Content-Type': 'application/json'})
+    token = json.loads(conn.getresponse().read())['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+def drive_load(port, path, headers, concurrency, duration):
+    """Run `concurrency` keep-alive clients against one path for `duration` seconds"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.time() + duration
+
+    def client():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        local = []
+        while time.time() < stop_at:
+            start = time.perf_counter()
+            try:
+                conn.request('GET', path, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 400:
+                    raise OSError(response.status)
+                local.append(time.perf_counter() - start)
+            except http.client.RemoteDisconnected:
+                # Keep-alive connection closed by a recycling worker; reconnect like a real client
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            except (OSError, http.client.HTTPException):
+                with lock:
+                    errors[0] += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - started
+
+    latencies.sort()
+    return {
+        'path': path,
+        'requests': len(latencies),
+        'errors': errors[0],
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 2) if latencies else None,
+        'p99_ms': round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2) if latencies else None
+    }
+
+
+def run_mode(mode, args, database_url, port):
+    """Start the dashboard in one mode, benchmark it and shut it down"""
+    cmd = [sys.executable, os.path.join(ROOT, 'run_dashboard.py'), '--host', '127.0.0.1', '--port', str(port)]
+    if mode == 'production':
+        cmd += ['--production', '--workers', str(args.workers), '--threads', str(args.threads)]
+
+    env = dict(os.environ, DATABASE_URL=database_url, PYTHONPATH=ROOT)
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_for_server(port):
+            raise RuntimeError(f"{mode} server did not start")
+        headers = login(port)
+        results = []
+        for path in args.paths:
+            drive_load(port, path, headers, args.concurrency, min(args.duration, 2))  # warm-up
+            results.append(drive_load(port, path, headers, args.concurrency, args.duration))
+        return results
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare dev server and production serving throughput')
+    parser.add_argument('--concurrency', type=int, default=32, help='Concurrent keep-alive clients')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds of load per endpoint')
+    parser.add_argument('--workers', type=int, default=(os.cpu_count() or 1) * 2 + 1)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--port', type=int, default=18443)
+    parser.add_argument('--paths', nargs='+', default=['/api/v1/health', '/api/v1/projects', '/api/v1/projects/1'])
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        report = {
+            'cpu_count': os.cpu_count(),
+            'concurrency': args.concurrency,
+            'duration_s': args.duration,
+            'modes': {}
+        }
+        for offset, mode in enumerate(['development', 'production']):
+            report['modes'][mode] = run_mode(mode, args, database_url, args.port + offset)
+
+    dev = {r['path']: r['throughput_rps'] for r in report['modes']['development']}
+    report['speedup'] = {
+        r['path']: round(r['throughput_rps'] / dev[r['path']], 2) if dev.get(r['path']) else None
+        for r in report['modes']['production']
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -50,6 +50,7 @@ function ProjectDetail() {
   const [editingItem, setEditingItem] = useState(null);
   const [formData, setFormData] = useState({});
   const [currentUser, setCurrentUser] = useState(null);
+  const [provisionProgress, setProvisionProgress] = useState(null);
 
   useEffect(() => {
     loadProject();
@@ -70,8 +71,19 @@ function ProjectDetail() {
   const loadProject = async () => {
     try {
       setLoading(true);
-      const response = await ProjectService.getProject(id);
-      setProject(response.project);
+      // One round trip for everything this page shows
+      const user = JSON.parse(localStorage.getItem('user') || '{}');
+      const include = ['participants', 'creator', 'status'];
+      if (['admin', 'proj_admin'].includes(user.role)) include.push('applications');
+      const response = await ProjectService.getProject(id, include);
+      setProject({
+        ...response.project,
+        servers: response.servers,
+        clients: response.clients,
+        admins: response.admins,
+        applications: response.applications,
+        status: response.status,
+      });
     } catch (err) {
       setError('Failed to load project');
       console.error(err);
@@ -167,13 +179,25 @@ function ProjectDetail() {
   };
 
   const handleProvision = async () => {
+    // Live progress is pushed by the server while the provision request runs
+    const unsubscribe = ProjectService.subscribeToProvisioning(id, setProvisionProgress);
     try {
       await ProjectService.provisionProject(id);
       alert('Project provisioned successfully!');
     } catch (err) {
       setError('Failed to provision project');
       console.error(err);
+    } finally {
+      unsubscribe();
+      setProvisionProgress(null);
+    }
+  };
+
+  const describeProgress = (event) => {
+    if (event.stage === 'adding_participants' && event.total) {
+      return `Adding participants: ${event.completed}/${event.total} (${event.participant})`;
     }
+    return `Provisioning: ${event.stage.replace(/_/g, ' ')}`;
   };
 
   const handleDownload = async (type) => {
@@ -397,6 +421,18 @@ function ProjectDetail() {
         </Box>
       </Box>
 
+      {provisionProgress && (
+        <Box sx={{ mb: 2 }}>
+          <LinearProgress
+            variant={provisionProgress.total ? 'determinate' : 'indeterminate'}
+            value={provisionProgress.total ? (100 * provisionProgress.completed) / provisionProgress.total : 0}
+          />
+          <Typography variant="body2" sx={{ mt: 1 }}>
+            {describeProgress(provisionProgress)}
+          </Typography>
+        </Box>
+      )}
+
       {error && (
         <Alert severity="error" sx={{ mb: 3 }}>
           {error}
@@ -417,6 +453,13 @@ function ProjectDetail() {
               <Box display="flex" gap={1}>
                 <Chip label={project.scheme} color="primary" variant="outlined" />
                 <Chip label={`API v${project.api_version}`} variant="outlined" />
+                {project.status && (
+                  <Chip
+                    label={project.status.status === 'provisioned' ? 'Provisioned' : 'Not provisioned'}
+                    color={project.status.status === 'provisioned' ? 'success' : 'default'}
+                    variant="outlined"
+                  />
+                )}
               </Box>
             </Grid>
             <Grid item xs={12} md={6}>
@@ -633,6 +676,17 @@ function ProjectDetail() {
               <Typography variant="body2" color="text.secondary">
                 View and manage user applications to join this project. Click "Manage Applications" to see all pending, approved, and rejected applications.
               </Typography>
+              {project.applications && (
+                <Box display="flex" gap={1} mt={2}>
+                  {['pending', 'approved', 'rejected'].map((status) => (
+                    <Chip
+                      key={status}
+                      label={`${status}: ${project.applications.filter((a) => a.status === status).length}`}
+                      variant="outlined"
+                    />
+                  ))}
+                </Box>
+              )}
             </CardContent>
           </Card>
         </Box>
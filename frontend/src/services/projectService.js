@@ -7,8 +7,10 @@ export const ProjectService = {
         return response.data;
     },
 
-    async getProject(id) {
-        const response = await api.get(`/projects/${id}`);
+    // include: any of 'participants', 'applications', 'status', 'creator'
+    async getProject(id, include) {
+        const params = include ? { include: include.join(',') } : undefined;
+        const response = await api.get(`/projects/${id}`, { params });
         return response.data;
     },
 
@@ -108,6 +110,18 @@ export const ProjectService = {
         return response.data;
     },
 
+    // Streams provisioning progress via Server-Sent Events; returns an unsubscribe function
+    subscribeToProvisioning(projectId, onEvent) {
+        const token = localStorage.getItem('access_token');
+        const url = `${api.defaults.baseURL}/provision/${projectId}/events?jwt=${encodeURIComponent(token)}`;
+        const source = new EventSource(url);
+        const handleEvent = (event) => onEvent(JSON.parse(event.data));
+        source.addEventListener('progress', handleEvent);
+        source.addEventListener('completed', handleEvent);
+        source.addEventListener('failed', handleEvent);
+        return () => source.close();
+    },
+
     // Downloads
     async downloadStartupKit(projectId, type) {
         const response = await api.get(`/download/${type}/${projectId}`, {
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Sorachain Workspace Migration
+Moves project workspaces from the flat layout (workspace/project_<id>) into the
+sharded layout (workspace/projects/<aa>/<bb>/project_<id>) and records them in
+the workspace_location table. It is safe to run while the API and the
+provisioning workers are up: each move takes the project lock, and projects
+busy provisioning are skipped and picked up by the next run.
+
+    python migrate_workspaces.py --workspace-dir /shared/workspace
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Move flat project workspaces into the sharded layout')
+    parser.add_argument('--workspace-dir', default=os.environ.get('WORKSPACE_DIR', 'workspace'),
+                        help='Workspace root shared with the API servers and workers')
+    parser.add_argument('--limit', type=int, default=0, help='Migrate at most this many projects (0: all)')
+    parser.add_argument('--pause', type=float, default=0, help='Seconds to wait between projects')
+    parser.add_argument('--dry-run', action='store_true', help='Only list what would be moved')
+    args = parser.parse_args()
+
+    from application import create_app, init_database, db
+    from application.provisioning import NVFlareProvisioningService
+
+    app = create_app()
+    init_database(app)
+    service = NVFlareProvisioningService(workspace_dir=args.workspace_dir)
+
+    with app.app_context():
+        project_ids = service.flat_workspace_ids()
+        sealed_root = service.sealed_root()
+        if os.path.isdir(sealed_root):
+            # Seals of frozen projects whose workspace was already moved
+            project_ids = sorted(set(project_ids) | {
+                int(name[len('project_'):]) for name in os.listdir(sealed_root)
+                if name.startswith('project_') and name[len('project_'):].isdigit()
+            })
+        if args.limit:
+            project_ids = project_ids[:args.limit]
+        print(f"{len(project_ids)} projects in the flat layout")
+
+        migrated, busy, failed = 0, [], []
+        started = time.monotonic()
+        for project_id in project_ids:
+            if args.dry_run:
+                print(f"project {project_id}: {service.flat_workspace(project_id)} -> "
+                      f"{service.sharded_workspace(project_id)}")
+                continue
+            try:
+                moved = service.migrate_workspace(project_id)
+                if moved:
+                    migrated += 1
+                elif moved is None:
+                    busy.append(project_id)
+            except Exception as e:
+                print(f"Error migrating project {project_id}: {e}")
+                db.session.rollback()
+                failed.append(project_id)
+            if args.pause:
+                time.sleep(args.pause)
+
+        if not args.dry_run:
+            print(f"Migrated {migrated} workspaces in {time.monotonic() - started:.1f}s")
+            if busy:
+                print(f"Skipped {len(busy)} busy projects (run again): {busy[:20]}")
+            if failed:
+                print(f"Failed: {failed[:20]}")
+                sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
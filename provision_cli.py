@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Sorachain Provisioning CLI
+Headless fleet operations on many projects at once, run across a process pool
+with the same app factory, provisioning service and per-project locks as the
+dashboard and the provisioning workers:
+
+    python provision_cli.py provision --all --processes 8
+    python provision_cli.py rotate 12 15 19
+    python provision_cli.py migrate --all --skip-locked
+    python provision_cli.py archive --all --inactive-days 365
+    python provision_cli.py export 12 -o project_12.ndjson.gz --gzip
+    python provision_cli.py import project_12.ndjson.gz --name "Copy of project 12"
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+ACTIONS = {
+    'provision': 'Provision or re-provision projects',
+    'rotate': 'Re-provision projects from a fresh workspace so they get new certificates',
+    'seal': 'Seal the startup kits of frozen projects',
+    'migrate': 'Move flat-layout workspaces into the sharded layout',
+    'archive': 'Move inactive projects into the archive database and their workspaces into tar.gz files',
+    'restore': 'Bring archived projects back',
+}
+
+# Per-process state of the pool workers
+_app = None
+_service = None
+
+
+def _init_worker(workspace_dir):
+    """Pool initializer: one app and provisioning service per worker process"""
+    global _app, _service
+    # Ctrl+C stops the dispatch in the parent; projects already running finish
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from application import create_app
+    from application.provisioning import NVFlareProvisioningService
+    _app = create_app()
+    _service = NVFlareProvisioningService(workspace_dir=workspace_dir)
+
+
+def run_action(action, project_id, skip_locked=False):
+    """Run one action on one project in a pool worker; returns a result dict"""
+    from application import audit, db, archival
+    from application.provisioning import ProjectFrozenError
+
+    started = time.monotonic()
+    result = {'project_id': project_id, 'action': action}
+    with _app.app_context():
+        try:
+            if skip_locked:
+                # Checked at dispatch: a run that starts right after this still waits its turn
+                lock = _service.project_lock(project_id)
+                if not lock.acquire(blocking=False):
+                    result.update(status='skipped', detail='locked by another run')
+                    return result
+                lock.release()
+
+            if action == 'provision':
+                result['detail'] = _service.call_nvflare_provision(project_id)
+            elif action == 'rotate':
+                result['detail'] = _service.rotate_certificates(project_id)
+            elif action == 'seal':
+                manifest = _service.seal_startup_kits(project_id)
+                result['detail'] = ', '.join(sorted(manifest['kits']))
+            elif action == 'migrate':
+                moved = _service.migrate_workspace(project_id)
+                if not moved:
+                    result.update(status='skipped', detail='busy' if moved is None else 'nothing to move')
+                    return result
+                result['detail'] = _service.project_workspace(project_id)
+            elif action == 'archive':
+                summary = archival.archive_project(_service, project_id)
+                result['detail'] = f"{summary['counts']}, workspace archive {summary['workspace_size']} bytes"
+            elif action == 'restore':
+                result['detail'] = str(archival.restore_project(_service, project_id)['restored'])
+            result['status'] = 'ok'
+            if action in ('archive', 'restore'):
+                audit.record_event(f"project.{'archived' if action == 'archive' else 'restored'}",
+                                   project_id=project_id, target_type='project', target_id=project_id, source='cli')
+            if action in ('provision', 'rotate'):
+                audit.record_event('provision.succeeded', project_id=project_id, workspace=result['detail'],
+                                   source='cli', reason=action)
+        except (ProjectFrozenError, archival.ArchiveError) as e:
+            db.session.rollback()
+            result.update(status='skipped', detail=str(e))
+        except Exception as e:
+            db.session.rollback()
+            result.update(status='failed', detail=str(e))
+            if action in ('provision', 'rotate'):
+                audit.record_event('provision.failed', project_id=project_id, error=str(e),
+                                   source='cli', reason=action)
+        finally:
+            result['seconds'] = round(time.monotonic() - started, 2)
+            audit.audit_recorder.flush()
+    return result
+
+
+def select_projects(args, app, service):
+    """Project ids the command applies to, in id order"""
+    from sqlalchemy import select
+    from application import db, archival
+    from application.models import Project
+
+    with app.app_context():
+        if args.action == 'migrate' and args.all:
+            return service.flat_workspace_ids()
+        if args.action == 'archive' and args.all:
+            days = args.inactive_days if args.inactive_days is not None else app.config['ARCHIVE_INACTIVE_DAYS']
+            return archival.inactive_projects(days)
+
+        query = select(Project.id).order_by(Project.id)
+        if args.project_ids:
+            query = query.where(Project.id.in_(args.project_ids))
+        if args.action == 'restore':
+            query = query.where(Project.id.in_(archival.archived_ids()))
+        else:
+            query = query.where(Project.id.not_in(archival.archived_ids()))
+        if args.action in ('provision', 'rotate'):
+            query = query.where(Project.frozen.isnot(True))  # Frozen projects are never reprovisioned
+        elif args.action == 'seal':
+            query = query.where(Project.frozen.is_(True))
+        project_ids = list(db.session.execute(query).scalars())
+
+        if args.unprovisioned:
+            project_ids = [project_id for project_id in project_ids
+                           if not os.path.isdir(service.project_workspace(project_id))]
+        return project_ids
+
+
+def print_summary(results, elapsed):
+    counts = {status: sum(1 for r in results if r['status'] == status) for status in ('ok', 'skipped', 'failed')}
+    print(f"\nDone in {elapsed:.1f}s: {counts['ok']} ok, {counts['skipped']} skipped, {counts['failed']} failed")
+    failures = [r for r in results if r['status'] == 'failed']
+    if failures:
+        print("Failures:")
+        for result in sorted(failures, key=lambda r: r['project_id']):
+            # First line only; the full message is in --report
+            print(f"  project {result['project_id']}: {result['detail'].splitlines()[0] if result['detail'] else ''}")
+    return counts
+
+
+def run_batch(args):
+    from application import create_app, init_database, db
+    from application.provisioning import NVFlareProvisioningService
+
+    app = create_app()
+    init_database(app)
+    service = NVFlareProvisioningService(workspace_dir=args.workspace_dir)
+    project_ids = select_projects(args, app, service)
+    if not project_ids:
+        print("No matching projects")
+        return 0
+
+    # Pool workers open their own connections, archive bind included
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+    total = len(project_ids)
+    processes = max(min(args.processes, total), 1)
+    print(f"{args.action}: {total} projects across {processes} processes")
+    results = []
+    started = time.monotonic()
+    executor = ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                   initargs=(args.workspace_dir,))
+    try:
+        futures = {executor.submit(run_action, args.action, project_id, args.skip_locked): project_id
+                   for project_id in project_ids}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:  # Worker process died
+                result = {'project_id': futures[future], 'action': args.action, 'status': 'failed',
+                          'detail': f"Worker error: {e}", 'seconds': None}
+            results.append(result)
+            done = len(results)
+            rate = done / max(time.monotonic() - started, 1e-6)
+            print(f"[{done}/{total}] project {result['project_id']} {result['status']}"
+                  f" ({result['seconds']}s) - {rate:.1f}/s, ~{(total - done) / rate:.0f}s left")
+    except KeyboardInterrupt:
+        print("\nInterrupted: waiting for running projects, cancelling the rest")
+        executor.shutdown(wait=True, cancel_futures=True)
+    finally:
+        executor.shutdown(wait=True)
+
+    counts = print_summary(results, time.monotonic() - started)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump({'action': args.action, 'counts': counts,
+                       'results': sorted(results, key=lambda r: r['project_id'])}, f, indent=2)
+        print(f"Report written to {args.report}")
+    return 1 if counts['failed'] or len(results) < total else 0
+
+
+def export_project(args):
+    """Write one project snapshot to a file or stdout, streaming batch by batch"""
+    from application import create_app, init_database, snapshots
+
+    app = create_app()
+    init_database(app)
+    with app.app_context():
+        chunks = snapshots.iter_records(args.project_id)
+        if args.gzip:
+            chunks = snapshots.gzip_stream(chunks)
+        out = open(args.output, 'wb') if args.output else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+        except snapshots.SnapshotError as e:
+            print(f"Export failed: {e}", file=sys.stderr)
+            return 1
+        finally:
+            if args.output:
+                out.close()
+    if args.output:
+        print(f"Exported project {args.project_id} to {args.output}", file=sys.stderr)
+    return 0
+
+
+def import_project(args):
+    """Create a project from a snapshot file in one transaction, owned by --owner"""
+    from sqlalchemy import select
+    from application import create_app, init_database, db, audit, project_cache, snapshots
+    from application.models import User
+
+    app = create_app()
+    init_database(app)
+    with app.app_context():
+        owner_id = db.session.execute(select(User.id).where(User.email == args.owner)).scalar()
+        if owner_id is None:
+            print(f"Import failed: no user {args.owner}", file=sys.stderr)
+            return 1
+        with open(args.file, 'rb') as f:
+            try:
+                project_id, summary = snapshots.import_snapshot(snapshots.open_snapshot(f), owner_id, name=args.name)
+            except (snapshots.SnapshotError, OSError, EOFError) as e:
+                db.session.rollback()
+                print(f"Import failed, nothing was imported: {e}", file=sys.stderr)
+                return 1
+        project_cache.bump_version(project_id)
+        db.session.commit()
+        audit.record_event('project.imported', project_id=project_id, target_type='project',
+                           target_id=project_id, source='cli', **summary)
+        audit.audit_recorder.flush()
+    print(f"Imported project {project_id}: {summary['imported']}"
+          + (f", {summary['skipped_applications']} applications of unknown users skipped"
+             if summary['skipped_applications'] else ''))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sorachain provisioning from the command line')
+    subparsers = parser.add_subparsers(dest='action', required=True)
+    for action, help_text in ACTIONS.items():
+        sub = subparsers.add_parser(action, help=help_text)
+        sub.add_argument('project_ids', nargs='*', type=int, help='Project ids (default: see --all)')
+        sub.add_argument('--all', action='store_true', help='Every matching project')
+        sub.add_argument('--unprovisioned', action='store_true', help='Only projects without a workspace')
+        sub.add_argument('--workspace-dir', default=os.environ.get('WORKSPACE_DIR', 'workspace'),
+                         help='Workspace root shared with the dashboard and workers')
+        sub.add_argument('--processes', type=int, default=os.cpu_count() or 1, help='Parallel worker processes')
+        sub.add_argument('--skip-locked', action='store_true',
+                         help='Skip projects another run holds the lock of, instead of waiting')
+        sub.add_argument('--report', help='Write per-project results as JSON to this file')
+        if action == 'archive':
+            sub.add_argument('--inactive-days', type=int,
+                             help='With --all: projects idle this long (default: ARCHIVE_INACTIVE_DAYS)')
+
+    sub = subparsers.add_parser('export', help='Write a project snapshot as newline-delimited JSON')
+    sub.add_argument('project_id', type=int)
+    sub.add_argument('-o', '--output', help='Output file (default: stdout)')
+    sub.add_argument('--gzip', action='store_true', help='Compress the snapshot')
+    sub = subparsers.add_parser('import', help='Create a project from a snapshot (plain or gzip)')
+    sub.add_argument('file')
+    sub.add_argument('--name', help='Name of the new project (default: the exported name)')
+    sub.add_argument('--owner', default='admin@example.com', help='Email of the user who will own the project')
+    args = parser.parse_args()
+
+    if args.action == 'export':
+        sys.exit(export_project(args))
+    if args.action == 'import':
+        sys.exit(import_project(args))
+    if not args.project_ids and not args.all:
+        parser.error('give project ids or --all')
+    sys.exit(run_batch(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Sorachain Provisioning Worker
+Claims provisioning jobs from the shared database queue and runs the NVFlare
+CLI against a workspace directory. Any number of workers can run, on any node
+that reaches the same DATABASE_URL and workspace path (e.g. an NFS mount):
+
+    python provision_worker.py --workspace-dir /shared/workspace --processes 4
+
+Set PROVISION_MODE=queue on the API servers so provisioning requests are
+queued instead of run inline, and PROGRESS_BROKER=sqlite with a shared
+PROGRESS_BROKER_PATH so progress events reach the API's SSE streams.
+"""
+
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+stopping = threading.Event()
+
+
+def run_job(app, service, job_id, project_id, reason, worker_id, args):
+    """Provision one claimed job while a heartbeat thread renews its lease"""
+    from application import audit, jobs
+    from application.rotation import ROTATION_REASON, rotation_allowed
+    from application.provisioning import ProjectFrozenError
+    from application.validation import ProjectValidationError
+
+    # The window may have closed between queueing (or claiming) and now
+    if reason == ROTATION_REASON and not rotation_allowed(app.config):
+        jobs.release(job_id, worker_id)
+        print(f"[{worker_id}] Outside the rotation windows; job {job_id} for project {project_id} queued again")
+        return False
+
+    finished = threading.Event()
+    lease_lost = threading.Event()
+
+    def heartbeat():
+        with app.app_context():
+            while not finished.wait(args.heartbeat):
+                try:
+                    if not jobs.heartbeat(job_id, worker_id, args.lease):
+                        lease_lost.set()
+                        return
+                except Exception as e:
+                    print(f"[{worker_id}] Heartbeat for job {job_id} failed: {e}")
+
+    beat = threading.Thread(target=heartbeat, name=f'heartbeat-{job_id}', daemon=True)
+    beat.start()
+    print(f"[{worker_id}] Provisioning project {project_id} (job {job_id}, {reason or 'api'})")
+    started = time.monotonic()
+    try:
+        if reason == ROTATION_REASON:
+            workspace = service.rotate_certificates(project_id)
+        else:
+            workspace = service.call_nvflare_provision(project_id)
+        error = None
+    except Exception as e:
+        workspace, error = None, e
+    finally:
+        finished.set()
+        beat.join()
+
+    elapsed = round(time.monotonic() - started, 2)
+    if lease_lost.is_set():
+        # Another worker owns the job now; its result is the one that counts
+        print(f"[{worker_id}] Lost the lease on job {job_id}; discarding the result")
+        return False
+
+    if error is None:
+        jobs.complete(job_id, worker_id, workspace)
+        audit.record_event('provision.succeeded', project_id=project_id, job_id=job_id,
+                           worker=worker_id, workspace=workspace, seconds=elapsed)
+        print(f"[{worker_id}] Job {job_id} succeeded in {elapsed}s: {workspace}")
+        return True
+
+    # Retrying cannot help a frozen project or an invalid configuration
+    jobs.fail(job_id, worker_id, error, retry=not isinstance(error, (ProjectFrozenError, ProjectValidationError)))
+    audit.record_event('provision.failed', project_id=project_id, job_id=job_id,
+                       worker=worker_id, error=str(error))
+    print(f"[{worker_id}] Job {job_id} failed after {elapsed}s: {error}")
+    return False
+
+
+def work(args, index=0):
+    """Claim and run jobs until stopped, idle (--once) or --max-jobs is reached"""
+    from application import create_app, audit, db
+    from application.jobs import claim
+    from application.provisioning import NVFlareProvisioningService
+    from application.rotation import ROTATION_REASON, rotation_allowed
+
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    signal.signal(signal.SIGINT, lambda *_: stopping.set())
+
+    app = create_app()
+    worker_id = f"{args.worker_id or socket.gethostname()}:{os.getpid()}"
+    service = NVFlareProvisioningService(workspace_dir=args.workspace_dir)
+    print(f"[{worker_id}] Worker started; workspace {os.path.abspath(args.workspace_dir)}")
+
+    processed = 0
+    while not stopping.is_set():
+        with app.app_context():
+            try:
+                # Rotation jobs wait in the queue until a rotation window opens
+                skip = [] if rotation_allowed(app.config) else [ROTATION_REASON]
+                claimed = claim(worker_id, args.lease, skip_reasons=skip)
+            except Exception as e:
+                print(f"[{worker_id}] Claim failed: {e}")
+                db.session.rollback()
+                claimed = None
+
+            if claimed is None:
+                if args.once:
+                    break
+                stopping.wait(args.poll_interval)
+                continue
+
+            run_job(app, service, *claimed, worker_id, args)
+            processed += 1
+            if args.max_jobs and processed >= args.max_jobs:
+                break
+
+    audit.audit_recorder.flush()
+    print(f"[{worker_id}] Worker stopped after {processed} jobs")
+    return processed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run provisioning jobs from the shared queue')
+    parser.add_argument('--workspace-dir', default=os.environ.get('WORKSPACE_DIR', 'workspace'),
+                        help='Workspace root shared with the API servers')
+    parser.add_argument('--processes', type=int, default=1, help='Worker processes on this node')
+    parser.add_argument('--worker-id', help='Worker name prefix (default: hostname)')
+    parser.add_argument('--lease', type=int, default=60, help='Seconds a claim stays valid without a heartbeat')
+    parser.add_argument('--heartbeat', type=float, default=15, help='Seconds between lease renewals')
+    parser.add_argument('--poll-interval', type=float, default=2, help='Seconds to wait when the queue is empty')
+    parser.add_argument('--max-jobs', type=int, default=0, help='Exit after this many jobs (0: no limit)')
+    parser.add_argument('--once', action='store_true', help='Exit as soon as the queue is empty')
+    args = parser.parse_args()
+
+    if args.heartbeat >= args.lease:
+        parser.error('--heartbeat must be shorter than --lease')
+
+    if args.processes <= 1:
+        work(args)
+        return
+
+    workers = [multiprocessing.Process(target=work, args=(args, i), name=f'provision-worker-{i}')
+               for i in range(args.processes)]
+    for process in workers:
+        process.start()
+
+    def forward(signum, frame):
+        # Each worker finishes its current job before exiting
+        for process in workers:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    for process in workers:
+        process.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Sorachain Certificate Rotation Scheduler
+Scans provisioned workspaces for certificates close to expiry and queues
+rotation jobs for the provisioning workers (see provision_worker.py):
+
+    python rotation_scheduler.py --workspace-dir /shared/workspace --interval 900
+
+CERT_ROTATION_THRESHOLD_DAYS, CERT_ROTATION_WINDOWS (local HH:MM-HH:MM ranges)
+and CERT_ROTATION_MAX_CONCURRENT control when and how many projects rotate.
+"""
+
+import argparse
+import os
+import signal
+import sys
+import threading
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+stopping = threading.Event()
+
+
+def run_once(app, service):
+    """Refresh the expiry index, then queue whatever rotations fit the window and the cap"""
+    from application import db, rotation
+
+    with app.app_context():
+        try:
+            scanned = rotation.refresh_index(service)
+            print(f"Certificate index: {scanned['workspaces']} workspaces, "
+                  f"{scanned['rescanned']} rescanned, {scanned['removed']} removed")
+            summary = rotation.schedule_rotations(app.config)
+        except Exception as e:
+            print(f"Rotation scheduling failed: {e}")
+            db.session.rollback()
+            return None
+
+    if not summary['in_window']:
+        print("Outside the rotation windows; nothing queued")
+    for queued in summary['queued']:
+        print(f"Queued certificate rotation for project {queued['project_id']} "
+              f"(earliest expiry {queued['earliest_expiry']})")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Queue certificate rotations for projects nearing expiry')
+    parser.add_argument('--workspace-dir', default=os.environ.get('WORKSPACE_DIR', 'workspace'),
+                        help='Workspace root shared with the API servers and workers')
+    parser.add_argument('--interval', type=float, default=900, help='Seconds between scans')
+    parser.add_argument('--once', action='store_true', help='Scan and schedule once, then exit')
+    args = parser.parse_args()
+
+    from application import create_app, init_database
+    from application.provisioning import NVFlareProvisioningService
+
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    signal.signal(signal.SIGINT, lambda *_: stopping.set())
+
+    app = create_app()
+    init_database(app)
+    service = NVFlareProvisioningService(workspace_dir=args.workspace_dir)
+
+    while not stopping.is_set():
+        run_once(app, service)
+        if args.once:
+            break
+        stopping.wait(args.interval)
+
+
+if __name__ == '__main__':
+    main()
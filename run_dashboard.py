@@ -7,33 +7,104 @@ import argparse
 import os
 import sys
 
+def run_production(app, args):
+    """Serve the app with a pre-forking, multi-threaded gunicorn server"""
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        print("Production mode requires gunicorn: pip install gunicorn")
+        sys.exit(1)
+
+    from application import db
+    from application.downloads import download_tracker
+    from application.audit import audit_recorder
+
+    def post_fork(server, worker):
+        # Connections opened by the master during init_database must not be shared, archive bind included
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+
+    def worker_exit(server, worker):
+        # Drain buffered download/audit events before the worker goes away
+        for flusher in [download_tracker, audit_recorder]:
+            flusher.flush()
+
+    class DashboardApplication(BaseApplication):
+        """Embedded gunicorn application serving the already-built Flask app"""
+
+        def load_config(self):
+            options = {
+                'bind': f"{args.host}:{args.port}",
+                'workers': args.workers,
+                'threads': args.threads,
+                'worker_class': 'gthread',
+                'preload_app': True,
+                'max_requests': args.max_requests,
+                'max_requests_jitter': args.max_requests_jitter,
+                'graceful_timeout': args.graceful_timeout,
+                'timeout': args.timeout,
+                'keepalive': 5,
+                'accesslog': '-' if args.access_log else None,
+                'post_fork': post_fork,
+                'worker_exit': worker_exit,
+            }
+            for key, value in options.items():
+                if value is not None:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    print(f"Production mode: {args.workers} workers x {args.threads} threads, "
+          f"recycling after ~{args.max_requests} requests, {args.graceful_timeout}s drain on shutdown")
+    DashboardApplication().run()
+
 def main():
     parser = argparse.ArgumentParser(description='NVFlare Provisioning Dashboard')
     parser.add_argument('--host', default='0.0.0.0', help='Host to bind to')
     parser.add_argument('--port', type=int, default=8443, help='Port to bind to')
     parser.add_argument('--debug', action='store_true', help='Enable debug mode')
     parser.add_argument('--workspace', default='workspace', help='Sorachain workspace directory')
-    
+    parser.add_argument('--production', action='store_true',
+                        help='Serve with gunicorn (multi-process, multi-threaded) instead of the Flask dev server')
+    parser.add_argument('--workers', type=int, default=(os.cpu_count() or 1) * 2 + 1,
+                        help='Worker processes in production mode')
+    parser.add_argument('--threads', type=int, default=4, help='Threads per worker in production mode')
+    parser.add_argument('--max-requests', type=int, default=2000,
+                        help='Recycle a worker after this many requests (0 disables)')
+    parser.add_argument('--max-requests-jitter', type=int, default=200,
+                        help='Random jitter added to --max-requests so workers do not recycle together')
+    parser.add_argument('--graceful-timeout', type=int, default=30,
+                        help='Seconds workers get to finish in-flight requests on shutdown or recycle')
+    parser.add_argument('--timeout', type=int, default=300,
+                        help='Seconds before a silent worker is killed (provisioning can be slow)')
+    parser.add_argument('--access-log', action='store_true', help='Write an access log to stdout')
+
     args = parser.parse_args()
-    
+
     # Set environment variables
     os.environ['NVFLARE_WORKSPACE'] = args.workspace
-    
+
     try:
         # Create the app
         from application import create_app, init_database
         app = create_app()
-        
-        # Initialize database separately
+
+        # Initialize database once here; production workers fork after this point
         print("Initializing database...")
         init_database(app)
         print("Database initialization completed")
-        
+
         print(f"Starting Sorachain Provisioning Dashboard on {args.host}:{args.port}")
         print(f"Workspace directory: {args.workspace}")
         print(f"Debug mode: {args.debug}")
         print("Press Ctrl+C to stop")
-        
+
+        if args.production:
+            run_production(app, args)
+            return
+
         app.run(
             host=args.host,
             port=args.port,
@@ -46,5 +117,3 @@ def main():
 
 if __name__ == '__main__':
     main()
-
-
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Test fixtures: a fresh app per test on its own SQLite database and workspace
+"""
+
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """App with the default data (admin user, example project 1), inside an app context"""
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'dashboard.db'}")
+    monkeypatch.chdir(tmp_path)  # The workspace defaults to ./workspace
+    from application import create_app, init_database
+    app = create_app()
+    app.config['TESTING'] = True
+    init_database(app)
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def make_project(app):
+    """Create a project owned by the default admin and return it"""
+    from application import db
+    from application.models import Project, User
+
+    def make(name='Test Project', server_name='FLServer.com'):
+        admin = User.query.filter_by(email='admin@example.com').first()
+        project = Project(name=name, description='', scheme='grpc', server_name=server_name, created_by=admin.id)
+        db.session.add(project)
+        db.session.commit()
+        return project
+
+    return make
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Batch approvals: filters select the right rows, bad input is a BatchReviewError
+"""
+
+import pytest
+from application import db, approvals
+from application.models import Client
+
+
+@pytest.fixture
+def clients(app, make_project):
+    other = make_project('Other')
+    db.session.add_all([Client(project_id=1, name='site-a', org='a'),
+                        Client(project_id=1, name='site-b', org='b'),
+                        Client(project_id=other.id, name='site-c', org='a')])
+    db.session.commit()
+    return other.id
+
+
+def test_filter_selects_rows(clients):
+    summary = approvals.batch_review('clients', 'approve', None, filters={'project_id': '1', 'org': 'a'})
+    db.session.commit()
+    assert summary['updated'] == 1
+    assert Client.query.filter_by(name='site-a').one().approval_state == 1
+    assert Client.query.filter_by(name='site-c').one().approval_state == 0
+
+
+@pytest.mark.parametrize('kind, ids, filters', [
+    ('clients', None, {'project_id': 'abc'}),
+    ('applications', None, {'project_id': None}),
+    ('clients', None, {'approval_state': 'maybe'}),
+    ('admins', None, {'approval_state': [1]}),
+    ('clients', None, ['x']),
+    ('applications', None, {'status': {'$ne': 'pending'}}),
+    ('clients', '12', None),
+    ('clients', [1, 'two'], None),
+])
+def test_invalid_input(clients, kind, ids, filters):
+    with pytest.raises(approvals.BatchReviewError):
+        approvals.batch_review(kind, 'approve', None, ids=ids, filters=filters)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Project archival: archiving and restoring keep every row as it was
+"""
+
+import pytest
+from sqlalchemy import select
+from application import db, archival
+from application.models import Server, Client, Admin, User, UserApplication, DownloadEvent
+from application.provisioning import NVFlareProvisioningService
+
+
+def _rows(project_id):
+    """Every column of every archived row of a project, per table"""
+    return {model.__tablename__: [tuple(row) for row in db.session.execute(
+                select(model.__table__).where(model.__table__.c.project_id == project_id)
+                .order_by(model.__table__.c.id))]
+            for model in archival.ARCHIVED_MODELS}
+
+
+@pytest.fixture
+def service(tmp_path):
+    return NVFlareProvisioningService(workspace_dir=str(tmp_path / 'workspace'))
+
+
+@pytest.fixture
+def project_id(app):
+    """The default project with downloads, several applications and one from a deleted user"""
+    clients = [Client(project_id=1, name=f'site-{i}', org='example', approval_state=1, download_count=i)
+               for i in range(5)]
+    gone = User(email='gone@example.com', password_hash='x', name='Gone', organization='example')
+    db.session.add_all(clients + [gone])
+    db.session.flush()
+    db.session.add_all([
+        UserApplication(user_id=User.query.first().id, project_id=1, role_requested='client', message='hi'),
+        UserApplication(user_id=gone.id, project_id=1, role_requested='admin', status='rejected'),
+        DownloadEvent(project_id=1, target_type='client', participant_id=clients[3].id),
+    ])
+    db.session.commit()
+    db.session.delete(gone)
+    db.session.commit()
+    return 1
+
+
+def test_round_trip_keeps_rows(project_id, service):
+    before = _rows(project_id)
+    summary = archival.archive_project(service, project_id)
+    assert summary['counts'] == {kind: len(rows) for kind, rows in before.items()}
+    assert archival.is_archived(project_id)
+    assert all(not rows for rows in _rows(project_id).values())
+
+    restored = archival.restore_project(service, project_id)
+    assert restored['restored'] == summary['counts']
+    assert not archival.is_archived(project_id)
+    assert _rows(project_id) == before
+    # Download history still points at the same participant
+    event = DownloadEvent.query.filter_by(project_id=project_id).one()
+    assert db.session.get(Client, event.participant_id).name == 'site-3'
+
+
+def test_restore_refuses_reused_ids(project_id, service, make_project):
+    client_id = Client.query.filter_by(project_id=project_id).first().id
+    archival.archive_project(service, project_id)
+    db.session.add(Client(id=client_id, project_id=make_project('Other').id, name='squatter', org='other'))
+    db.session.commit()
+
+    with pytest.raises(archival.ArchiveError, match='reused'):
+        archival.restore_project(service, project_id)
+    assert archival.is_archived(project_id)
+    assert not Server.query.filter_by(project_id=project_id).count()
+    assert not Admin.query.filter_by(project_id=project_id).count()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Auto-approval on create: rules apply to the rows a request created, not the backlog
+"""
+
+import json
+import pytest
+from application import db, auto_approval
+from application.models import ApprovalRule, Client
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    token = client.post('/api/v1/login', json={'email': 'admin@example.com', 'password': 'admin123'})
+    client.environ_base['HTTP_AUTHORIZATION'] = f"Bearer {token.get_json()['access_token']}"
+    db.session.add(ApprovalRule(name='Acme', kind='clients', conditions=json.dumps({'orgs': ['acme']})))
+    db.session.add(Client(project_id=1, name='backlog', org='acme'))
+    db.session.commit()
+    return client
+
+
+def _state(name):
+    db.session.expire_all()
+    return Client.query.filter_by(project_id=1, name=name).one().approval_state
+
+
+def test_import_approves_only_created_rows(client):
+    rows = [{'type': 'client', 'name': 'new-acme', 'org': 'acme'},
+            {'type': 'client', 'name': 'new-other', 'org': 'other'}]
+    response = client.post('/api/v1/projects/1/participants/import?format=json', json=rows)
+    assert response.status_code == 200
+    assert response.get_json()['auto_approved'] == {'clients': 1, 'admins': 0}
+    assert (_state('new-acme'), _state('new-other'), _state('backlog')) == (1, 0, 0)
+
+
+def test_large_import_is_matched_in_batches(client):
+    rows = [{'type': 'client', 'name': f'site-{i}', 'org': 'acme'}
+            for i in range(auto_approval.ID_BATCH_SIZE * 2 + 1)]
+    response = client.post('/api/v1/projects/1/participants/import?format=json', json=rows)
+    assert response.get_json()['auto_approved']['clients'] == len(rows)
+    assert _state('backlog') == 0
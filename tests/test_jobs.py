@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Provisioning job queue: claims, leases, heartbeats and retries
+"""
+
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from application import db, jobs
+from application.models import ProvisioningJob
+
+
+def _expire_lease(job_id):
+    db.session.execute(update(ProvisioningJob).where(ProvisioningJob.id == job_id)
+                       .values(lease_expires_at=datetime.utcnow() - timedelta(seconds=1)))
+    db.session.commit()
+
+
+def _job(job_id):
+    db.session.expire_all()
+    return db.session.get(ProvisioningJob, job_id)
+
+
+def _race(app, workers):
+    """Let every worker call claim() at the same moment, each on its own session"""
+    barrier = threading.Barrier(len(workers))
+    claims = {}
+
+    def run(worker_id):
+        with app.app_context():
+            barrier.wait()
+            claims[worker_id] = jobs.claim(worker_id)
+            db.session.remove()
+
+    threads = [threading.Thread(target=run, args=(worker_id,)) for worker_id in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return claims
+
+
+def test_racing_workers_claim_a_job_once(app):
+    job = jobs.enqueue(1, reason='test')
+    db.session.commit()
+
+    claims = _race(app, [f'worker-{i}' for i in range(8)])
+
+    winners = [worker_id for worker_id, claimed in claims.items() if claimed]
+    assert len(winners) == 1
+    assert claims[winners[0]] == (job.id, 1, 'test')
+    job = _job(job.id)
+    assert (job.status, job.worker_id, job.attempts) == ('running', winners[0], 1)
+
+
+def test_racing_workers_split_jobs_of_different_projects(app, make_project):
+    job_ids = set()
+    for index in range(3):
+        job_ids.add(jobs.enqueue(make_project(name=f'Project {index}').id).id)
+    db.session.commit()
+
+    claims = _race(app, [f'worker-{i}' for i in range(8)])
+
+    claimed = [claimed[0] for claimed in claims.values() if claimed]
+    assert sorted(claimed) == sorted(job_ids)
+
+
+def test_project_with_live_lease_is_not_claimed_twice(app):
+    first = jobs.enqueue(1)
+    db.session.commit()
+    assert jobs.claim('worker-a')[0] == first.id
+
+    second = jobs.enqueue(1)  # The first job is running, so this is a new one
+    db.session.commit()
+    assert second.id != first.id
+    assert jobs.claim('worker-b') is None
+
+
+def test_expired_lease_is_reclaimed(app):
+    job = jobs.enqueue(1)
+    db.session.commit()
+    assert jobs.claim('worker-a')[0] == job.id
+    assert jobs.heartbeat(job.id, 'worker-a')
+
+    _expire_lease(job.id)
+    assert jobs.claim('worker-b')[0] == job.id
+    job = _job(job.id)
+    assert (job.status, job.worker_id, job.attempts) == ('running', 'worker-b', 2)
+
+    # The first worker lost the job and must stop
+    assert not jobs.heartbeat(job.id, 'worker-a')
+    assert not jobs.complete(job.id, 'worker-a', 'workspace/a')
+    assert jobs.complete(job.id, 'worker-b', 'workspace/b')
+    assert _job(job.id).status == 'succeeded'
+
+
+def test_expired_lease_on_final_attempt_fails_the_job(app):
+    job = jobs.enqueue(1, max_attempts=1)
+    db.session.commit()
+    jobs.claim('worker-a')
+
+    _expire_lease(job.id)
+    assert jobs.claim('worker-b') is None
+    job = _job(job.id)
+    assert job.status == 'failed'
+    assert job.error == 'Lease expired on the final attempt'
+
+
+def test_fail_requeues_while_attempts_remain(app):
+    job = jobs.enqueue(1, max_attempts=2)
+    db.session.commit()
+
+    jobs.claim('worker-a')
+    assert jobs.fail(job.id, 'worker-a', 'CLI exited with 1')
+    job = _job(job.id)
+    assert (job.status, job.error, job.finished_at) == ('queued', 'CLI exited with 1', None)
+
+    assert jobs.claim('worker-b')[0] == job.id
+    assert jobs.fail(job.id, 'worker-b', 'CLI exited with 1 again')
+    job = _job(job.id)
+    assert (job.status, job.attempts) == ('failed', 2)
+    assert job.finished_at is not None
+    assert jobs.claim('worker-c') is None
+
+
+def test_fail_without_retry_is_final(app):
+    job = jobs.enqueue(1)
+    db.session.commit()
+    jobs.claim('worker-a')
+
+    assert jobs.fail(job.id, 'worker-a', 'invalid configuration', retry=False)
+    job = _job(job.id)
+    assert (job.status, job.attempts) == ('failed', 1)
+    assert jobs.claim('worker-b') is None
+
+
+def test_fail_from_a_worker_that_lost_the_lease_is_ignored(app):
+    job = jobs.enqueue(1)
+    db.session.commit()
+    jobs.claim('worker-a')
+    _expire_lease(job.id)
+    jobs.claim('worker-b')
+
+    assert not jobs.fail(job.id, 'worker-a', 'late failure')
+    job = _job(job.id)
+    assert (job.status, job.worker_id, job.error) == ('running', 'worker-b', None)
+
+
+def test_skipped_reasons_stay_queued(app, make_project):
+    rotation = jobs.enqueue(1, reason='certificate_rotation')
+    manual = jobs.enqueue(make_project().id)
+    db.session.commit()
+
+    assert jobs.claim('worker-a', skip_reasons=['certificate_rotation'])[0] == manual.id
+    assert jobs.claim('worker-b', skip_reasons=['certificate_rotation']) is None
+    assert jobs.claim('worker-b')[0] == rotation.id
+
+
+def test_release_returns_the_attempt(app):
+    job = jobs.enqueue(1, max_attempts=1)
+    db.session.commit()
+    jobs.claim('worker-a')
+
+    assert jobs.release(job.id, 'worker-a')
+    job = _job(job.id)
+    assert (job.status, job.attempts, job.worker_id, job.lease_expires_at) == ('queued', 0, None, None)
+    assert jobs.claim('worker-b')[0] == job.id
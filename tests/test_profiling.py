@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Request profiling: opt-in, and one cProfile session per process
+"""
+
+import pytest
+from application import profiling
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    token = client.post('/api/v1/login', json={'email': 'admin@example.com', 'password': 'admin123'})
+    client.environ_base['HTTP_AUTHORIZATION'] = f"Bearer {token.get_json()['access_token']}"
+    return client
+
+
+@pytest.fixture
+def enabled(monkeypatch, tmp_path):
+    monkeypatch.setenv('PROFILING_ENABLED', '1')
+    monkeypatch.setenv('PROFILE_DIR', str(tmp_path / 'profiles'))  # Not the repo's instance folder
+
+
+def test_off_by_default(client):
+    response = client.get('/api/v1/projects', headers={'X-Profile': 'cprofile'})
+    assert response.status_code == 200
+    assert 'X-Profile-Id' not in response.headers
+
+
+def test_cprofile(enabled, client):
+    response = client.get('/api/v1/projects', headers={'X-Profile': 'cprofile'})
+    profile = client.get(f"/api/v1/profiles/{response.headers['X-Profile-Id']}").get_json()
+    assert (profile['mode'], profile['requested_mode']) == ('cprofile', 'cprofile')
+    assert not profiling._cprofile_lock.locked()
+
+
+def test_concurrent_cprofile_is_sampled(enabled, client):
+    with profiling._cprofile_lock:  # Another request is under cProfile
+        response = client.get('/api/v1/projects', headers={'X-Profile': 'cprofile'})
+    profile = client.get(f"/api/v1/profiles/{response.headers['X-Profile-Id']}").get_json()
+    assert (profile['mode'], profile['requested_mode']) == ('sample', 'cprofile')
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Project snapshots: export, import and rollback of incomplete input
+"""
+
+import gzip
+import io
+import pytest
+from sqlalchemy import func, select
+from application import db, snapshots
+from application.models import Project, Server, Client, Admin, User, UserApplication
+
+
+def _counts():
+    return {model.__tablename__: db.session.execute(select(func.count(model.id))).scalar()
+            for model in (Project, Server, Client, Admin, UserApplication)}
+
+
+def _export(project_id):
+    return b''.join(snapshots.iter_records(project_id))
+
+
+def _clients(project_id):
+    return [(client.name, client.approval_state)
+            for client in Client.query.filter_by(project_id=project_id).order_by(Client.id)]
+
+
+def _lines(data):
+    return io.BytesIO(data).readlines()
+
+
+@pytest.fixture
+def project_id(app):
+    """The default project with enough clients to span several import batches"""
+    db.session.add_all([Client(project_id=1, name=f'site-{i}', org='example', approval_state=i % 2)
+                        for i in range(snapshots.SNAPSHOT_BATCH_SIZE * 2 + 5)])
+    db.session.add(UserApplication(user_id=User.query.first().id, project_id=1, role_requested='user'))
+    db.session.commit()
+    return 1
+
+
+def test_round_trip(project_id):
+    data = _export(project_id)
+    new_id, summary = snapshots.import_snapshot(_lines(data), created_by=1, name='Copy')
+    db.session.commit()
+
+    assert new_id != project_id
+    assert db.session.get(Project, new_id).name == 'Copy'
+    assert summary['imported'] == {'server': 1, 'client': snapshots.SNAPSHOT_BATCH_SIZE * 2 + 5,
+                                   'admin': 1, 'application': 1}
+    assert summary['source_project_id'] == project_id
+    assert _clients(new_id) == _clients(project_id)
+
+
+def test_gzip_round_trip(project_id):
+    data = b''.join(snapshots.gzip_stream(snapshots.iter_records(project_id)))
+    assert data[:2] == snapshots.GZIP_MAGIC
+    new_id, summary = snapshots.import_snapshot(snapshots.open_snapshot(io.BytesIO(data)), created_by=1)
+    db.session.commit()
+    assert summary['imported']['client'] == snapshots.SNAPSHOT_BATCH_SIZE * 2 + 5
+    assert db.session.get(Project, new_id).name == db.session.get(Project, project_id).name
+
+
+def test_truncated_snapshot_is_rolled_back(project_id):
+    before = _counts()
+    lines = _lines(_export(project_id))
+    # Cut after the first batch of clients was already flushed
+    truncated = lines[:-1 - snapshots.SNAPSHOT_BATCH_SIZE // 2]
+
+    with pytest.raises(snapshots.SnapshotError, match='truncated'):
+        snapshots.import_snapshot(truncated, created_by=1)
+    db.session.rollback()
+
+    assert _counts() == before
+
+
+def test_missing_records_are_rolled_back(project_id):
+    before = _counts()
+    lines = _lines(_export(project_id))
+    # End record intact, but a client record in the middle is gone
+    incomplete = lines[:10] + lines[11:]
+
+    with pytest.raises(snapshots.SnapshotError, match='incomplete'):
+        snapshots.import_snapshot(incomplete, created_by=1)
+    db.session.rollback()
+
+    assert _counts() == before
+
+
+def test_truncated_gzip_is_rolled_back(project_id):
+    before = _counts()
+    data = b''.join(snapshots.gzip_stream(snapshots.iter_records(project_id)))
+
+    with pytest.raises((snapshots.SnapshotError, EOFError, OSError)):
+        snapshots.import_snapshot(snapshots.open_snapshot(io.BytesIO(data[:len(data) // 2])), created_by=1)
+    db.session.rollback()
+
+    assert _counts() == before
+
+
+@pytest.mark.parametrize('first_line, message', [
+    (b'{"type": "project", "name": "x"}\n', "first record must have type 'snapshot'"),
+    (b'{"type": "snapshot", "format_version": 99}\n', 'Unsupported snapshot format_version'),
+    (b'not json\n', 'invalid JSON'),
+])
+def test_malformed_header(app, first_line, message):
+    with pytest.raises(snapshots.SnapshotError, match=message):
+        snapshots.import_snapshot([first_line], created_by=1)
+
+
+def test_unknown_applicants_are_skipped(project_id):
+    lines = [line.replace(b'admin@example.com', b'nobody@elsewhere.example') if b'"application"' in line
+             else line for line in _lines(_export(project_id))]
+    _, summary = snapshots.import_snapshot(lines, created_by=1)
+    assert summary['imported']['application'] == 0
+    assert summary['skipped_applications'] == 1
+
+
+def test_import_route_rejects_truncated_upload(app, project_id):
+    client = app.test_client()
+    token = client.post('/api/v1/login', json={'email': 'admin@example.com',
+                                               'password': 'admin123'}).get_json()['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    before = _counts()
+    data = gzip.compress(b''.join(_lines(_export(project_id))[:-1]))
+
+    response = client.post('/api/v1/projects/import', data=data, headers=headers)
+    assert response.status_code == 400
+    assert 'truncated' in response.get_json()['error']
+    assert _counts() == before
+
+    response = client.post('/api/v1/projects/import', data=gzip.compress(_export(project_id)), headers=headers)
+    assert response.status_code == 200
+    assert _counts()['client'] == before['client'] * 2
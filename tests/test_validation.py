@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Project validation: the checks applied before the NVFlare CLI runs
+"""
+
+import pytest
+from application import db, validation
+from application.models import Project, Server, Client, Admin
+
+
+def _codes(issues):
+    return sorted(issue['code'] for issue in issues)
+
+
+@pytest.fixture
+def project(make_project):
+    project = make_project()
+    db.session.add(Server(project_id=project.id, name='FLServer.com', org='example',
+                          fed_learn_port=8002, admin_port=8003, connection_security='mtls'))
+    db.session.add(Client(project_id=project.id, name='site-1', org='example'))
+    db.session.add(Admin(project_id=project.id, email='lead@example.com', org='example'))
+    db.session.commit()
+    return project
+
+
+def test_valid_project(project):
+    report = validation.validate_project(project)
+    assert report['valid']
+    assert (report['error_count'], report['warning_count']) == (0, 0)
+    assert report['checked'] == {'servers': 1, 'clients': 1, 'admins': 1}
+    assert validation.ensure_valid(project)['valid']
+
+
+def test_default_project_is_valid(app):
+    assert validation.validate_project(db.session.get(Project, 1))['valid']
+
+
+def test_project_settings(project):
+    project.scheme = 'ftp'
+    project.server_name = 'bad/name'
+    report = validation.validate_project(project)
+    assert not report['valid']
+    assert _codes(report['errors']) == ['invalid_scheme', 'invalid_server_name']
+
+
+def test_missing_server(make_project):
+    report = validation.validate_project(make_project())
+    assert _codes(report['errors']) == ['missing_server']
+
+
+def test_server_checks(project):
+    db.session.add(Server(project_id=project.id, name='backup.example.com', org='', fed_learn_port=70000,
+                          admin_port=70000, connection_security='plain'))
+    db.session.commit()
+    report = validation.validate_project(project)
+    assert _codes(report['errors']) == ['invalid_connection_security', 'missing_org', 'port_clash',
+                                        'port_out_of_range', 'port_out_of_range']
+    # Only the first server is provisioned
+    assert _codes(report['warnings']) == ['additional_servers_ignored']
+
+
+def test_duplicate_client_names(project):
+    duplicate = Client(project_id=project.id, name='site-1', org='example')
+    server_named = Client(project_id=project.id, name='FLServer.com', org='example')
+    db.session.add_all([duplicate, server_named])
+    db.session.commit()
+    report = validation.validate_project(project)
+    assert _codes(report['errors']) == ['duplicate_name', 'duplicate_name']
+    first = Client.query.filter_by(project_id=project.id, name='site-1').order_by(Client.id).first()
+    by_id = {issue['participant_id']: issue for issue in report['errors']}
+    assert by_id[duplicate.id]['conflicts_with'] == {'participant_type': 'client', 'participant_id': first.id}
+    assert by_id[server_named.id]['conflicts_with'] == {'participant_type': 'server', 'participant_id': None}
+
+
+def test_client_names_and_kit_lookup(project):
+    db.session.add_all([Client(project_id=project.id, name=' site-2', org='example'),
+                        Client(project_id=project.id, name='hospital-a', org='example'),
+                        Client(project_id=project.id, name='site-3', org='')])
+    db.session.commit()
+    report = validation.validate_project(project)
+    assert _codes(report['errors']) == ['invalid_name', 'missing_org']
+    assert _codes(report['warnings']) == ['client_kit_lookup']
+
+
+def test_admin_checks(project):
+    db.session.add_all([Admin(project_id=project.id, email='site-1@example.com', org='example'),
+                        Admin(project_id=project.id, email='not-an-email', org='example'),
+                        Admin(project_id=project.id, email='ops@example.com', org='')])
+    db.session.commit()
+    report = validation.validate_project(project)
+    assert _codes(report['errors']) == ['admin_name_collision', 'invalid_email', 'missing_org']
+
+
+def test_ensure_valid_raises_with_the_report(project):
+    project.scheme = 'ftp'
+    with pytest.raises(validation.ProjectValidationError) as raised:
+        validation.ensure_valid(project)
+    assert raised.value.report['error_count'] == 1
+    assert 'Invalid scheme: ftp' in str(raised.value)
+
+
+def test_report_is_capped(project, monkeypatch):
+    monkeypatch.setattr(validation, 'MAX_REPORTED_ISSUES', 5)
+    db.session.add_all([Client(project_id=project.id, name=f'site-{i}', org='') for i in range(2, 12)])
+    db.session.commit()
+    report = validation.validate_project(project)
+    assert report['error_count'] == 10
+    assert len(report['errors']) == 5
+    assert 'and 7 more' in str(validation.ProjectValidationError(report))
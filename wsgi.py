@@ -15,7 +15,8 @@ sys.path.insert(0, os.path.dirname(__file__))
 app = create_app()
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=8443, debug=True)
+    # Development only; use `run_dashboard.py --production` or point a WSGI server at wsgi:app
+    app.run(host="0.0.0.0", port=8443, debug=os.environ.get('FLASK_DEBUG') == '1')
 
 
 